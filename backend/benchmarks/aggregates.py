@@ -0,0 +1,112 @@
+"""Sales aggregates: summary tables vs GROUP BY over orders, and write cost.
+
+Seeds --beers/--orders rows (see benchmarks.suite), then times the
+/aggregates/beers query against the same numbers computed live from
+orders, and single-row order inserts with the summary triggers enabled and
+disabled. Run it against a scratch database that has been migrated:
+
+    python -m backend.benchmarks.aggregates --orders 1000000
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from sqlalchemy import text
+
+from backend.benchmarks.suite import seed
+from backend.database import get_engine
+from backend.migrator.migrator_utils import rebuild_sales
+from backend.routers.aggregates import BEER_SALES, BEER_SALES_ORDER
+
+LIVE_BEER_SALES = """
+    SELECT
+        beers.beer_id,
+        beers.name,
+        beers.style,
+        count(orders.order_id) AS orders,
+        coalesce(sum(orders.qty), 0) AS units_sold,
+        coalesce(sum(orders.price), 0) AS revenue,
+        stock.qty_in_stock,
+        coalesce(sum(orders.qty) FILTER (
+            WHERE orders.ordered_at >= current_date - CAST(:days AS integer) + 1
+        ), 0)::float / CAST(:days AS integer) AS units_per_day
+    FROM beers
+    LEFT JOIN orders ON orders.beer_id = beers.beer_id
+    LEFT JOIN stock ON stock.beer_id = beers.beer_id
+    GROUP BY beers.beer_id, stock.qty_in_stock
+    ORDER BY revenue DESC, beers.beer_id
+    LIMIT :limit
+"""
+
+INSERT_ORDER = text(
+    "INSERT INTO orders (beer_id, user_id, qty, ordered_at, price) "
+    "SELECT beer_id, (SELECT min(user_id) FROM users), 1, now(), price "
+    "FROM beers WHERE beer_id = :beer_id"
+)
+
+
+def time_query(statement, params: dict, repeat: int) -> float:
+    samples = []
+    with get_engine().connect() as connection:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            connection.execute(statement, params).all()
+            samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def time_inserts(inserts: int, triggers: bool) -> float:
+    with get_engine().connect() as connection:
+        beer_ids = connection.execute(text("SELECT beer_id FROM beers")).scalars().all()
+        action = "ENABLE" if triggers else "DISABLE"
+        connection.execute(text(f"ALTER TABLE orders {action} TRIGGER USER"))
+        connection.commit()
+        try:
+            started = time.perf_counter()
+            for i in range(inserts):
+                connection.execute(
+                    INSERT_ORDER, {"beer_id": beer_ids[i % len(beer_ids)]}
+                )
+                connection.commit()
+            elapsed = time.perf_counter() - started
+        finally:
+            connection.execute(text("ALTER TABLE orders ENABLE TRIGGER USER"))
+            connection.commit()
+    return round(inserts / elapsed, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--beers", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--inserts", type=int, default=2000)
+    args = parser.parse_args()
+
+    seed(args.beers, args.users, args.orders)
+    # Orders seeded with triggers on are already counted; this only matters
+    # if the seed ran before migration 0003.
+    rebuild_sales()
+
+    params = {"days": args.days, "style": None, "skip": 0, "limit": args.limit}
+    summary = text(BEER_SALES.format(order=BEER_SALES_ORDER["revenue"]))
+    results = {
+        "orders": args.orders,
+        "beers": args.beers,
+        "summary_query_ms": time_query(summary, params, args.repeat),
+        "live_query_ms": time_query(text(LIVE_BEER_SALES), params, args.repeat),
+        "inserts_per_sec_with_triggers": time_inserts(args.inserts, True),
+        "inserts_per_sec_without_triggers": time_inserts(args.inserts, False),
+    }
+    rebuild_sales()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
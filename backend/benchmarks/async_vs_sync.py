@@ -0,0 +1,70 @@
+"""Compare the sync (psycopg2) and async (asyncpg) engine modes under load.
+
+Starts uvicorn once per mode against the configured database and reports
+requests/sec and p99 latency at each concurrency level:
+
+    python -m backend.benchmarks.async_vs_sync --concurrency 1 50 500
+"""
+
+import argparse
+import asyncio
+import json
+
+import httpx
+
+from backend.benchmarks.load import run_load, start_server, stop_server
+
+MODES = {"sync": "0", "async": "1"}
+
+
+def seed_beers(base_url: str, count: int):
+    with httpx.Client(base_url=base_url) as client:
+        if len(client.get("/beers/", params={"limit": count}).json()) >= count:
+            return
+        for i in range(count):
+            client.post(
+                "/beers/",
+                json={"name": f"Bench {i}", "style": "ipa", "abv": 5.0, "price": 4.5},
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/beers/?limit=20")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=10.0,
+        help="Per-request timeout; requests stuck behind the pool count as errors.",
+    )
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = []
+    for mode, flag in MODES.items():
+        server = start_server(args.port, {"DB_ASYNC": flag})
+        try:
+            seed_beers(base_url, 20)
+            for concurrency in args.concurrency:
+                total = max(args.requests, concurrency * 4)
+                result = asyncio.run(
+                    run_load(
+                        base_url, args.path, concurrency, total, timeout=args.timeout
+                    )
+                )
+                results.append({"mode": mode, **result})
+                print(
+                    f"{mode:>5} c={concurrency:<4} {result['rps']:>9} req/s "
+                    f"p99={result['p99_ms']} ms errors={result['errors']}"
+                )
+        finally:
+            stop_server(server)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Measure insert throughput of POST /beers/ against POST /beers/bulk.
+
+Loads --rows beers through the bulk endpoint in --batch sized requests and,
+for runs up to --single-max rows, through one POST per row as well:
+
+    python -m backend.benchmarks.bulk --rows 10000 1000000
+"""
+
+import argparse
+import json
+import time
+
+import httpx
+
+from backend.benchmarks.load import start_server, stop_server
+
+
+def beer(i: int) -> dict:
+    return {"name": f"Bulk {i}", "style": "lager", "abv": 4.8, "price": 3.5}
+
+
+def load_single(client: httpx.Client, rows: int) -> float:
+    started = time.perf_counter()
+    for i in range(rows):
+        client.post("/beers/", json=beer(i)).raise_for_status()
+    return time.perf_counter() - started
+
+
+def load_bulk(client: httpx.Client, rows: int, batch: int) -> float:
+    started = time.perf_counter()
+    for start in range(0, rows, batch):
+        payload = [beer(i) for i in range(start, min(start + batch, rows))]
+        client.post("/beers/bulk", json=payload).raise_for_status()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--single-max", type=int, default=10_000)
+    args = parser.parse_args()
+
+    results = []
+    server = start_server(args.port)
+    try:
+        with httpx.Client(
+            base_url=f"http://127.0.0.1:{args.port}", timeout=600
+        ) as client:
+            for rows in args.rows:
+                runs = [("bulk", lambda: load_bulk(client, rows, args.batch))]
+                if rows <= args.single_max:
+                    runs.insert(0, ("single", lambda: load_single(client, rows)))
+                for mode, run in runs:
+                    elapsed = run()
+                    rows_per_sec = round(rows / elapsed, 1)
+                    results.append(
+                        {
+                            "mode": mode,
+                            "rows": rows,
+                            "seconds": round(elapsed, 2),
+                            "rows_per_sec": rows_per_sec,
+                        }
+                    )
+                    print(f"{mode:>6} rows={rows:<8} {rows_per_sec} rows/s")
+    finally:
+        stop_server(server)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
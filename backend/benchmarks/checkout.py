@@ -0,0 +1,174 @@
+"""Concurrent checkout stress test: POST /orders/place vs read-modify-write.
+
+Seeds one beer with --stock units, then has --concurrency clients try to
+buy one unit each, --attempts times in total (more attempts than stock, so
+the last clients must be turned away). Afterwards the database is checked:
+units sold, orders written and the stock left must add up.
+
+"place" uses the atomic endpoint. "naive" is the old client-side flow:
+GET /stock/{id}, PUT it back with one unit less, then POST /orders/. It is
+expected to oversell and lose updates. Point it at a scratch database that
+has had /v1/migrator/init and /v1/migrator/migrate run on it:
+
+    python -m backend.benchmarks.checkout --concurrency 100 200 --attempts 3000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+import httpx
+from sqlalchemy import text
+
+from backend.benchmarks.load import start_server, stop_server
+from backend.database import get_engine
+
+
+def seed(stock: int) -> dict:
+    with get_engine().begin() as connection:
+        beer_id = connection.execute(
+            text(
+                "INSERT INTO beers (name, style, abv, price) "
+                "VALUES ('Checkout', 'lager', 5.0, 4.0) RETURNING beer_id"
+            )
+        ).scalar()
+        user_id = connection.execute(
+            text(
+                "INSERT INTO users (name, email, password) "
+                "VALUES ('Checkout', 'checkout-' || :beer_id || '@example.com', 'x') "
+                "RETURNING user_id"
+            ),
+            {"beer_id": beer_id},
+        ).scalar()
+        stock_id = connection.execute(
+            text(
+                "INSERT INTO stock (beer_id, qty_in_stock, date_of_arrival) "
+                "VALUES (:beer_id, :stock, current_date) RETURNING stock_id"
+            ),
+            {"beer_id": beer_id, "stock": stock},
+        ).scalar()
+    return {"beer_id": beer_id, "user_id": user_id, "stock_id": stock_id}
+
+
+def audit(ids: dict, stock: int) -> dict:
+    with get_engine().connect() as connection:
+        orders = connection.execute(
+            text("SELECT count(*) FROM orders WHERE beer_id = :beer_id"), ids
+        ).scalar()
+        left = connection.execute(
+            text("SELECT qty_in_stock FROM stock WHERE stock_id = :stock_id"), ids
+        ).scalar()
+    return {
+        "orders": orders,
+        "stock_left": left,
+        "oversold": max(0, orders - stock),
+        "consistent": orders + left == stock and left >= 0,
+    }
+
+
+async def place(client: httpx.AsyncClient, ids: dict) -> bool:
+    response = await client.post(
+        "/orders/place",
+        json={"beer_id": ids["beer_id"], "user_id": ids["user_id"], "qty": 1},
+    )
+    return response.status_code == 201
+
+
+async def naive(client: httpx.AsyncClient, ids: dict) -> bool:
+    stock = (await client.get(f"/stock/{ids['stock_id']}")).json()
+    if stock["qty_in_stock"] < 1:
+        return False
+    stock["qty_in_stock"] -= 1
+    await client.put(f"/stock/{ids['stock_id']}", json=stock)
+    order = {
+        "beer_id": ids["beer_id"],
+        "user_id": ids["user_id"],
+        "qty": 1,
+        "ordered_at": datetime.now().isoformat(),
+        "price": 4.0,
+    }
+    response = await client.post("/orders/", json=order)
+    return response.status_code == 201
+
+
+async def run_checkouts(
+    base_url: str, checkout, ids: dict, concurrency: int, attempts: int
+) -> dict:
+    sold = 0
+    errors = 0
+    remaining = iter(range(attempts))
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+
+        async def worker():
+            nonlocal sold, errors
+            for _ in remaining:
+                try:
+                    placed = await checkout(client, ids)
+                except (httpx.HTTPError, ValueError, KeyError):
+                    errors += 1
+                    continue
+                sold += placed
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "sold": sold,
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "checkouts_per_sec": round(sold / elapsed, 1),
+        "attempts_per_sec": round(attempts / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--stock", type=int, default=1000)
+    parser.add_argument("--attempts", type=int, default=1500)
+    parser.add_argument("--modes", nargs="+", default=["place", "naive"])
+    parser.add_argument("--sync", action="store_true", help="Run with DB_ASYNC=0.")
+    args = parser.parse_args()
+
+    checkouts = {"place": place, "naive": naive}
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = []
+    server = start_server(args.port, {"DB_ASYNC": "0" if args.sync else "1"})
+    try:
+        for mode in args.modes:
+            for concurrency in args.concurrency:
+                ids = seed(args.stock)
+                result = asyncio.run(
+                    run_checkouts(
+                        base_url, checkouts[mode], ids, concurrency, args.attempts
+                    )
+                )
+                result = {
+                    "mode": mode,
+                    "concurrency": concurrency,
+                    **result,
+                    **audit(ids, args.stock),
+                }
+                results.append(result)
+                print(
+                    f"{mode:>5} c={concurrency:<4} sold={result['sold']:<5} "
+                    f"orders={result['orders']:<5} left={result['stock_left']:<5} "
+                    f"{result['checkouts_per_sec']} checkouts/s"
+                )
+    finally:
+        stop_server(server)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Flash-sale reads with and without single-flight coalescing.
+
+Starts uvicorn (DB_ASYNC=1, response cache off) once per COALESCE_READS
+setting and hammers one beer and one stock list with --concurrency
+identical requests at a time. Reports latency, how many queries reached
+Postgres, and the time requests spent waiting for a pooled connection:
+
+    python -m backend.benchmarks.coalescing --concurrency 200 --requests 5000
+"""
+
+import argparse
+import asyncio
+import json
+import re
+
+import httpx
+
+from backend.benchmarks.async_vs_sync import seed_beers
+from backend.benchmarks.load import run_load, start_server, stop_server
+
+
+def scrape(base_url: str) -> dict:
+    with httpx.Client(base_url=base_url) as client:
+        metrics = client.get("/metrics").text
+        statements = client.get("/metrics/statements", params={"limit": 1000}).json()
+
+    def total(name: str) -> float:
+        return sum(
+            float(value)
+            for value in re.findall(rf"^{name}(?:{{[^}}]*}})? (\S+)$", metrics, re.M)
+        )
+
+    return {
+        "queries": sum(
+            row["calls"]
+            for row in statements
+            if row["statement"].lstrip().startswith("SELECT")
+        ),
+        "pool_wait_seconds": total("beerpy_db_pool_wait_seconds_sum"),
+        "coalesced": total("beerpy_coalesced_reads_total"),
+        "timeouts": total("beerpy_coalesce_timeouts_total"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--paths", nargs="+", default=["/beers/1", "/stock/?beer_id=1"])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--pool-size", default="5")
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = []
+    for coalesce in ("0", "1"):
+        server = start_server(
+            args.port,
+            {
+                "COALESCE_READS": coalesce,
+                "CACHE_BACKEND": "none",
+                "DB_ASYNC": "1",
+                "DB_POOL_SIZE": args.pool_size,
+            },
+        )
+        try:
+            seed_beers(base_url, 1)
+            with httpx.Client(base_url=base_url) as client:
+                if not client.get("/stock/", params={"beer_id": 1}).json():
+                    client.post(
+                        "/stock/",
+                        json={
+                            "beer_id": 1,
+                            "qty_in_stock": 100,
+                            "date_of_arrival": "2024-01-01T00:00:00",
+                        },
+                    )
+            before = scrape(base_url)
+            for path in args.paths:
+                load = asyncio.run(
+                    run_load(base_url, path, args.concurrency, args.requests)
+                )
+                after = scrape(base_url)
+                result = {
+                    "coalesce": coalesce == "1",
+                    **load,
+                    **{key: round(after[key] - before[key], 3) for key in after},
+                }
+                before = after
+                results.append(result)
+                print(
+                    f"COALESCE_READS={coalesce} {path}: p50 {load['p50_ms']} ms, "
+                    f"p99 {load['p99_ms']} ms, {load['rps']} req/s, "
+                    f"{result['queries']} queries, "
+                    f"{result['pool_wait_seconds']} s waiting for the pool"
+                )
+        finally:
+            stop_server(server)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Bytes and CPU per request: full pages vs compressed pages vs 304s.
+
+Tops beers up to --rows, then sends GET /beers/?limit=--limit through the
+app in-process: uncompressed, with each of COMPRESSION_ENCODINGS, and as a
+revalidation (If-None-Match with the page's ETag), which should cost
+neither a query nor rendering. The export is measured the same way:
+
+    COMPRESSION_ENCODINGS=br,gzip python -m backend.benchmarks.conditional
+"""
+
+import argparse
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from backend import settings
+from backend.benchmarks.pagination import seed_beers
+
+
+def measure(client: TestClient, path: str, headers: dict, iterations: int) -> dict:
+    with client.stream("GET", path, headers=headers) as response:
+        # Bytes on the wire, before httpx decodes them
+        size = sum(len(chunk) for chunk in response.iter_raw())
+    started = time.process_time()
+    for _ in range(iterations):
+        client.get(path, headers=headers)
+    return {
+        "status": response.status_code,
+        "encoding": response.headers.get("content-encoding", "identity"),
+        "bytes": size,
+        "cpu_ms": round((time.process_time() - started) / iterations * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    from backend.main import app
+
+    seed_beers(args.rows)
+    page = f"/beers/?limit={args.limit}"
+    results = {}
+    with TestClient(app) as client:
+        etag = client.get(page, headers={"Accept-Encoding": "identity"}).headers["etag"]
+        cases = {"identity": {"Accept-Encoding": "identity"}}
+        for encoding in settings.COMPRESSION_ENCODINGS:
+            cases[encoding] = {"Accept-Encoding": encoding}
+        cases["revalidated"] = {"Accept-Encoding": "identity", "If-None-Match": etag}
+        results["page"] = {
+            name: measure(client, page, headers, args.iterations)
+            for name, headers in cases.items()
+        }
+        results["export"] = {
+            name: measure(client, "/beers/export", headers, args.iterations // 20)
+            for name, headers in cases.items()
+            if name != "revalidated"
+        }
+
+    for path, cases in results.items():
+        for name, result in cases.items():
+            print(
+                f"{path:>6} {name:>11}: {result['status']} {result['bytes']:>9} bytes, "
+                f"{result['cpu_ms']} ms CPU"
+            )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Microbenchmark of per-request filter parsing and statement compilation.
+
+Compares the old path (unquote + split the query string, build fresh
+expressions with getattr) against compile_filters, which caches parsing
+and expression shapes. Both paths then look the statement up in a compiled
+cache the way Engine.execute does, so the numbers show what each request
+pays before anything is sent to Postgres:
+
+    python -m backend.benchmarks.filters --iterations 20000
+"""
+
+import argparse
+import json
+import operator
+import time
+import urllib.parse as parse
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from backend import models, schemas
+from backend.utils.query_to_filters import compile_filters, queryable_fields
+
+QUERIES = [
+    "style=ipa",
+    "style=ipa&price[le]=6.5",
+    "abv[ge]=4.5&abv[lt]=7&style=lager",
+]
+
+LEGACY_OPERATORS = {
+    "lt": operator.lt,
+    "le": operator.le,
+    "eq": operator.eq,
+    "ge": operator.ge,
+    "gt": operator.gt,
+}
+
+
+def legacy_statement(model, raw_query_string: str):
+    # The pre-compile_filters path, kept here as the baseline.
+    statement = select(model)
+    for item in parse.unquote(raw_query_string).split("&"):
+        field, value = item.split("=")
+        op = "eq"
+        if "[" in field:
+            field, op = field.split("[")
+            op = op[:-1]
+        column = getattr(model, field, None)
+        if column:
+            statement = statement.filter(LEGACY_OPERATORS[op](column, value))
+    return statement
+
+
+def planned_statement(model, raw_query_string: str):
+    fields = queryable_fields(model, schemas.Beer)
+    plan = compile_filters(model, raw_query_string, fields)
+    return plan.apply(select(model)), plan.parameters
+
+
+def compile_cached(statement, dialect, cache: dict):
+    key = statement._generate_cache_key()
+    compiled = cache.get(key.key)
+    if compiled is None:
+        compiled = cache[key.key] = statement.compile(dialect=dialect)
+    return compiled
+
+
+def time_path(build, iterations: int, dialect) -> float:
+    cache = {}
+    started = time.perf_counter()
+    for i in range(iterations):
+        result = build(models.Beer, QUERIES[i % len(QUERIES)])
+        statement = result[0] if isinstance(result, tuple) else result
+        compile_cached(statement, dialect, cache)
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+def time_cold_compile(iterations: int, dialect) -> float:
+    started = time.perf_counter()
+    for i in range(iterations):
+        legacy_statement(models.Beer, QUERIES[i % len(QUERIES)]).compile(
+            dialect=dialect
+        )
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    dialect = postgresql.dialect()
+    results = {
+        "legacy_us": round(time_path(legacy_statement, args.iterations, dialect), 2),
+        "planned_us": round(time_path(planned_statement, args.iterations, dialect), 2),
+        "uncached_compile_us": round(
+            time_cold_compile(args.iterations // 10, dialect), 2
+        ),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def percentile(samples: list, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_load(
+    base_url: str,
+    path: str,
+    concurrency: int,
+    total_requests: int,
+    method: str = "GET",
+    json=None,
+    timeout: float = 30.0,
+) -> dict:
+    """Fire `total_requests` requests at `path` from `concurrency` clients.
+
+    `path` can also be a function of the request number that returns
+    (method, path, json), for requests that differ from one to the next.
+    """
+    latencies = []
+    errors = 0
+    remaining = iter(range(total_requests))
+
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=timeout
+    ) as client:
+
+        async def worker():
+            nonlocal errors
+            for i in remaining:
+                request = path(i) if callable(path) else (method, path, json)
+                started = time.perf_counter()
+                try:
+                    response = await client.request(
+                        request[0], request[1], json=request[2]
+                    )
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "path": getattr(path, "__name__", path),
+        "method": method,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "rps": round(total_requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p90_ms": round(percentile(latencies, 90), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies, default=0.0), 2),
+    }
+
+
+def start_server(port: int, env: dict | None = None) -> subprocess.Popen:
+    """Start uvicorn on `port` and block until it answers requests."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port)],
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/docs", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+
+    process.terminate()
+    raise RuntimeError(f"uvicorn did not start on port {port}")
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
@@ -0,0 +1,95 @@
+"""Compare OFFSET and keyset (cursor) paging on a multi-million row table.
+
+Tops the beers table up to --rows rows with generate_series (point it at a
+scratch database), then times page 1 and page --deep-page of GET /beers/
+in both modes:
+
+    python -m backend.benchmarks.pagination --rows 3000000 --deep-page 10000
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+import httpx
+from sqlalchemy import text
+
+from backend.benchmarks.load import start_server, stop_server
+from backend.database import get_engine
+from backend.utils.cursor import encode_cursor
+
+
+def seed_beers(rows: int):
+    with get_engine().begin() as connection:
+        existing = connection.execute(text("SELECT count(*) FROM beers")).scalar()
+        if existing >= rows:
+            return
+        connection.execute(
+            text(
+                "INSERT INTO beers (name, style, abv, price) "
+                "SELECT 'Beer ' || g, (ARRAY['ipa', 'lager', 'stout'])[g % 3 + 1], "
+                "4 + (g % 60) / 10.0, 3 + (g % 90) / 10.0 "
+                "FROM generate_series(1, :missing) AS g"
+            ),
+            {"missing": rows - existing},
+        )
+        connection.execute(text("ANALYZE beers"))
+
+
+def cursor_for_page(page: int, limit: int) -> str:
+    if page == 1:
+        return ""
+    with get_engine().connect() as connection:
+        last_key = connection.execute(
+            text("SELECT beer_id FROM beers ORDER BY beer_id OFFSET :skip LIMIT 1"),
+            {"skip": (page - 1) * limit - 1},
+        ).scalar()
+    return encode_cursor([last_key])
+
+
+def time_request(client: httpx.Client, params: dict, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        client.get("/beers/", params=params).raise_for_status()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rows", type=int, default=3_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--deep-page", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    seed_beers(args.rows)
+
+    results = []
+    server = start_server(args.port)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{args.port}") as client:
+            for page in (1, args.deep_page):
+                offset_params = {"skip": (page - 1) * args.limit, "limit": args.limit}
+                cursor_params = {
+                    "cursor": cursor_for_page(page, args.limit),
+                    "limit": args.limit,
+                }
+                for mode, params in (
+                    ("offset", offset_params),
+                    ("cursor", cursor_params),
+                ):
+                    median_ms = time_request(client, params, args.repeat)
+                    results.append({"mode": mode, "page": page, "median_ms": median_ms})
+                    print(f"{mode:>6} page={page:<6} {median_ms} ms")
+    finally:
+        stop_server(server)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Date-bounded order lists: monthly partitions vs the single orders table.
+
+Fills the partitioned orders table (migrations 0005-0010) with --orders rows
+spread over the last --years years, copies them into orders_unpartitioned
+with the indexes orders had before 0010, then times the query GET /orders/
+runs for `ordered_at[ge]=..&ordered_at[lt]=..` windows on both, and how
+long removing the oldest month takes: detaching its partition vs DELETE.
+Run it against a scratch database that has been migrated:
+
+    python -m backend.benchmarks.partitions --orders 2000000 --years 5
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from backend.benchmarks.suite import seed
+from backend.database import get_engine
+
+# Oldest first, so order_id grows with ordered_at as it does in production
+SEED_ORDERS = text(
+    "INSERT INTO orders (beer_id, user_id, qty, ordered_at, price) "
+    "SELECT :beer_min + g % (:beer_max - :beer_min + 1), "
+    ":user_min + g % (:user_max - :user_min + 1), 1 + g % 5, "
+    "localtimestamp - ((:orders - g)::float / :orders) * :years * interval '365 days', 4.5 "
+    "FROM generate_series(1, :orders) AS g"
+)
+
+# What get_all runs for ?ordered_at[ge]=..&ordered_at[lt]=..&limit=..
+LIST_ORDERS = """
+    SELECT order_id, beer_id, user_id, qty, ordered_at, price
+    FROM {relation}
+    WHERE ordered_at >= :start AND ordered_at < :end
+    ORDER BY order_id
+    LIMIT :limit OFFSET 0
+"""
+
+UNPARTITIONED = [
+    "DROP TABLE IF EXISTS orders_unpartitioned",
+    "CREATE TABLE orders_unpartitioned AS SELECT * FROM orders",
+    "ALTER TABLE orders_unpartitioned ADD PRIMARY KEY (order_id)",
+    "CREATE INDEX ON orders_unpartitioned (beer_id)",
+    "CREATE INDEX ON orders_unpartitioned (user_id)",
+    "ANALYZE orders",
+    "ANALYZE orders_unpartitioned",
+]
+
+
+def fill(orders: int, years: int):
+    seed(100, 100, 0)
+    with get_engine().begin() as connection:
+        # Partitions first, so the rows go straight to their month
+        connection.execute(
+            text(
+                "SELECT orders_create_partition(month) FROM generate_series("
+                "date_trunc('month', localtimestamp - :years * interval '365 days'), "
+                "localtimestamp, interval '1 month') AS month"
+            ),
+            {"years": years},
+        )
+        existing = connection.execute(text("SELECT count(*) FROM orders")).scalar()
+        if existing < orders:
+            bounds = connection.execute(
+                text(
+                    "SELECT min(beer_id), max(beer_id), "
+                    "(SELECT min(user_id) FROM users), (SELECT max(user_id) FROM users) "
+                    "FROM beers"
+                )
+            ).first()
+            connection.execute(
+                SEED_ORDERS,
+                {
+                    "orders": orders - existing,
+                    "years": years,
+                    "beer_min": bounds[0],
+                    "beer_max": bounds[1],
+                    "user_min": bounds[2],
+                    "user_max": bounds[3],
+                },
+            )
+        for statement in UNPARTITIONED:
+            connection.execute(text(statement))
+
+
+def time_window(relation: str, days: int, limit: int, repeat: int) -> dict:
+    end = datetime.now().replace(microsecond=0)
+    params = {"start": end - timedelta(days=days), "end": end, "limit": limit}
+    statement = text(LIST_ORDERS.format(relation=relation))
+    samples = []
+    with get_engine().connect() as connection:
+        plan = connection.execute(
+            text("EXPLAIN " + LIST_ORDERS.format(relation=relation)), params
+        ).scalars()
+        scanned = sum(1 for line in plan if " on orders_" in line)
+        for _ in range(repeat):
+            started = time.perf_counter()
+            connection.execute(statement, params).all()
+            samples.append((time.perf_counter() - started) * 1000)
+    return {"ms": round(statistics.median(samples), 2), "partitions_scanned": scanned}
+
+
+def time_expire() -> dict:
+    with get_engine().connect() as connection:
+        oldest = connection.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = 'orders'::regclass "
+                "AND child.relname ~ '^orders_\\d{4}_\\d{2}$' ORDER BY child.relname LIMIT 1"
+            )
+        ).scalar()
+        month = datetime.strptime(oldest, "orders_%Y_%m")
+        next_month = (month + timedelta(days=32)).replace(day=1)
+
+        started = time.perf_counter()
+        deleted = connection.execute(
+            text(
+                "DELETE FROM orders_unpartitioned "
+                "WHERE ordered_at >= :start AND ordered_at < :end"
+            ),
+            {"start": month, "end": next_month},
+        ).rowcount
+        connection.commit()
+        delete_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        connection.execute(text(f"ALTER TABLE orders DETACH PARTITION {oldest}"))
+        connection.commit()
+        detach_ms = (time.perf_counter() - started) * 1000
+        # Put it back, so the benchmark can be run again on the same data
+        connection.execute(
+            text(
+                f"ALTER TABLE orders ATTACH PARTITION {oldest} "
+                "FOR VALUES FROM (:start) TO (:end)"
+            ),
+            {"start": month, "end": next_month},
+        )
+        connection.commit()
+
+    return {
+        "month": oldest,
+        "rows": deleted,
+        "delete_ms": round(delete_ms, 2),
+        "detach_ms": round(detach_ms, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=2_000_000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 7, 30, 365])
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    fill(args.orders, args.years)
+    results = {"orders": args.orders, "years": args.years, "windows": []}
+    for days in args.days:
+        partitioned = time_window("orders", days, args.limit, args.repeat)
+        single = time_window("orders_unpartitioned", days, args.limit, args.repeat)
+        results["windows"].append(
+            {
+                "days": days,
+                "partitioned_ms": partitioned["ms"],
+                "partitions_scanned": partitioned["partitions_scanned"],
+                "single_table_ms": single["ms"],
+            }
+        )
+    results["expire_oldest_month"] = time_expire()
+
+    with get_engine().begin() as connection:
+        connection.execute(text("DROP TABLE orders_unpartitioned"))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Read latency during a signup burst, per PASSWORD_HASH_POOL mode.
+
+Starts uvicorn once per mode and measures GET --path on its own, then the
+same read load while --signups POST /users/ requests (each one a password
+hash) run alongside it. With the hash off the event loop, the read p99
+should barely move:
+
+    python -m backend.benchmarks.passwords --modes inline thread process
+"""
+
+import argparse
+import asyncio
+import json
+import uuid
+
+from backend.benchmarks.async_vs_sync import seed_beers
+from backend.benchmarks.load import run_load, start_server, stop_server
+
+
+def signup(run: str):
+    def request(i: int) -> tuple:
+        body = {
+            "name": f"Bench {i}",
+            "email": f"bench-{run}-{i}@example.com",
+            "address": None,
+            "phone": None,
+            "password": f"password-{i}",
+        }
+        return "POST", "/users/", body
+
+    request.__name__ = "/users/ (signup)"
+    return request
+
+
+async def during_burst(base_url: str, args) -> tuple:
+    reads, signups = await asyncio.gather(
+        run_load(base_url, args.path, args.concurrency, args.requests),
+        run_load(
+            base_url,
+            signup(uuid.uuid4().hex[:8]),
+            args.signup_concurrency,
+            args.signups,
+        ),
+    )
+    return reads, signups
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/beers/?limit=20")
+    parser.add_argument("--modes", nargs="+", default=["inline", "thread", "process"])
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--signups", type=int, default=200)
+    parser.add_argument("--signup-concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = []
+    for mode in args.modes:
+        # Caching would serve the reads without touching the event loop's
+        # share of the work being measured
+        server = start_server(
+            args.port, {"PASSWORD_HASH_POOL": mode, "CACHE_BACKEND": "none"}
+        )
+        try:
+            seed_beers(base_url, 20)
+            alone = asyncio.run(
+                run_load(base_url, args.path, args.concurrency, args.requests)
+            )
+            reads, signups = asyncio.run(during_burst(base_url, args))
+        finally:
+            stop_server(server)
+
+        results.append(
+            {
+                "mode": mode,
+                "reads_alone": alone,
+                "reads_during_signups": reads,
+                "signups": signups,
+            }
+        )
+        print(
+            f"{mode:>7} read p99 {alone['p99_ms']} -> {reads['p99_ms']} ms, "
+            f"{signups['rps']} signups/s, signup errors={signups['errors']}"
+        )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
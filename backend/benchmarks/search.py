@@ -0,0 +1,160 @@
+"""GET /beers/search latency on a large catalogue.
+
+Tops beers up to --beers rows named "<adjective> <noun> <n>" from 60 words
+each, with 20 styles, so every word is shared by thousands of beers (the
+hard case for ranking and prefix matching). Then times the statements the
+endpoint runs, typo correction included, for an autocomplete session
+("h", "ha", ... "hazy fox 1"), misspellings and a style:
+
+    python -m backend.benchmarks.search --beers 1000000
+"""
+
+import argparse
+import json
+import re
+import statistics
+import time
+
+from sqlalchemy import text
+
+from backend.database import get_engine
+from backend.routers.beers import (
+    CORRECT_TERMS,
+    SEARCH_BEERS,
+    _search_terms,
+    _tsquery,
+)
+
+ADJECTIVES = (
+    "Hazy Golden Dark Wild Old Red Black Northern Lucky Midnight Citrus Smoky "
+    "Iron Silver Copper Crimson Velvet Rusty Hoppy Juicy Bitter Sunny Stormy "
+    "Frosty Brave Quiet Mighty Little Big Grand Royal Humble Lazy Crazy Happy "
+    "Salty Sweet Sour Twisted Hidden Lost Broken Flying Dancing Sleepy Angry "
+    "Noble Savage Gentle Electric Cosmic Lunar Solar Arctic Tropical Urban "
+    "Rustic Ancient Modern Burning"
+).split()
+NOUNS = (
+    "Fox Harbor Monk Raven River Lantern Anchor Badger Bear Wolf Owl Otter "
+    "Falcon Hound Stag Mill Forge Barrel Bridge Castle Tower Garden Meadow "
+    "Valley Summit Canyon Island Coast Prairie Forest Orchard Cellar Tavern "
+    "Abbey Chapel Market Station Harvest Ember Comet Thunder Lightning Shadow "
+    "Ghost Pirate Captain Sailor Farmer Baron Bishop Knight Dragon Griffin "
+    "Phoenix Serpent Tiger Lion Eagle Hawk Crow"
+).split()
+STYLES = [
+    "IPA", "Stout", "Porter", "Pilsner", "Lager", "Saison", "Sour", "Pale Ale",
+    "Wheat", "Tripel", "Dubbel", "Amber", "Bock", "Gose", "Kolsch",
+    "Barleywine", "Brown Ale", "Red Ale", "Hefeweizen", "Double IPA",
+]  # fmt: skip
+
+SEED_BEERS = text("""
+    INSERT INTO beers (name, style, abv, price)
+    SELECT
+        (CAST(:adjectives AS text[]))[1 + abs(hashtext(g::text)) % 60]
+            || ' ' || (CAST(:nouns AS text[]))[1 + abs(hashtext(g || 'n')) % 60]
+            || ' ' || g % 997,
+        (CAST(:styles AS text[]))[1 + abs(hashtext(g || 's')) % 20],
+        3 + g % 90 / 10.0,
+        3 + g % 120 / 10.0
+    FROM generate_series(:start, :stop) AS g
+    """)
+
+QUERIES = [
+    "h", "ha", "haz", "hazy", "hazy f", "hazy fo", "hazy fox", "hazy fox 1",
+    "midnight raven", "ipa", "double ipa", "zzz",
+    "hazzy fox", "midnight ravn", "coper anchr",
+]  # fmt: skip
+
+
+def fill(beers: int):
+    with get_engine().begin() as connection:
+        existing = connection.execute(text("SELECT count(*) FROM beers")).scalar()
+        if existing < beers:
+            connection.execute(
+                SEED_BEERS,
+                {
+                    "adjectives": ADJECTIVES,
+                    "nouns": NOUNS,
+                    "styles": STYLES,
+                    "start": existing + 1,
+                    "stop": beers,
+                },
+            )
+    # Outside a transaction, so the GIN pending list is merged into the index
+    with get_engine().connect() as connection:
+        connection.execution_options(isolation_level="AUTOCOMMIT").execute(
+            text("VACUUM ANALYZE beers")
+        )
+
+
+def search(connection, q: str, skip: int, limit: int) -> tuple:
+    terms = _search_terms(q)
+    params = {"window": skip + limit, "skip": skip, "limit": limit}
+    rows = connection.execute(SEARCH_BEERS, {**params, "query": _tsquery(terms)})
+    rows = rows.all()
+    if rows:
+        return rows, None
+    suggestion = list(connection.execute(CORRECT_TERMS, {"terms": terms}).scalars())
+    if suggestion == terms:
+        return rows, None
+    rows = connection.execute(SEARCH_BEERS, {**params, "query": _tsquery(suggestion)})
+    return rows.all(), " ".join(suggestion)
+
+
+def time_query(connection, q: str, skip: int, limit: int, repeat: int) -> dict:
+    terms = _search_terms(q)
+    plan = connection.execute(
+        text("EXPLAIN " + SEARCH_BEERS.text),
+        {
+            "query": _tsquery(terms),
+            "window": skip + limit,
+            "skip": skip,
+            "limit": limit,
+        },
+    ).scalars()
+    # Which indexes the plan reads: the GIN ones for rare words, the
+    # ordered one for words that match a large part of the catalogue
+    indexes = sorted(set(re.findall(r"ix_beers_\w+", "\n".join(plan))))
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows, corrected = search(connection, q, skip, limit)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "q": q,
+        "searched_for": corrected,
+        "results": len(rows),
+        "top": rows[0].name if rows else None,
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 2),
+        "indexes": indexes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--beers", type=int, default=1_000_000)
+    parser.add_argument("--skip", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--queries", nargs="+", default=QUERIES)
+    args = parser.parse_args()
+
+    fill(args.beers)
+    results = []
+    with get_engine().connect() as connection:
+        for q in args.queries:
+            result = time_query(connection, q, args.skip, args.limit, args.repeat)
+            results.append(result)
+            print(
+                f"{q!r:>18} p50 {result['p50_ms']:>6} ms  p95 {result['p95_ms']:>6} ms"
+                f"  {result['results']} results, top {result['top']!r}"
+            )
+
+    print(json.dumps({"skip": args.skip, "queries": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""CPU cost of rendering a 1,000-row page: response_model route vs FAST_JSON.
+
+Two measurements, both in CPU milliseconds per page:
+
+* serialize: in memory, no database. The response_model side validates ORM
+  objects into the schema and renders them the way FastAPI's route does;
+  the fast side encodes the same values as plain rows with encode_rows.
+* request: GET /beers/?limit=1000 through the app in-process with the
+  setting off and on. Tops beers up to --rows first, so point it at a
+  scratch database. The response cache is disabled for the run.
+
+    python -m backend.benchmarks.serialization --rows 1000 --iterations 200
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+os.environ.setdefault("CACHE_BACKEND", "none")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from backend import models, schemas, settings  # noqa: E402
+from backend.benchmarks.pagination import seed_beers  # noqa: E402
+from backend.utils.fast_json import encode_rows, orjson  # noqa: E402
+
+
+def sample_rows(model, rows: int) -> list:
+    if model is models.Beer:
+        return [
+            {
+                "beer_id": i,
+                "name": f"Beer {i}",
+                "style": "ipa",
+                "abv": 5.2,
+                "price": 4.5,
+            }
+            for i in range(rows)
+        ]
+    return [
+        {
+            "stock_id": i,
+            "beer_id": i,
+            "qty_in_stock": 10,
+            "date_of_arrival": datetime(2024, 3, 1),
+        }
+        for i in range(rows)
+    ]
+
+
+def cpu_ms(run, iterations: int) -> float:
+    started = time.process_time()
+    for _ in range(iterations):
+        run()
+    return round((time.process_time() - started) / iterations * 1000, 3)
+
+
+def time_serialize(model, schema, rows: int, iterations: int) -> dict:
+    values = sample_rows(model, rows)
+    objects = [model(**row) for row in values]
+    fields = tuple(schema.model_fields)
+    adapter = TypeAdapter(list[schema])
+
+    def response_model():
+        # What the route does: validate from attributes, dump in JSON mode,
+        # then JSONResponse.render.
+        items = adapter.validate_python(objects, from_attributes=True)
+        json.dumps(
+            adapter.dump_python(items, mode="json"),
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode()
+
+    def fast():
+        encode_rows(schema, fields, [dict(row) for row in values])
+
+    return {
+        "response_model_ms": cpu_ms(response_model, iterations),
+        "fast_json_ms": cpu_ms(fast, iterations),
+    }
+
+
+def time_requests(rows: int, iterations: int) -> dict:
+    from backend.main import app
+
+    seed_beers(rows)
+    results = {}
+    with TestClient(app) as client:
+        for name, enabled in (("response_model_ms", False), ("fast_json_ms", True)):
+            settings.FAST_JSON = enabled
+            client.get("/beers/", params={"limit": rows}).raise_for_status()
+            results[name] = cpu_ms(
+                lambda: client.get("/beers/", params={"limit": rows}), iterations
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--skip-requests", action="store_true")
+    args = parser.parse_args()
+
+    results = {"encoder": "orjson" if orjson is not None else "json"}
+    for model, schema in ((models.Beer, schemas.Beer), (models.Stock, schemas.Stock)):
+        results[f"serialize_{model.__tablename__}"] = time_serialize(
+            model, schema, args.rows, args.iterations
+        )
+    if not args.skip_requests:
+        results["request_beers"] = time_requests(args.rows, args.iterations // 4)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Measure worker cold start: import time and process start to first request.
+
+"import" times `import backend.main`, which leaves the routers out, and
+"routes" that plus include_routers(), which a worker runs during startup
+while it probes the database. For each mode, starts a fresh uvicorn process --repeat times and records
+how long it takes from spawning the process until GET --path first
+succeeds. "probe" is the default startup (lifespan connects before serving,
+retrying while Postgres is unreachable); "lazy" sets DB_CONNECT_RETRIES=0
+so the first request opens the pool instead:
+
+    python -m backend.benchmarks.startup --repeat 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from backend.benchmarks.load import stop_server
+
+MODES = {"probe": {}, "lazy": {"DB_CONNECT_RETRIES": "0"}}
+
+IMPORT_SNIPPETS = {
+    "import": "import backend.main",
+    "routes": "import backend.main; backend.main.include_routers()",
+}
+
+
+def time_import(snippet: str) -> float:
+    code = (
+        f"import time; started = time.perf_counter(); {snippet}; "
+        "print((time.perf_counter() - started) * 1000)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def time_first_request(port: int, path: str, env: dict, timeout: float = 60) -> float:
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port)],
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}{path}", timeout=5)
+                if response.status_code < 500:
+                    return (time.perf_counter() - started) * 1000
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.005)
+        raise RuntimeError(f"no response from {path} within {timeout}s")
+    finally:
+        stop_server(process)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/beers/?limit=1")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    results = []
+    for mode, snippet in IMPORT_SNIPPETS.items():
+        samples = [time_import(snippet) for _ in range(args.repeat)]
+        results.append(
+            {"mode": mode, "median_ms": round(statistics.median(samples), 1)}
+        )
+        print(f"{mode:>6} {results[-1]['median_ms']} ms")
+
+    for mode, env in MODES.items():
+        samples = [
+            time_first_request(args.port, args.path, env) for _ in range(args.repeat)
+        ]
+        median_ms = round(statistics.median(samples), 1)
+        results.append(
+            {"mode": mode, "median_ms": median_ms, "max_ms": round(max(samples), 1)}
+        )
+        print(f"{mode:>6} first request {median_ms} ms")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""REST API benchmark suite: every router's list/get/create/update/delete.
+
+Tops the tables up to the --beers/--users/--orders volumes (plus one stock
+row per beer) with generate_series, starts uvicorn, and drives each
+operation at every --concurrency level. Results are written as JSON with
+the commit they were measured on, so runs can be compared across commits:
+
+    python -m backend.benchmarks.suite --output bench-results/HEAD.json
+    python -m backend.benchmarks.suite --compare bench-results/main.json
+    make bench BENCH_ARGS="--concurrency 1 16 64 --compare bench-results/abc123.json"
+
+Point it at a scratch database (see `make bench-db`); --reset drops and
+recreates every table first.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from backend import settings
+from backend.benchmarks.load import run_load, start_server, stop_server
+from backend.benchmarks.pagination import seed_beers
+from backend.database import get_engine
+from backend.migrator.migrator_utils import run_migrations
+
+KEYS = {
+    "beers": "beer_id",
+    "users": "user_id",
+    "orders": "order_id",
+    "stock": "stock_id",
+}
+OPERATIONS = ["list", "get", "create", "update", "delete"]
+
+
+def seed(beers: int, users: int, orders: int):
+    seed_beers(beers)
+    with get_engine().begin() as connection:
+        existing = connection.execute(text("SELECT count(*) FROM users")).scalar()
+        connection.execute(
+            text(
+                "INSERT INTO users (name, email, password, address, phone) "
+                "SELECT 'User ' || g, 'seed-' || g || '@example.com', 'x', "
+                "g || ' Main St', '555-' || g "
+                "FROM generate_series(:start, :stop) AS g ON CONFLICT DO NOTHING"
+            ),
+            {"start": existing + 1, "stop": users},
+        )
+        connection.execute(
+            text(
+                "INSERT INTO stock (beer_id, qty_in_stock, date_of_arrival) "
+                "SELECT beer_id, 1000, current_date FROM beers "
+                "WHERE NOT EXISTS (SELECT 1 FROM stock WHERE stock.beer_id = beers.beer_id)"
+            )
+        )
+
+        existing = connection.execute(text("SELECT count(*) FROM orders")).scalar()
+        bounds = connection.execute(
+            text(
+                "SELECT (SELECT min(beer_id) FROM beers), (SELECT max(beer_id) FROM beers), "
+                "(SELECT min(user_id) FROM users), (SELECT max(user_id) FROM users)"
+            )
+        ).first()
+        connection.execute(
+            text(
+                "INSERT INTO orders (beer_id, user_id, qty, ordered_at, price) "
+                "SELECT beers.beer_id, users.user_id, 1 + g % 5, "
+                "now() - (g % 365) * interval '1 day', beers.price "
+                "FROM generate_series(1, :missing) AS g "
+                "JOIN beers ON beers.beer_id = :beer_min + g % (:beer_max - :beer_min + 1) "
+                "JOIN users ON users.user_id = :user_min + g % (:user_max - :user_min + 1)"
+            ),
+            {
+                "missing": max(0, orders - existing),
+                "beer_min": bounds[0],
+                "beer_max": bounds[1],
+                "user_min": bounds[2],
+                "user_max": bounds[3],
+            },
+        )
+        for table in KEYS:
+            connection.execute(text(f"ANALYZE {table}"))
+
+
+def sample_ids(table: str, size: int = 1000) -> list:
+    with get_engine().connect() as connection:
+        return (
+            connection.execute(
+                text(
+                    f"SELECT {KEYS[table]} FROM {table} ORDER BY random() LIMIT :size"
+                ),
+                {"size": size},
+            )
+            .scalars()
+            .all()
+        )
+
+
+def max_id(table: str) -> int:
+    with get_engine().connect() as connection:
+        return connection.execute(
+            text(f"SELECT coalesce(max({KEYS[table]}), 0) FROM {table}")
+        ).scalar()
+
+
+def free_beers(count: int) -> list:
+    """Beers without stock, for stock creates (stock.beer_id is unique)."""
+    with get_engine().begin() as connection:
+        return (
+            connection.execute(
+                text(
+                    "INSERT INTO beers (name, style, abv, price) "
+                    "SELECT 'Unstocked ' || g, 'lager', 5.0, 4.0 "
+                    "FROM generate_series(1, :count) AS g RETURNING beer_id"
+                ),
+                {"count": count},
+            )
+            .scalars()
+            .all()
+        )
+
+
+def create_body(table: str, i: int, run: str, ids: dict, extra: dict) -> dict:
+    if table == "beers":
+        return {"name": f"Bench {run}-{i}", "style": "ipa", "abv": 5.5, "price": 4.0}
+    if table == "users":
+        return {
+            "name": f"Bench {i}",
+            "email": f"bench-{run}-{i}@example.com",
+            "password": "x",
+            "address": None,
+            "phone": None,
+        }
+    if table == "orders":
+        return {
+            "beer_id": random.choice(ids["beers"]),
+            "user_id": random.choice(ids["users"]),
+            "qty": 1,
+            "ordered_at": datetime.now().isoformat(),
+            "price": 4.0,
+        }
+    # POST /stock/ takes an explicit stock_id; stay well clear of the sequence.
+    return {
+        "stock_id": extra["stock_base"] + i,
+        "beer_id": extra["free_beers"][i],
+        "qty_in_stock": 10,
+        "date_of_arrival": datetime.now().date().isoformat(),
+    }
+
+
+PATCHES = {
+    "beers": lambda i: {"price": 3 + i % 50 / 10},
+    "users": lambda i: {"phone": f"555-{i}"},
+    "orders": lambda i: {"qty": 1 + i % 5},
+    "stock": lambda i: {"qty_in_stock": 100 + i % 900},
+}
+
+
+def operation(table: str, op: str, ids: dict, run: str, extra: dict):
+    """The request factory run_load calls for request number i."""
+
+    def request(i: int):
+        if op == "list":
+            return "GET", f"/{table}/?limit=20&skip={i % 50 * 20}", None
+        if op == "get":
+            return "GET", f"/{table}/{ids[table][i % len(ids[table])]}", None
+        if op == "create":
+            return (
+                "POST",
+                f"/{table}/",
+                create_body(table, extra["created"], run, ids, extra),
+            )
+        if op == "update":
+            item_id = ids[table][i % len(ids[table])]
+            return "PATCH", f"/{table}/{item_id}", PATCHES[table](i)
+        return "DELETE", f"/{table}/{extra['to_delete'].pop()}", None
+
+    def counted(i: int):
+        method, path, body = request(i)
+        if op == "create":
+            extra["created"] += 1
+        return method, path, body
+
+    counted.__name__ = f"{op} /{table}/"
+    return counted
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args) -> list:
+    ids = {table: sample_ids(table) for table in KEYS}
+    run = str(int(time.time()))
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = []
+    for table in KEYS:
+        creates = args.requests * len(args.concurrency)
+        extra = {"created": 0, "to_delete": []}
+        if table == "stock":
+            extra["free_beers"] = free_beers(creates)
+            extra["stock_base"] = max_id("stock") + 1_000_000
+
+        before_create = max_id(table)
+        for op in OPERATIONS:
+            if op == "delete":
+                # Delete only what this run created, so the seeded volume
+                # stays the same from run to run.
+                with get_engine().connect() as connection:
+                    extra["to_delete"] = (
+                        connection.execute(
+                            text(
+                                f"SELECT {KEYS[table]} FROM {table} "
+                                f"WHERE {KEYS[table]} > :before"
+                            ),
+                            {"before": before_create},
+                        )
+                        .scalars()
+                        .all()
+                    )
+            for concurrency in args.concurrency:
+                total = args.requests
+                if op == "delete":
+                    total = min(total, len(extra["to_delete"]))
+                if total == 0:
+                    continue
+                result = asyncio.run(
+                    run_load(
+                        base_url,
+                        operation(table, op, ids, run, extra),
+                        concurrency,
+                        total,
+                        timeout=args.timeout,
+                    )
+                )
+                result = {"router": table, "operation": op, **result}
+                del result["method"]
+                results.append(result)
+                print(
+                    f"{table:>6} {op:<6} c={concurrency:<4} {result['rps']:>8} req/s "
+                    f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms "
+                    f"errors={result['errors']}"
+                )
+        if table == "stock":
+            with get_engine().begin() as connection:
+                connection.execute(
+                    text(
+                        "DELETE FROM beers WHERE beer_id = ANY(:ids) AND NOT EXISTS "
+                        "(SELECT 1 FROM stock WHERE stock.beer_id = beers.beer_id)"
+                    ),
+                    {"ids": extra["free_beers"]},
+                )
+    return results
+
+
+def compare(results: list, baseline_path: str):
+    with open(baseline_path) as file:
+        baseline = {
+            (r["router"], r["operation"], r["concurrency"]): r
+            for r in json.load(file)["results"]
+        }
+    print(f"\nvs {baseline_path}:")
+    for result in results:
+        before = baseline.get(
+            (result["router"], result["operation"], result["concurrency"])
+        )
+        if before is None or not before["rps"]:
+            continue
+        change = (result["rps"] - before["rps"]) / before["rps"] * 100
+        print(
+            f"{result['router']:>6} {result['operation']:<6} c={result['concurrency']:<4} "
+            f"{before['rps']:>8} -> {result['rps']:>8} req/s ({change:+.1f}%) "
+            f"p99 {before['p99_ms']} -> {result['p99_ms']} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--beers", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--orders", type=int, default=500_000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 32])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--reset", action="store_true")
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    parser.add_argument("--compare", help="Print changes against an earlier report.")
+    args = parser.parse_args()
+
+    if args.reset:
+        run_migrations(reset=True)
+    run_migrations()
+    seed(args.beers, args.users, args.orders)
+
+    server = start_server(args.port)
+    try:
+        results = run_suite(args)
+    finally:
+        stop_server(server)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "settings": {
+            "DB_ASYNC": settings.DB_ASYNC,
+            "DB_POOL_SIZE": settings.DB_POOL_SIZE,
+            "DB_MAX_OVERFLOW": settings.DB_MAX_OVERFLOW,
+            "CACHE_BACKEND": settings.CACHE_BACKEND,
+            "FAST_JSON": settings.FAST_JSON,
+        },
+        "volumes": {"beers": args.beers, "users": args.users, "orders": args.orders},
+        "results": results,
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(payload + "\n")
+    else:
+        print(payload)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
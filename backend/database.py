@@ -1,42 +1,277 @@
 from backend import settings
-import sys
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Union
 
-from sqlalchemy import create_engine, exc
-from sqlalchemy.orm import sessionmaker, declarative_base
+from fastapi import Request, Response
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
+from backend.utils.pool_metrics import (
+    InstrumentedAsyncQueuePool,
+    InstrumentedQueuePool,
+    register_pool,
+)
+from backend.utils.replicas import READ_ROUTES, REPLICAS, Replica
+from backend.utils.request_metrics import register_query_events
+from backend.utils.stock_stream import STOCK_CHANGES
+from backend.utils import passwords
 
-def init_db():
+DBSession = Union[Session, AsyncSession]
+
+# Nothing here touches the network: the engines are created by init_db (on
+# app startup, or on first use outside the app) and the session factories
+# are bound to them then.
+Base = declarative_base()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+engine = None
+async_engine = None
+
+
+def database_url(
+    driver: str = "postgresql", host: str | None = None, port: str | None = None
+) -> str:
     db_name = settings.DATABASE
-    db_host = settings.PGHOST
-    db_port = settings.PORT
+    db_host = host or settings.PGHOST
+    db_port = port or settings.PORT
     db_user = settings.DB_USER
     db_password = settings.PASSWORD
 
-    SQLALCHEMY_DATABASE_URL = (
-        f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+    return f"{driver}://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+
+
+def pool_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def init_db():
+    """Create the engines and bind the session factories, once.
+
+    Creating an engine does not connect; the first checkout does.
+    """
+    global engine, async_engine
+
+    if engine is None:
+        engine = create_engine(
+            database_url(), poolclass=InstrumentedQueuePool, **pool_options()
+        )
+        register_pool(engine)
+        register_query_events(engine)
+        SessionLocal.configure(bind=engine)
+
+        for index, address in enumerate(settings.DB_REPLICA_HOSTS):
+            REPLICAS.add(_replica(index, address))
+
+    if settings.DB_ASYNC and async_engine is None:
+        async_engine = create_async_engine(
+            database_url("postgresql+asyncpg"),
+            poolclass=InstrumentedAsyncQueuePool,
+            **pool_options(),
+        )
+        register_pool(async_engine)
+        register_query_events(async_engine)
+        AsyncSessionLocal.configure(bind=async_engine)
+
+    return engine
+
+
+def _replica(index: int, address: str) -> Replica:
+    host, _, port = address.partition(":")
+    timeout = settings.DB_REPLICA_CONNECT_TIMEOUT
+
+    replica_engine = create_engine(
+        database_url(host=host, port=port),
+        poolclass=InstrumentedQueuePool,
+        connect_args={"connect_timeout": timeout},
+        **pool_options(),
     )
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    register_pool(replica_engine, f"replica{index}")
+    register_query_events(replica_engine)
 
-    try:
-        connection = engine.connect()
-        print("🔗 Database connection established")
-    except exc.OperationalError:
-        print(
-            "❗ Could not connect to the database. Please check your database settings and connection."
+    replica_async_engine = None
+    if settings.DB_ASYNC:
+        replica_async_engine = create_async_engine(
+            database_url("postgresql+asyncpg", host, port),
+            poolclass=InstrumentedAsyncQueuePool,
+            connect_args={"timeout": timeout},
+            **pool_options(),
         )
-        sys.exit(1)
+        register_pool(replica_async_engine, f"replica{index}-async")
+        register_query_events(replica_async_engine)
+
+    return Replica(address, replica_engine, replica_async_engine)
+
 
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base = declarative_base()
+def get_engine():
+    return engine if engine is not None else init_db()
 
-    def get_db():
-        db = SessionLocal()
+
+def _probe():
+    with get_engine().connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+async def connect(
+    retries: int = settings.DB_CONNECT_RETRIES,
+    backoff: float = settings.DB_CONNECT_BACKOFF,
+):
+    """Open a first connection on each engine, retrying with backoff.
+
+    Waits backoff, 2*backoff, 4*backoff... (capped at DB_CONNECT_BACKOFF_MAX)
+    between attempts, so a worker started while Postgres is still coming up
+    waits for it instead of exiting. With `retries` 0 nothing is probed and
+    the first request opens the pool.
+    """
+    init_db()
+    for attempt in range(1, retries + 1):
         try:
-            yield db
-        finally:
-            db.close()
+            await asyncio.to_thread(_probe)
+            if async_engine is not None:
+                async with async_engine.connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+            print("🔗 Database connection established")
+            return
+
+        except (exc.DBAPIError, OSError):
+            if attempt == retries:
+                print(
+                    "❗ Could not connect to the database. Please check your database settings and connection."
+                )
+                raise
+            delay = min(backoff * 2 ** (attempt - 1), settings.DB_CONNECT_BACKOFF_MAX)
+            print(
+                f"⏳ Database not reachable (attempt {attempt}/{retries}), retrying in {delay:g}s"
+            )
+            await asyncio.sleep(delay)
+
 
-    return engine, SessionLocal, Base, get_db
+async def dispose():
+    for replica in REPLICAS.replicas:
+        if replica.async_engine is not None:
+            await replica.async_engine.dispose()
+        replica.engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
+    if engine is not None:
+        engine.dispose()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await connect()
+    # Imported here: the migrator imports this module
+    from backend.migrator.migrator_utils import maintain_partitions_forever
+
+    maintenance = asyncio.create_task(maintain_partitions_forever())
+    yield
+    maintenance.cancel()
+    await STOCK_CHANGES.close()
+    passwords.shutdown()
+    await dispose()
+
+
+def get_db():
+    init_db()
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    init_db()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Set on responses to writes: until this time (epoch seconds) the client's
+# reads go to the primary, so it sees its own writes despite replica lag.
+PRIMARY_COOKIE = "beerpy_primary_until"
+
+# Raised when a replica cannot be reached or drops the connection
+REPLICA_ERRORS = (exc.OperationalError, exc.InterfaceError, OSError)
+
+
+async def read_replica(
+    request: Request, response: Response | None = None
+) -> Replica | None:
+    """The replica to serve `request` from, or None for the primary."""
+    if not REPLICAS.replicas:
+        return None
+
+    if request.method not in ("GET", "HEAD"):
+        if response is not None:
+            window = settings.DB_REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                PRIMARY_COOKIE,
+                f"{time.time() + window:.3f}",
+                max_age=math.ceil(window),
+                httponly=True,
+            )
+        return None
+
+    try:
+        sticky = float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        sticky = False
+    replica = None if sticky else await REPLICAS.pick()
+    READ_ROUTES.inc(target=replica.host if replica else "primary")
+    return replica
+
+
+def read_session(replica: Replica | None) -> Session:
+    return SessionLocal(bind=replica.engine) if replica else SessionLocal()
+
+
+def read_async_session(replica: Replica | None) -> AsyncSession:
+    if replica:
+        return AsyncSessionLocal(bind=replica.async_engine)
+    return AsyncSessionLocal()
+
+
+def on_primary(db) -> bool:
+    """Whether session `db` reads from the primary rather than a replica."""
+    return db.bind is engine or db.bind is async_engine
+
+
+async def get_routed_db(request: Request, response: Response):
+    """get_db, except that reads may be served by a replica."""
+    init_db()
+    replica = await read_replica(request, response)
+    db = read_session(replica)
+    try:
+        yield db
+    except REPLICA_ERRORS as e:
+        if replica:
+            replica.mark_down(e)
+        raise
+    finally:
+        db.close()
+
+
+async def get_routed_async_db(request: Request, response: Response):
+    init_db()
+    replica = await read_replica(request, response)
+    async with read_async_session(replica) as db:
+        try:
+            yield db
+        except REPLICA_ERRORS as e:
+            if replica:
+                replica.mark_down(e)
+            raise
 
 
-engine, SessionLocal, Base, get_db = init_db()
+get_session = get_routed_async_db if settings.DB_ASYNC else get_routed_db
+# For reads that must not lag behind the primary, whatever the method
+get_primary_session = get_async_db if settings.DB_ASYNC else get_db
@@ -1,13 +1,71 @@
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from importlib import import_module
+
 from fastapi import FastAPI
-from backend.routers import beers, orders, stock, users
-from backend.migrator import migrator
+from fastapi.concurrency import run_in_threadpool
+
+from backend import database
+from backend.utils.compression import CompressionMiddleware
+from backend.utils.request_metrics import RequestTimingMiddleware
+
+# Imported by include_routers rather than here: between them the routers
+# pull in the models, schemas and query helpers, about a fifth of the
+# import time of this module
+ROUTERS = (
+    "backend.routers.beers",
+    "backend.routers.orders",
+    "backend.routers.users",
+    "backend.routers.stock",
+    "backend.routers.aggregates",
+    "backend.migrator.migrator",
+    "backend.routers.metrics",
+    "backend.routers.advisor",
+)
+
+_routers_lock = threading.Lock()
+_routers_included = False
+
+
+def include_routers():
+    """Import every router in ROUTERS and add its routes to `app`, once."""
+    global _routers_included
+    with _routers_lock:
+        if _routers_included:
+            return
+        for module in ROUTERS:
+            app.include_router(import_module(module).router)
+        _routers_included = True
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # The routers load on a worker thread while the database is probed
+    routers = asyncio.create_task(asyncio.to_thread(include_routers))
+    try:
+        async with database.lifespan(app):
+            await routers
+            yield
+    finally:
+        await asyncio.gather(routers, return_exceptions=True)
+
+
+class RoutersMiddleware:
+    """Includes the routers on the first request when no lifespan ran."""
 
-app = FastAPI()
+    def __init__(self, app):
+        self.app = app
 
+    async def __call__(self, scope, receive, send):
+        if not _routers_included and scope["type"] in ("http", "websocket"):
+            await run_in_threadpool(include_routers)
+        await self.app(scope, receive, send)
 
-app.include_router(beers.router)
-app.include_router(orders.router)
-app.include_router(users.router)
-app.include_router(stock.router)
 
-app.include_router(migrator.router)
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(RoutersMiddleware)
+# Added before the timing middleware so it runs inside it, which then counts
+# the time spent compressing
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RequestTimingMiddleware)
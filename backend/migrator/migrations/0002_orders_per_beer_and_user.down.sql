@@ -0,0 +1,5 @@
+DROP INDEX IF EXISTS ix_orders_user_id;
+DROP INDEX IF EXISTS ix_orders_beer_id;
+
+ALTER TABLE orders ADD CONSTRAINT orders_user_id_key UNIQUE (user_id);
+ALTER TABLE orders ADD CONSTRAINT orders_beer_id_key UNIQUE (beer_id);
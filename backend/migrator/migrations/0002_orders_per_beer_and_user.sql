@@ -0,0 +1,5 @@
+ALTER TABLE orders DROP CONSTRAINT IF EXISTS orders_beer_id_key;
+ALTER TABLE orders DROP CONSTRAINT IF EXISTS orders_user_id_key;
+
+CREATE INDEX IF NOT EXISTS ix_orders_beer_id ON orders (beer_id);
+CREATE INDEX IF NOT EXISTS ix_orders_user_id ON orders (user_id);
@@ -0,0 +1,8 @@
+DROP TRIGGER IF EXISTS orders_sales_truncate ON orders;
+DROP TRIGGER IF EXISTS orders_sales_delete ON orders;
+DROP TRIGGER IF EXISTS orders_sales_update ON orders;
+DROP TRIGGER IF EXISTS orders_sales_insert ON orders;
+DROP FUNCTION IF EXISTS orders_sales_summary_truncate();
+DROP FUNCTION IF EXISTS orders_sales_summary();
+DROP TABLE IF EXISTS beer_daily_sales;
+DROP TABLE IF EXISTS beer_sales;
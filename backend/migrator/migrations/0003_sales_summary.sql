@@ -0,0 +1,100 @@
+-- Per-beer sales totals and per-beer daily sales, kept in step with orders
+-- by statement-level triggers so aggregates read O(beers) rows, not orders.
+
+CREATE TABLE beer_sales (
+    beer_id INTEGER PRIMARY KEY REFERENCES beers(beer_id) ON DELETE CASCADE,
+    orders BIGINT NOT NULL DEFAULT 0,
+    units BIGINT NOT NULL DEFAULT 0,
+    revenue FLOAT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE beer_daily_sales (
+    beer_id INTEGER REFERENCES beers(beer_id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    units BIGINT NOT NULL DEFAULT 0,
+    revenue FLOAT NOT NULL DEFAULT 0,
+    PRIMARY KEY (beer_id, day)
+);
+
+CREATE INDEX ix_beer_daily_sales_day ON beer_daily_sales (day);
+
+-- Applies the orders rows changed by one statement as deltas: +1 order per
+-- new row, -1 per old row (an UPDATE is both). Changes are summed per beer
+-- first, so a bulk insert touches each summary row once, in beer_id order.
+CREATE OR REPLACE FUNCTION orders_sales_summary() RETURNS trigger AS $$
+DECLARE
+    changes text;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        changes := 'SELECT beer_id, ordered_at, 1, qty, price FROM new_rows';
+    ELSIF TG_OP = 'DELETE' THEN
+        changes := 'SELECT beer_id, ordered_at, -1, -qty, -price FROM old_rows';
+    ELSE
+        changes := 'SELECT beer_id, ordered_at, 1, qty, price FROM new_rows '
+                   'UNION ALL '
+                   'SELECT beer_id, ordered_at, -1, -qty, -price FROM old_rows';
+    END IF;
+
+    EXECUTE format($sql$
+        INSERT INTO beer_sales AS s (beer_id, orders, units, revenue)
+        SELECT beer_id, sum(orders), sum(qty), sum(coalesce(price, 0))
+        FROM (%s) AS changes (beer_id, ordered_at, orders, qty, price)
+        WHERE beer_id IS NOT NULL
+        GROUP BY beer_id
+        HAVING sum(orders) <> 0 OR sum(qty) <> 0 OR sum(coalesce(price, 0)) <> 0
+        ORDER BY beer_id
+        ON CONFLICT (beer_id) DO UPDATE SET
+            orders = s.orders + EXCLUDED.orders,
+            units = s.units + EXCLUDED.units,
+            revenue = s.revenue + EXCLUDED.revenue
+    $sql$, changes);
+
+    EXECUTE format($sql$
+        INSERT INTO beer_daily_sales AS d (beer_id, day, units, revenue)
+        SELECT beer_id, ordered_at::date, sum(qty), sum(coalesce(price, 0))
+        FROM (%s) AS changes (beer_id, ordered_at, orders, qty, price)
+        WHERE beer_id IS NOT NULL AND ordered_at IS NOT NULL
+        GROUP BY beer_id, ordered_at::date
+        HAVING sum(orders) <> 0 OR sum(qty) <> 0 OR sum(coalesce(price, 0)) <> 0
+        ORDER BY beer_id, ordered_at::date
+        ON CONFLICT (beer_id, day) DO UPDATE SET
+            units = d.units + EXCLUDED.units,
+            revenue = d.revenue + EXCLUDED.revenue
+    $sql$, changes);
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION orders_sales_summary_truncate() RETURNS trigger AS $$
+BEGIN
+    TRUNCATE beer_sales, beer_daily_sales;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER orders_sales_insert AFTER INSERT ON orders
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_sales_summary();
+CREATE TRIGGER orders_sales_update AFTER UPDATE ON orders
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_sales_summary();
+CREATE TRIGGER orders_sales_delete AFTER DELETE ON orders
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_sales_summary();
+CREATE TRIGGER orders_sales_truncate AFTER TRUNCATE ON orders
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_sales_summary_truncate();
+
+-- The triggers hold a lock that blocks writes to orders until this
+-- migration commits, so nothing is missed or counted twice here.
+INSERT INTO beer_sales (beer_id, orders, units, revenue)
+SELECT beer_id, count(*), sum(qty), sum(coalesce(price, 0))
+FROM orders
+WHERE beer_id IS NOT NULL
+GROUP BY beer_id;
+
+INSERT INTO beer_daily_sales (beer_id, day, units, revenue)
+SELECT beer_id, ordered_at::date, sum(qty), sum(coalesce(price, 0))
+FROM orders
+WHERE beer_id IS NOT NULL AND ordered_at IS NOT NULL
+GROUP BY beer_id, ordered_at::date;
@@ -0,0 +1,3 @@
+DROP TRIGGER IF EXISTS stock_notify_update ON stock;
+DROP TRIGGER IF EXISTS stock_notify_insert_delete ON stock;
+DROP FUNCTION IF EXISTS stock_notify();
@@ -0,0 +1,32 @@
+-- Publish stock changes on the stock_changes channel for /stock/stream.
+-- Notifications are delivered when the writing transaction commits.
+
+CREATE OR REPLACE FUNCTION stock_notify() RETURNS trigger AS $$
+DECLARE
+    changed stock;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+
+    PERFORM pg_notify('stock_changes', json_build_object(
+        'op', lower(TG_OP),
+        'stock_id', changed.stock_id,
+        'beer_id', changed.beer_id,
+        'qty_in_stock', CASE WHEN TG_OP = 'DELETE' THEN NULL ELSE changed.qty_in_stock END
+    )::text);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER stock_notify_insert_delete AFTER INSERT OR DELETE ON stock
+    FOR EACH ROW EXECUTE FUNCTION stock_notify();
+CREATE TRIGGER stock_notify_update AFTER UPDATE ON stock
+    FOR EACH ROW
+    WHEN (
+        OLD.qty_in_stock IS DISTINCT FROM NEW.qty_in_stock
+        OR OLD.beer_id IS DISTINCT FROM NEW.beer_id
+    )
+    EXECUTE FUNCTION stock_notify();
@@ -0,0 +1,11 @@
+-- Drops the partitioned copy and stops repeating writes on it; orders
+-- itself was never changed.
+DROP TRIGGER IF EXISTS orders_mirror_truncate ON orders;
+DROP TRIGGER IF EXISTS orders_mirror ON orders;
+DROP FUNCTION IF EXISTS orders_mirror_truncate();
+DROP FUNCTION IF EXISTS orders_mirror();
+DROP TABLE IF EXISTS orders_partitioned;
+
+DROP FUNCTION IF EXISTS orders_expire_partitions(integer, boolean);
+DROP FUNCTION IF EXISTS orders_create_partitions(integer);
+DROP FUNCTION IF EXISTS orders_create_partition(timestamp);
@@ -0,0 +1,178 @@
+-- Rebuilds orders as a table range-partitioned by month on ordered_at, so
+-- queries bounded on ordered_at only scan the months they cover, and old
+-- months are detached or dropped whole instead of deleted row by row.
+--
+-- Writes keep going to orders while it is rebuilt. This file creates the
+-- partitioned copy, orders_partitioned, and a trigger that repeats every
+-- write to orders on it. 0009_partition_orders_copy.backfill.sql copies
+-- the existing rows in chunks, and 0010_partition_orders_swap.sql renames
+-- the copy to orders in one short transaction.
+
+-- The maintenance functions below work on orders itself, so they run
+-- (through maintain_partitions) only once 0010 has made it partitioned.
+
+-- Creates the partition orders_YYYY_MM for the month containing `month`
+-- and returns its name, or NULL if it already exists. Rows of that month
+-- that landed in orders_default are moved into it first. They move from
+-- partition to partition directly, so the sales summary triggers (which
+-- fire only for statements on orders itself) do not count them twice.
+CREATE OR REPLACE FUNCTION orders_create_partition(month timestamp) RETURNS text AS $$
+DECLARE
+    start_at timestamp := date_trunc('month', month);
+    end_at timestamp := date_trunc('month', month) + interval '1 month';
+    partition_name text := 'orders_' || to_char(month, 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE orders INCLUDING DEFAULTS)', partition_name);
+    EXECUTE format(
+        'WITH moved AS ('
+        '    DELETE FROM orders_default WHERE ordered_at >= %L AND ordered_at < %L'
+        '    RETURNING *'
+        ') INSERT INTO %I SELECT * FROM moved',
+        start_at, end_at, partition_name
+    );
+    EXECUTE format(
+        'ALTER TABLE orders ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, start_at, end_at
+    );
+    RETURN partition_name;
+END
+$$ LANGUAGE plpgsql;
+
+-- Makes sure every month from the oldest row in orders_default (or this
+-- month) through `ahead` months from now has its partition; returns the
+-- partitions it created.
+CREATE OR REPLACE FUNCTION orders_create_partitions(ahead integer) RETURNS SETOF text AS $$
+DECLARE
+    month timestamp;
+    created text;
+BEGIN
+    FOR month IN
+        SELECT generate_series(
+            least(
+                date_trunc('month', localtimestamp),
+                (SELECT date_trunc('month', min(ordered_at))
+                 FROM orders_default WHERE isfinite(ordered_at))
+            ),
+            date_trunc('month', localtimestamp) + make_interval(months => ahead),
+            interval '1 month'
+        )
+    LOOP
+        created := orders_create_partition(month);
+        IF created IS NOT NULL THEN
+            RETURN NEXT created;
+        END IF;
+    END LOOP;
+END
+$$ LANGUAGE plpgsql;
+
+-- Removes the monthly partitions that ended more than `keep_months` months
+-- before the start of this month; returns their names. A detached partition
+-- is kept as the standalone table archived_orders_YYYY_MM. Either way the
+-- sales summaries keep counting those orders until they are rebuilt.
+CREATE OR REPLACE FUNCTION orders_expire_partitions(keep_months integer, detach boolean)
+RETURNS SETOF text AS $$
+DECLARE
+    cutoff timestamp := date_trunc('month', localtimestamp) - make_interval(months => keep_months);
+    partition_name text;
+BEGIN
+    FOR partition_name IN
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = 'orders'::regclass
+            AND child.relname ~ '^orders_\d{4}_\d{2}$'
+            AND to_date(substr(child.relname, 8), 'YYYY_MM') + interval '1 month' <= cutoff
+        ORDER BY child.relname
+    LOOP
+        IF detach THEN
+            EXECUTE format('ALTER TABLE orders DETACH PARTITION %I', partition_name);
+            EXECUTE format('ALTER TABLE %I RENAME TO %I', partition_name, 'archived_' || partition_name);
+        ELSE
+            EXECUTE format('DROP TABLE %I', partition_name);
+        END IF;
+        RETURN NEXT partition_name;
+    END LOOP;
+END
+$$ LANGUAGE plpgsql;
+
+-- The partition key has to be part of the primary key, so it cannot be NULL.
+-- The primary key and indexes get their final names in 0010; the foreign
+-- keys already have them, since their names only need to be unique per table.
+CREATE TABLE orders_partitioned (
+    order_id INTEGER NOT NULL DEFAULT nextval('orders_order_id_seq'),
+    beer_id INTEGER CONSTRAINT orders_beer_id_fkey REFERENCES beers(beer_id),
+    user_id INTEGER CONSTRAINT orders_user_id_fkey REFERENCES users(user_id),
+    qty INTEGER NOT NULL,
+    ordered_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    price FLOAT,
+    CONSTRAINT orders_partitioned_pkey PRIMARY KEY (order_id, ordered_at)
+) PARTITION BY RANGE (ordered_at);
+
+-- Rows outside every monthly partition; orders_create_partitions moves them
+-- into their month's partition once it exists
+CREATE TABLE orders_default PARTITION OF orders_partitioned DEFAULT;
+
+-- A partition for every month from the oldest order through three months
+-- ahead, so the copy lands in the right months straight away
+DO $$
+DECLARE
+    month timestamp;
+BEGIN
+    FOR month IN
+        SELECT generate_series(
+            least(
+                date_trunc('month', localtimestamp),
+                (SELECT date_trunc('month', min(ordered_at)) FROM orders)
+            ),
+            date_trunc('month', localtimestamp) + interval '3 months',
+            interval '1 month'
+        )
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF orders_partitioned FOR VALUES FROM (%L) TO (%L)',
+            'orders_' || to_char(month, 'YYYY_MM'), month, month + interval '1 month'
+        );
+    END LOOP;
+END
+$$;
+
+CREATE INDEX ix_orders_partitioned_beer_id ON orders_partitioned (beer_id);
+CREATE INDEX ix_orders_partitioned_user_id ON orders_partitioned (user_id);
+
+-- Repeats each write to orders on orders_partitioned. An UPDATE can move a
+-- row to another month, so it is a delete and an insert. Rows the copy has
+-- not reached yet are inserted here; the copy then skips them.
+CREATE FUNCTION orders_mirror() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM orders_partitioned
+        WHERE order_id = OLD.order_id
+            AND ordered_at = coalesce(OLD.ordered_at, '-infinity');
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO orders_partitioned (order_id, beer_id, user_id, qty, ordered_at, price)
+        VALUES (
+            NEW.order_id, NEW.beer_id, NEW.user_id, NEW.qty,
+            coalesce(NEW.ordered_at, '-infinity'), NEW.price
+        )
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION orders_mirror_truncate() RETURNS trigger AS $$
+BEGIN
+    TRUNCATE orders_partitioned;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER orders_mirror AFTER INSERT OR UPDATE OR DELETE ON orders
+    FOR EACH ROW EXECUTE FUNCTION orders_mirror();
+CREATE TRIGGER orders_mirror_truncate AFTER TRUNCATE ON orders
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_mirror_truncate();
@@ -0,0 +1,7 @@
+DROP TRIGGER IF EXISTS beers_search_words_update ON beers;
+DROP TRIGGER IF EXISTS beers_search_words_insert ON beers;
+DROP FUNCTION IF EXISTS beer_search_words_add();
+DROP TABLE IF EXISTS beer_search_words;
+DROP INDEX IF EXISTS ix_beers_search_vector;
+ALTER TABLE beers DROP COLUMN IF EXISTS search_vector;
+DROP EXTENSION IF EXISTS pg_trgm;
@@ -0,0 +1,50 @@
+-- Search over the beer catalogue (GET /beers/search): a weighted document
+-- of name and style for ranked full-text and prefix matches, and the
+-- distinct words of those documents with their trigrams, to correct typos.
+--
+-- Adding the stored column rewrites beers, so writes to it wait until this
+-- migration commits.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 'simple' rather than a language config: beer names are mostly proper
+-- nouns, and stemming would break prefix matching ('hazy' is stored as
+-- 'hazi' by 'english', which a search for 'hazy:*' does not find).
+ALTER TABLE beers ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(style, '')), 'B')
+) STORED;
+
+CREATE INDEX ix_beers_search_vector ON beers USING gin (search_vector);
+
+-- Every word that has appeared in a name or style. Matching a misspelled
+-- word against these few thousand rows is much cheaper than against a
+-- million names. Words are only added: one that no beer uses any more
+-- still corrects to a search that finds nothing, as the typo did.
+CREATE TABLE beer_search_words (
+    word TEXT PRIMARY KEY
+);
+
+CREATE INDEX ix_beer_search_words_trgm ON beer_search_words USING gin (word gin_trgm_ops);
+
+CREATE OR REPLACE FUNCTION beer_search_words_add() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO beer_search_words (word)
+    SELECT DISTINCT unnest(tsvector_to_array(search_vector)) FROM new_rows
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- Transition tables cannot be combined with UPDATE OF name, style, so this
+-- runs for every update; the words of unchanged rows are already there.
+CREATE TRIGGER beers_search_words_insert AFTER INSERT ON beers
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION beer_search_words_add();
+CREATE TRIGGER beers_search_words_update AFTER UPDATE ON beers
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION beer_search_words_add();
+
+INSERT INTO beer_search_words (word)
+SELECT DISTINCT unnest(tsvector_to_array(search_vector)) FROM beers
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,3 @@
+ALTER TABLE migrations
+    DROP COLUMN IF EXISTS checksum,
+    DROP COLUMN IF EXISTS duration_ms;
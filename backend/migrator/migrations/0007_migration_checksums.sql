@@ -0,0 +1,5 @@
+-- Checksums and timings of applied migrations. 0001 created the table
+-- without them, and databases set up by it keep that table.
+ALTER TABLE migrations
+    ADD COLUMN IF NOT EXISTS checksum VARCHAR,
+    ADD COLUMN IF NOT EXISTS duration_ms FLOAT;
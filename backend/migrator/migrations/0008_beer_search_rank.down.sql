@@ -0,0 +1,3 @@
+DROP INDEX IF EXISTS ix_beers_search_order;
+DROP INDEX IF EXISTS ix_beers_name_vector;
+ALTER TABLE beers DROP COLUMN IF EXISTS name_vector;
@@ -0,0 +1,22 @@
+-- Rank order for GET /beers/search that an index can produce: beers whose
+-- name has every word of the query first, then the rest of the matches,
+-- each group by name length and beer_id. That is the order ts_rank gives
+-- with a heavier weight on the name and normalization by length, but a
+-- page of it is read off ix_beers_search_order without ranking every
+-- match.
+--
+-- A weight-restricted tsquery on search_vector ('hazy:A') would find the
+-- same name matches, but the planner estimates it as if it matched the
+-- style too, so its own column and statistics are needed. Adding the
+-- stored column rewrites beers, so writes to it wait until this migration
+-- commits.
+
+ALTER TABLE beers ADD COLUMN name_vector tsvector GENERATED ALWAYS AS (
+    to_tsvector('simple', coalesce(name, ''))
+) STORED;
+
+CREATE INDEX ix_beers_name_vector ON beers USING gin (name_vector);
+
+CREATE INDEX ix_beers_search_order ON beers (length(name), beer_id);
+
+ANALYZE beers;
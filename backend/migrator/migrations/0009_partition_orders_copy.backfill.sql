@@ -0,0 +1,13 @@
+-- backfill: orders.order_id
+-- Copies the orders that existed when 0005 ran into orders_partitioned, one
+-- range of order ids per transaction. FOR SHARE makes a write racing the
+-- copy wait for its chunk to commit, so the 0005 trigger then updates or
+-- deletes the copied row; rows that trigger already wrote are skipped.
+-- Orders without a time never showed up in the API (ordered_at is required
+-- there); they are kept, in orders_default, outside every month.
+INSERT INTO orders_partitioned (order_id, beer_id, user_id, qty, ordered_at, price)
+SELECT order_id, beer_id, user_id, qty, coalesce(ordered_at, '-infinity'), price
+FROM orders
+WHERE order_id > :start AND order_id <= :end
+FOR SHARE
+ON CONFLICT DO NOTHING
@@ -0,0 +1,2 @@
+-- Empties the copy again; the 0005 trigger keeps repeating new writes.
+TRUNCATE orders_partitioned;
@@ -0,0 +1,48 @@
+-- Back to a single orders table, with the partitioned one kept as
+-- orders_partitioned and mirrored again, as 0009 left it. The rows are
+-- copied back in one transaction. Rows in partitions that were already
+-- detached (archived_orders_*) stay where they are.
+ALTER TABLE orders RENAME TO orders_partitioned;
+ALTER TABLE orders_partitioned RENAME CONSTRAINT orders_pkey TO orders_partitioned_pkey;
+ALTER INDEX ix_orders_beer_id RENAME TO ix_orders_partitioned_beer_id;
+ALTER INDEX ix_orders_user_id RENAME TO ix_orders_partitioned_user_id;
+DROP TRIGGER orders_sales_insert ON orders_partitioned;
+DROP TRIGGER orders_sales_update ON orders_partitioned;
+DROP TRIGGER orders_sales_delete ON orders_partitioned;
+DROP TRIGGER orders_sales_truncate ON orders_partitioned;
+ALTER SEQUENCE orders_order_id_seq OWNED BY NONE;
+
+CREATE TABLE orders (
+    order_id INTEGER NOT NULL DEFAULT nextval('orders_order_id_seq'),
+    beer_id INTEGER REFERENCES beers(beer_id),
+    user_id INTEGER REFERENCES users(user_id),
+    qty INTEGER NOT NULL,
+    ordered_at TIMESTAMP WITHOUT TIME ZONE,
+    price FLOAT
+);
+
+INSERT INTO orders (order_id, beer_id, user_id, qty, ordered_at, price)
+SELECT order_id, beer_id, user_id, qty, nullif(ordered_at, '-infinity'), price
+FROM orders_partitioned;
+
+ALTER SEQUENCE orders_order_id_seq OWNED BY orders.order_id;
+ALTER TABLE orders ADD PRIMARY KEY (order_id);
+CREATE INDEX ix_orders_beer_id ON orders (beer_id);
+CREATE INDEX ix_orders_user_id ON orders (user_id);
+
+CREATE TRIGGER orders_sales_insert AFTER INSERT ON orders
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_sales_summary();
+CREATE TRIGGER orders_sales_update AFTER UPDATE ON orders
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_sales_summary();
+CREATE TRIGGER orders_sales_delete AFTER DELETE ON orders
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_sales_summary();
+CREATE TRIGGER orders_sales_truncate AFTER TRUNCATE ON orders
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_sales_summary_truncate();
+
+CREATE TRIGGER orders_mirror AFTER INSERT OR UPDATE OR DELETE ON orders
+    FOR EACH ROW EXECUTE FUNCTION orders_mirror();
+CREATE TRIGGER orders_mirror_truncate AFTER TRUNCATE ON orders
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_mirror_truncate();
@@ -1,26 +1,46 @@
 import os
 import logging
+import time
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import IntegrityError, OperationalError
 
 from backend import models, schemas, settings
 
 from backend.database import get_db
-from backend.migrator.migrator_utils import apply_state, list_available_migrations
+from backend.migrator.migrator_utils import (
+    has_checksums,
+    list_partitions,
+    maintain_partitions,
+    rebuild_sales,
+    rollback_migrations,
+    run_migrations,
+)
 
 from backend.utils.error_handler import response_from_error
+from backend.utils.request_metrics import TimedRoute
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-router = APIRouter(prefix="/v1/migrator")
+router = APIRouter(prefix="/v1/migrator", route_class=TimedRoute)
 MIGRATION_FOLDER = os.getenv("MIGRATION_FOLDER", settings.MIGRATION_FOLDER)
 
 
+def migrations_query(db: Session):
+    # Until 0007 is applied the table has no checksum or duration_ms, and
+    # the response leaves them null instead of failing.
+    columns = models.Migration.__table__.columns
+    if not has_checksums(db.connection()):
+        columns = [c for c in columns if c.key not in ("checksum", "duration_ms")]
+    return select(*columns)
+
+
 @router.get(
     "/",
     response_model=list[schemas.Migration],
@@ -30,8 +50,8 @@ MIGRATION_FOLDER = os.getenv("MIGRATION_FOLDER", settings.MIGRATION_FOLDER)
 async def get_migrations(db: Session = Depends(get_db)):
     logging.info("Fetching all migrations from the database...")
     try:
-        query = db.query(models.Migration)
-        migrations = query.all()
+        query = migrations_query(db).order_by(models.Migration.migration_id)
+        migrations = db.execute(query).all()
 
         logging.info(f"Fetched {len(migrations)} migrations.")
         return migrations
@@ -50,11 +70,12 @@ async def get_migrations(db: Session = Depends(get_db)):
 )
 async def get_db_state(db: Session = Depends(get_db)):
     try:
-        last_migration = (
-            db.query(models.Migration)
-            .order_by(models.Migration.date_of_migration.desc())
-            .first()
-        )
+        last_migration = db.execute(
+            migrations_query(db).order_by(
+                models.Migration.date_of_migration.desc(),
+                models.Migration.migration_id.desc(),
+            )
+        ).first()
         if last_migration is None:
             logging.warning("No migrations found in the database.")
             raise HTTPException(status_code=404, detail="No migrations found\n")
@@ -72,11 +93,11 @@ async def get_db_state(db: Session = Depends(get_db)):
     summary="Initialize Database",
     description="Run the initial migration script to set up the database for the first time.",
 )
-async def initialize_database(db: Session = Depends(get_db)) -> dict:
+async def initialize_database() -> dict:
     try:
         logging.info("Initializing Database")
 
-        await apply_state(MIGRATION_FOLDER + "0001_init_db.sql", db)
+        await run_in_threadpool(run_migrations, reset=True)
         return {"detail": "Database initialized successfully!"}
 
     except IntegrityError as e:
@@ -88,44 +109,62 @@ async def initialize_database(db: Session = Depends(get_db)) -> dict:
 @router.post(
     "/migrate",
     status_code=201,
-    response_model=schemas.Migration,
+    response_model=schemas.MigrationRun,
     summary="Apply Pending Migrations",
-    description="Identify and apply all migrations that are pending since the last applied migration.",
+    description="Apply every pending migration under an advisory lock, all in one transaction or `batch_size` files per transaction, and report the time each file took. Backfill files run online in chunks of `backfill_batch_size` keys with `backfill_sleep` seconds between them, and resume where they stopped if interrupted.",
 )
-async def migrate(db: Session = Depends(get_db)):
+async def migrate(
+    db: Session = Depends(get_db),
+    batch_size: int = settings.MIGRATION_BATCH_SIZE,
+    backfill_batch_size: int = settings.MIGRATION_BACKFILL_BATCH_SIZE,
+    backfill_sleep: float = settings.MIGRATION_BACKFILL_SLEEP,
+):
     try:
-        db_state = await get_db_state(db)
-        db_state_filename = getattr(db_state, "migration_filename")
-
-        available_migrations = list_available_migrations()
-        pending_migrations = available_migrations[
-            available_migrations.index(MIGRATION_FOLDER + db_state_filename) + 1 :
-        ]
-        logging.info(f"Found {len(pending_migrations)} pending migrations.")
+        started = time.perf_counter()
+        # Blocks while another worker holds the migration lock, so it runs
+        # in the threadpool rather than on the event loop.
+        applied = await run_in_threadpool(
+            run_migrations,
+            batch_size,
+            backfill_batch_size=backfill_batch_size,
+            backfill_sleep=backfill_sleep,
+        )
+        total_ms = round((time.perf_counter() - started) * 1000, 2)
+        logging.info(f"Applied {len(applied)} migrations in {total_ms} ms.")
 
-        for migration_file in pending_migrations:
-            # Validate before migration the proper sequence is kept
-            db_state = await get_db_state(db)
-            state_id = int(getattr(db_state, "migration_id"))
-            migration_id = int(migration_file.replace(MIGRATION_FOLDER, "")[0:4]) + 1
+        return {
+            "applied": applied,
+            "total_ms": total_ms,
+            "state": await get_db_state(db),
+        }
 
-            if migration_id - state_id != 1:
-                raise HTTPException(
-                    status_code=400, detail="Out of order migration detected."
-                )
+    except IntegrityError as e:
+        code, message = response_from_error(e)
+        logging.error(f"IntegrityError occurred with code {code}. Message: {message}")
+        raise HTTPException(status_code=code, detail=message)
 
-            await apply_state(migration_file, db)
 
-            # Validate sucessful application
-            new_db_state = await get_db_state(db)
-            state_id = int(getattr(new_db_state, "migration_id"))
+@router.post(
+    "/rollback",
+    response_model=schemas.MigrationRollback,
+    summary="Roll Back Migrations",
+    description="Undo the last `steps` applied migrations with their .down.sql files, in one transaction under the migration lock.",
+)
+async def rollback(db: Session = Depends(get_db), steps: int = 1):
+    try:
+        if steps < 1:
+            raise HTTPException(status_code=400, detail="steps must be at least 1\n")
 
-            if state_id != migration_id:
-                raise HTTPException(
-                    status_code=500, detail="Migration did not apply as expected."
-                )
+        started = time.perf_counter()
+        rolled_back = await run_in_threadpool(rollback_migrations, steps)
+        total_ms = round((time.perf_counter() - started) * 1000, 2)
+        logging.info(f"Rolled back {len(rolled_back)} migrations in {total_ms} ms.")
 
-        return await get_db_state(db)
+        return {
+            "rolled_back": rolled_back,
+            "total_ms": total_ms,
+            "state": await get_db_state(db),
+        }
 
     except IntegrityError as e:
         code, message = response_from_error(e)
@@ -133,4 +172,59 @@ async def migrate(db: Session = Depends(get_db)):
         raise HTTPException(status_code=code, detail=message)
 
 
-# TODO: add rollback
+@router.get(
+    "/partitions",
+    response_model=list[schemas.OrderPartition],
+    summary="List Orders Partitions",
+    description="List the partitions of the orders table with their bounds, estimated row count and size.",
+)
+async def get_partitions():
+    return await run_in_threadpool(list_partitions)
+
+
+@router.post(
+    "/partitions",
+    response_model=schemas.PartitionMaintenance,
+    summary="Maintain Orders Partitions",
+    description="Create the orders partitions for the next `ahead` months and detach (or, with `detach=false`, drop) those of months ended more than `retention_months` before the current one; 0 keeps them all. Workers also do this every ORDERS_PARTITION_INTERVAL seconds.",
+)
+async def partitions(
+    ahead: int = settings.ORDERS_PARTITION_AHEAD,
+    retention_months: int = settings.ORDERS_RETENTION_MONTHS,
+    detach: bool = settings.ORDERS_RETENTION_DETACH,
+):
+    if ahead < 0 or retention_months < 0:
+        raise HTTPException(
+            status_code=400, detail="ahead and retention_months cannot be negative\n"
+        )
+
+    result = await run_in_threadpool(
+        maintain_partitions, ahead, retention_months, detach
+    )
+    if result is None:
+        raise HTTPException(
+            status_code=409,
+            detail="Orders is not partitioned yet, or a migration is running\n",
+        )
+    return result
+
+
+@router.post(
+    "/aggregates/rebuild",
+    response_model=schemas.SalesRebuild,
+    summary="Rebuild Sales Aggregates",
+    description="Recompute beer_sales and beer_daily_sales from orders, for when they have drifted (e.g. after loading orders with triggers disabled). Writes to orders wait until it is done; 409 while another rebuild is running, or when orders stays locked for longer than MIGRATION_LOCK_TIMEOUT.",
+)
+async def rebuild_aggregates():
+    try:
+        result = await run_in_threadpool(rebuild_sales)
+    except OperationalError as e:
+        # 55P03 lock_not_available: gave up waiting for the orders lock
+        if getattr(e.orig, "pgcode", None) != "55P03":
+            raise
+        raise HTTPException(status_code=409, detail="Orders is busy, try again\n")
+    if result is None:
+        raise HTTPException(
+            status_code=409, detail="A sales aggregate rebuild is already running\n"
+        )
+    return result
@@ -1,43 +1,63 @@
+import asyncio
 import os
 import glob
+import hashlib
 import logging
+import time
+from contextlib import contextmanager
 
-from fastapi import Depends, HTTPException
+from fastapi import HTTPException
 
 from sqlalchemy import text
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError, OperationalError
 
 from backend import settings
-from backend.database import get_db
+from backend.database import get_engine
 from backend.utils.error_handler import response_from_error
 
 MIGRATION_FOLDER = os.getenv("MIGRATION_FOLDER", settings.MIGRATION_FOLDER)
 
+# pg_advisory_lock key shared by every process that runs migrations
+MIGRATION_LOCK_KEY = 7_294_716_001
 
-async def apply_state(filepath: str, db: Session = Depends(get_db)):
-    try:
-        logging.info(f"Reading migration file: {filepath}")
-        with open(f"{filepath}", "r") as file:
-            init_script = file.read()
-            db.execute(text(init_script))
-            db.commit()
-            logging.info(f"Successfully applied migration from {filepath}")
+# NNNN_name.sql is applied as-is inside a transaction. NNNN_name.backfill.sql
+# is an online backfill: one statement over the key range :start < key <= :end
+# that is run in chunks (see run_backfill, and 0009_partition_orders_copy for
+# an example). NNNN_name.down.sql undoes either.
+DOWN_SUFFIX = ".down.sql"
+BACKFILL_SUFFIX = ".backfill.sql"
 
-    except IntegrityError as e:
-        code, message = response_from_error(e)
-        logging.error(f"IntegrityError occurred with code {code}. Message: {message}")
-        raise HTTPException(status_code=code, detail=message)
+
+def migration_number(filepath: str) -> int:
+    return int(os.path.basename(filepath)[:4])
+
+
+def down_file(filepath: str) -> str:
+    for suffix in (BACKFILL_SUFFIX, ".sql"):
+        if filepath.endswith(suffix):
+            return filepath[: -len(suffix)] + DOWN_SUFFIX
+    return filepath + DOWN_SUFFIX
+
+
+def file_checksum(filepath: str) -> str:
+    # Line endings are normalized so a checkout with CRLF files does not look
+    # like an edited migration.
+    with open(filepath, "rb") as file:
+        content = file.read().replace(b"\r\n", b"\n")
+    return hashlib.sha256(content).hexdigest()
 
 
 def list_available_migrations() -> list:
     try:
         pattern = f"{MIGRATION_FOLDER}*.sql"
-        available_migrations = glob.glob(pattern)
+        available_migrations = [
+            filepath
+            for filepath in glob.glob(pattern)
+            if not filepath.endswith(DOWN_SUFFIX)
+        ]
 
-        available_migrations.sort(
-            key=lambda filename: int(filename.replace(MIGRATION_FOLDER, "")[:4])
-        )
+        available_migrations.sort(key=migration_number)
 
         if len(available_migrations) == 0:
             logging.warning("No migration files found in the migration folder.")
@@ -49,3 +69,532 @@ def list_available_migrations() -> list:
         code, message = response_from_error(e)
         logging.error(f"IntegrityError occurred with code {code}. Message: {message}")
         raise HTTPException(status_code=code, detail=message)
+
+
+@contextmanager
+def migration_lock(conn: Connection):
+    """Hold the migration advisory lock on `conn` for the duration.
+
+    A session-level lock rather than a transaction-level one, so it spans
+    every batch. A second worker blocks here until the first is done and
+    then finds nothing left to apply.
+    """
+    logging.info("Waiting for the migration lock")
+    conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    conn.commit()
+    try:
+        yield
+    finally:
+        conn.rollback()
+        conn.execute(
+            text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY}
+        )
+        conn.commit()
+
+
+def has_checksums(conn: Connection) -> bool:
+    """Whether the migrations table has the columns added by 0007."""
+    return conn.execute(
+        text(
+            "SELECT EXISTS (SELECT FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'migrations' "
+            "AND column_name = 'checksum')"
+        )
+    ).scalar()
+
+
+def read_state(conn: Connection) -> dict:
+    """Return {filename: checksum} for every applied migration in one query.
+
+    Before 0007 is applied there is no checksum column, and rows recorded
+    without one have a NULL checksum until adopt_checksums fills it.
+    """
+    exists = conn.execute(text("SELECT to_regclass('migrations')")).scalar()
+    if exists is None:
+        conn.commit()
+        return {}
+
+    checksum = "checksum" if has_checksums(conn) else "NULL"
+    rows = conn.execute(
+        text(f"SELECT migration_filename, {checksum} FROM migrations")
+    ).all()
+    conn.commit()
+    return {filename: checksum for filename, checksum in rows}
+
+
+def adopt_checksums(conn: Connection, applied: dict):
+    if not has_checksums(conn):
+        conn.commit()
+        return
+    missing = [filename for filename, checksum in applied.items() if checksum is None]
+    for filename in missing:
+        filepath = os.path.join(MIGRATION_FOLDER, filename)
+        if os.path.exists(filepath):
+            applied[filename] = file_checksum(filepath)
+            conn.execute(
+                text(
+                    "UPDATE migrations SET checksum = :checksum "
+                    "WHERE migration_filename = :filename"
+                ),
+                {"checksum": applied[filename], "filename": filename},
+            )
+    conn.commit()
+
+
+def pending_migrations(applied: dict, available: list) -> list:
+    """Files not yet applied, after checking the applied ones are unchanged."""
+    for filepath in available:
+        filename = os.path.basename(filepath)
+        checksum = applied.get(filename)
+        if checksum is not None and checksum != file_checksum(filepath):
+            raise HTTPException(
+                status_code=409,
+                detail=f"Migration {filename} was modified after it was applied\n",
+            )
+
+    pending = [f for f in available if os.path.basename(f) not in applied]
+    latest = max(
+        (migration_number(f) for f in available if os.path.basename(f) in applied),
+        default=0,
+    )
+    if any(migration_number(f) < latest for f in pending):
+        raise HTTPException(status_code=400, detail="Out of order migration detected.")
+    return pending
+
+
+def set_timeouts(conn: Connection, lock_timeout: str, statement_timeout: str):
+    # Transaction-local, so they end with the current transaction. A DDL
+    # statement queued behind a long reader gives up after lock_timeout
+    # instead of blocking every write to the table while it waits.
+    conn.execute(
+        text(
+            "SELECT set_config('lock_timeout', :lock_timeout, true), "
+            "set_config('statement_timeout', :statement_timeout, true)"
+        ),
+        {"lock_timeout": lock_timeout, "statement_timeout": statement_timeout},
+    )
+
+
+def execute_script(conn: Connection, filename: str, script: str):
+    # Straight to the DBAPI cursor with no parameters, so the script
+    # reaches Postgres untouched: text() would read "::type" casts and
+    # ":word" in literals as parameters, and "%" would need escaping.
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(script)
+    except Exception as e:
+        logging.error(f"Migration {filename} failed: {str(e).strip()}")
+        raise HTTPException(
+            status_code=500, detail=f"Migration {filename} failed: {str(e).strip()}\n"
+        )
+    finally:
+        cursor.close()
+
+
+def record_migration(conn: Connection, filepath: str, duration_ms: float) -> dict:
+    # 0001 inserts its own row, and until 0007 has run there is nowhere to
+    # keep the checksum and duration.
+    filename = os.path.basename(filepath)
+    checksum = file_checksum(filepath)
+    conn.execute(
+        text(
+            "INSERT INTO migrations (migration_filename, date_of_migration) "
+            "SELECT :filename, clock_timestamp() WHERE NOT EXISTS "
+            "(SELECT 1 FROM migrations WHERE migration_filename = :filename)"
+        ),
+        {"filename": filename},
+    )
+    if has_checksums(conn):
+        conn.execute(
+            text(
+                "UPDATE migrations SET checksum = :checksum, duration_ms = :duration_ms "
+                "WHERE migration_filename = :filename"
+            ),
+            {"filename": filename, "checksum": checksum, "duration_ms": duration_ms},
+        )
+    logging.info(f"Applied {filename} in {duration_ms} ms")
+    return {
+        "migration_filename": filename,
+        "checksum": checksum,
+        "duration_ms": duration_ms,
+    }
+
+
+def apply_files(conn: Connection, files: list) -> list:
+    """Run `files` in the caller's transaction and record each of them."""
+    set_timeouts(
+        conn, settings.MIGRATION_LOCK_TIMEOUT, settings.MIGRATION_STATEMENT_TIMEOUT
+    )
+    applied = []
+    for filepath in files:
+        logging.info(f"Applying migration file: {filepath}")
+        with open(filepath, "r") as file:
+            script = file.read()
+
+        started = time.perf_counter()
+        execute_script(conn, os.path.basename(filepath), script)
+        duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        applied.append(record_migration(conn, filepath, duration_ms))
+    return applied
+
+
+def _backfill_target(script: str) -> tuple[str, str]:
+    # The first line names the table and key column: -- backfill: orders.order_id
+    header = script.lstrip().splitlines()[0]
+    if not header.startswith("-- backfill:"):
+        raise HTTPException(
+            status_code=400,
+            detail="Backfill files must start with '-- backfill: <table>.<key>'\n",
+        )
+    table, key = header.split(":", 1)[1].strip().split(".")
+    return table, key
+
+
+def run_backfill(
+    conn: Connection, filepath: str, batch_size: int, sleep: float
+) -> dict:
+    """Run an online backfill in key-range chunks, one transaction each.
+
+    Progress is committed with every chunk in migration_backfills, so an
+    interrupted backfill resumes after the last finished chunk on the next
+    migrate. Each chunk runs with MIGRATION_LOCK_TIMEOUT and
+    MIGRATION_BACKFILL_STATEMENT_TIMEOUT; one that times out is retried
+    after `sleep`, up to MIGRATION_BACKFILL_RETRIES times. The migration is
+    recorded once the last chunk is done.
+    """
+    filename = os.path.basename(filepath)
+    with open(filepath, "r") as file:
+        script = file.read()
+    table, key = _backfill_target(script)
+
+    with conn.begin():
+        conn.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS migration_backfills ("
+                "migration_filename VARCHAR PRIMARY KEY, "
+                "last_key BIGINT NOT NULL, "
+                "updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP)"
+            )
+        )
+        last_key = conn.execute(
+            text(
+                "SELECT last_key FROM migration_backfills "
+                "WHERE migration_filename = :filename"
+            ),
+            {"filename": filename},
+        ).scalar()
+        if last_key is None:
+            last_key = (
+                conn.execute(text(f"SELECT min({key}) - 1 FROM {table}")).scalar() or 0
+            )
+        max_key = conn.execute(text(f"SELECT max({key}) FROM {table}")).scalar() or 0
+
+    logging.info(
+        f"Backfilling {filename} on {table}.{key} from {last_key} to {max_key}"
+    )
+    started = time.perf_counter()
+    statement = text(script)
+    retries = 0
+    while last_key < max_key:
+        end = min(last_key + batch_size, max_key)
+        try:
+            with conn.begin():
+                set_timeouts(
+                    conn,
+                    settings.MIGRATION_LOCK_TIMEOUT,
+                    settings.MIGRATION_BACKFILL_STATEMENT_TIMEOUT,
+                )
+                conn.execute(statement, {"start": last_key, "end": end})
+                conn.execute(
+                    text(
+                        "INSERT INTO migration_backfills (migration_filename, last_key) "
+                        "VALUES (:filename, :last_key) "
+                        "ON CONFLICT (migration_filename) DO UPDATE "
+                        "SET last_key = :last_key, updated_at = clock_timestamp()"
+                    ),
+                    {"filename": filename, "last_key": end},
+                )
+        except OperationalError as e:
+            # 55P03 lock_not_available, 57014 query_canceled (statement_timeout)
+            if getattr(e.orig, "pgcode", None) not in ("55P03", "57014"):
+                raise
+            retries += 1
+            if retries > settings.MIGRATION_BACKFILL_RETRIES:
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"Backfill {filename} timed out after {table}.{key} = {last_key}; migrate again to resume\n",
+                )
+            logging.warning(f"Backfill {filename} chunk timed out, retrying: {e.orig}")
+            time.sleep(sleep)
+            continue
+
+        retries = 0
+        last_key = end
+        if sleep:
+            time.sleep(sleep)
+
+    duration_ms = round((time.perf_counter() - started) * 1000, 2)
+    with conn.begin():
+        conn.execute(
+            text(
+                "DELETE FROM migration_backfills WHERE migration_filename = :filename"
+            ),
+            {"filename": filename},
+        )
+        return record_migration(conn, filepath, duration_ms)
+
+
+def run_migrations(
+    batch_size: int = 0,
+    reset: bool = False,
+    backfill_batch_size: int = 0,
+    backfill_sleep: float | None = None,
+) -> list:
+    """Apply every pending migration under the advisory lock.
+
+    State is read once, after the lock is taken. With `batch_size` 0 all
+    pending files run in a single transaction, so a failure leaves the
+    database exactly as it was; otherwise each `batch_size` files commit
+    together. Backfills cannot share a transaction, so each one ends the
+    current batch and runs on its own through run_backfill. `reset` instead
+    re-runs only the first migration, which drops and recreates every table.
+    """
+    available = list_available_migrations()
+    backfill_batch_size = backfill_batch_size or settings.MIGRATION_BACKFILL_BATCH_SIZE
+    if backfill_sleep is None:
+        backfill_sleep = settings.MIGRATION_BACKFILL_SLEEP
+
+    with get_engine().connect() as conn, migration_lock(conn):
+        if reset:
+            pending = available[:1]
+        else:
+            applied_state = read_state(conn)
+            if not applied_state:
+                raise HTTPException(status_code=404, detail="No migrations found\n")
+            adopt_checksums(conn, applied_state)
+            pending = pending_migrations(applied_state, available)
+        logging.info(f"Found {len(pending)} pending migrations.")
+
+        applied = []
+        batch = []
+        for filepath in pending + [None]:
+            if filepath is not None and not filepath.endswith(BACKFILL_SUFFIX):
+                batch.append(filepath)
+                if len(batch) != batch_size:
+                    continue
+            if batch:
+                with conn.begin():
+                    applied += apply_files(conn, batch)
+                batch = []
+            if filepath is not None and filepath.endswith(BACKFILL_SUFFIX):
+                applied.append(
+                    run_backfill(conn, filepath, backfill_batch_size, backfill_sleep)
+                )
+        if applied:
+            # Files applied before 0007 in this run could not record their
+            # checksums yet.
+            adopt_checksums(conn, read_state(conn))
+        return applied
+
+
+def rollback_migrations(steps: int = 1) -> list:
+    """Undo the last `steps` applied migrations with their .down.sql files.
+
+    Runs under the migration lock, in one transaction: either every step is
+    rolled back or none is. Backfill progress from the rolled back
+    migrations on is cleared with them, so a backfill applied again starts
+    over instead of resuming from a cursor into undone data.
+    """
+    with get_engine().connect() as conn, migration_lock(conn):
+        applied_state = read_state(conn)
+        adopt_checksums(conn, applied_state)
+        latest = sorted(applied_state, key=migration_number, reverse=True)[:steps]
+
+        rolled_back = []
+        with conn.begin():
+            set_timeouts(
+                conn,
+                settings.MIGRATION_LOCK_TIMEOUT,
+                settings.MIGRATION_STATEMENT_TIMEOUT,
+            )
+            for filename in latest:
+                filepath = down_file(os.path.join(MIGRATION_FOLDER, filename))
+                if not os.path.exists(filepath):
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Migration {filename} has no {os.path.basename(filepath)} to roll back with\n",
+                    )
+                logging.info(f"Rolling back {filename} with {filepath}")
+                with open(filepath, "r") as file:
+                    script = file.read()
+
+                started = time.perf_counter()
+                execute_script(conn, os.path.basename(filepath), script)
+                duration_ms = round((time.perf_counter() - started) * 1000, 2)
+                conn.execute(
+                    text("DELETE FROM migrations WHERE migration_filename = :filename"),
+                    {"filename": filename},
+                )
+                logging.info(f"Rolled back {filename} in {duration_ms} ms")
+                rolled_back.append(
+                    {
+                        "migration_filename": filename,
+                        "checksum": applied_state[filename],
+                        "duration_ms": duration_ms,
+                    }
+                )
+            if (
+                latest
+                and conn.execute(
+                    text("SELECT to_regclass('migration_backfills')")
+                ).scalar()
+            ):
+                # Interrupted backfills after the rolled back migrations
+                # too: they are left pending and would resume on the
+                # restored schema.
+                conn.execute(
+                    text(
+                        "DELETE FROM migration_backfills "
+                        "WHERE substr(migration_filename, 1, 4) >= :first"
+                    ),
+                    {"first": f"{migration_number(latest[-1]):04d}"},
+                )
+        return rolled_back
+
+
+# Separate from MIGRATION_LOCK_KEY: a rebuild can run alongside migrations
+SALES_REBUILD_LOCK_KEY = 7_294_716_002
+
+# Recomputes the summaries from orders, for when they have drifted (e.g.
+# after loading orders with triggers disabled). Writes to orders wait.
+CLEAR_SALES = [
+    text("LOCK TABLE orders IN SHARE ROW EXCLUSIVE MODE"),
+    text("DELETE FROM beer_daily_sales"),
+    text("DELETE FROM beer_sales"),
+]
+
+FILL_BEER_SALES = text("""
+    INSERT INTO beer_sales (beer_id, orders, units, revenue)
+    SELECT beer_id, count(*), sum(qty), sum(coalesce(price, 0))
+    FROM orders
+    WHERE beer_id IS NOT NULL
+    GROUP BY beer_id
+    """)
+
+FILL_DAILY_SALES = text("""
+    INSERT INTO beer_daily_sales (beer_id, day, units, revenue)
+    SELECT beer_id, ordered_at::date, sum(qty), sum(coalesce(price, 0))
+    FROM orders
+    WHERE beer_id IS NOT NULL AND ordered_at IS NOT NULL
+    GROUP BY beer_id, ordered_at::date
+    """)
+
+
+def rebuild_sales() -> dict | None:
+    """Refill beer_sales and beer_daily_sales from orders in one transaction.
+
+    Takes the rebuild lock without waiting: returns None, doing nothing,
+    while another rebuild holds it, so rebuilds never queue up behind each
+    other on the orders lock. Waiting for that lock is bounded by
+    MIGRATION_LOCK_TIMEOUT.
+    """
+    with get_engine().connect() as conn, conn.begin():
+        set_timeouts(
+            conn, settings.MIGRATION_LOCK_TIMEOUT, settings.MIGRATION_STATEMENT_TIMEOUT
+        )
+        locked = conn.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"),
+            {"key": SALES_REBUILD_LOCK_KEY},
+        ).scalar()
+        if not locked:
+            return None
+
+        for statement in CLEAR_SALES:
+            conn.execute(statement)
+        beers = conn.execute(FILL_BEER_SALES).rowcount
+        days = conn.execute(FILL_DAILY_SALES).rowcount
+    logging.info(f"Rebuilt sales aggregates: {beers} beers, {days} beer-days")
+    return {"beers": beers, "days": days}
+
+
+ORDER_PARTITIONS = text(
+    "SELECT child.relname AS name, "
+    "pg_get_expr(child.relpartbound, child.oid) AS bounds, "
+    "greatest(child.reltuples, 0)::bigint AS rows_estimate, "
+    "pg_total_relation_size(child.oid) AS bytes "
+    "FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+    "WHERE pg_inherits.inhparent = to_regclass('orders') "
+    "ORDER BY child.relname"
+)
+
+
+def orders_partitioned(conn: Connection) -> bool:
+    relkind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass('orders')")
+    ).scalar()
+    return relkind == "p"
+
+
+def list_partitions() -> list:
+    with get_engine().connect() as conn:
+        return [dict(row) for row in conn.execute(ORDER_PARTITIONS).mappings()]
+
+
+def maintain_partitions(
+    ahead: int = settings.ORDERS_PARTITION_AHEAD,
+    retention_months: int = settings.ORDERS_RETENTION_MONTHS,
+    detach: bool = settings.ORDERS_RETENTION_DETACH,
+) -> dict | None:
+    """Create the next `ahead` months of orders partitions and expire old ones.
+
+    Partitions of months that ended more than `retention_months` before the
+    current one are detached or dropped (0 keeps them all). Takes the
+    migration lock without waiting: returns None, doing nothing, while a
+    migration or another worker holds it, or before orders is partitioned.
+    """
+    with get_engine().connect() as conn, conn.begin():
+        set_timeouts(
+            conn, settings.MIGRATION_LOCK_TIMEOUT, settings.MIGRATION_STATEMENT_TIMEOUT
+        )
+        locked = conn.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY}
+        ).scalar()
+        if not locked or not orders_partitioned(conn):
+            return None
+
+        created = (
+            conn.execute(
+                text("SELECT orders_create_partitions(:ahead)"), {"ahead": ahead}
+            )
+            .scalars()
+            .all()
+        )
+        expired = []
+        if retention_months > 0:
+            expired = (
+                conn.execute(
+                    text("SELECT orders_expire_partitions(:keep, :detach)"),
+                    {"keep": retention_months, "detach": detach},
+                )
+                .scalars()
+                .all()
+            )
+
+    if created:
+        logging.info(f"Created orders partitions: {', '.join(created)}")
+    if expired:
+        action = "Detached" if detach else "Dropped"
+        logging.info(f"{action} expired orders partitions: {', '.join(expired)}")
+    return {"created": created, "expired": expired}
+
+
+async def maintain_partitions_forever(
+    interval: float = settings.ORDERS_PARTITION_INTERVAL,
+):
+    """Run maintain_partitions now and then every `interval` seconds."""
+    while interval > 0:
+        try:
+            await asyncio.to_thread(maintain_partitions)
+        except Exception as e:
+            logging.warning(f"Orders partition maintenance failed: {str(e).strip()}")
+        await asyncio.sleep(interval)
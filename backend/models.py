@@ -23,12 +23,15 @@ class User(Base):
 
 
 class Order(Base):
+    # Partitioned by month on ordered_at (migrations 0005-0010), so the
+    # partition key is part of the primary key. order_id alone is still
+    # unique: it comes from one sequence.
     __tablename__ = "orders"
-    order_id = Column(Integer, index=True, primary_key=True)
-    beer_id = Column(Integer, ForeignKey("beers.beer_id"), unique=True)
-    user_id = Column(Integer, ForeignKey("users.user_id"), unique=True)
-    qty = Column(Integer)
-    ordered_at = Column(DateTime)
+    order_id = Column(Integer, primary_key=True, autoincrement=True)
+    beer_id = Column(Integer, ForeignKey("beers.beer_id"), index=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"), index=True)
+    qty = Column(Integer, nullable=False)
+    ordered_at = Column(DateTime, primary_key=True)
     price = Column(Float)
 
 
@@ -45,3 +48,5 @@ class Migration(Base):
     migration_id = Column(Integer, index=True, primary_key=True)
     migration_filename = Column(String)
     date_of_migration = Column(DateTime)
+    checksum = Column(String, nullable=True)
+    duration_ms = Column(Float, nullable=True)
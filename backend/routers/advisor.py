@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends
+
+from backend import models
+from backend.database import DBSession, get_session
+from backend.routers.handler_factory import execute
+from backend.utils.index_advisor import INDEXES, report
+from backend.utils.request_metrics import TimedRoute
+
+router = APIRouter(prefix="/v1/advisor", route_class=TimedRoute)
+
+MODELS = [models.Beer, models.Order, models.Stock, models.User]
+
+
+@router.get(
+    "/indexes",
+    summary="Index Advice",
+    description="List existing indexes, columns without one, and the filter/sort combinations seen by this worker that no index supports.",
+)
+async def get_index_advice(db: DBSession = Depends(get_session)) -> dict:
+    tables = [model.__tablename__ for model in MODELS]
+    result = await execute(db, INDEXES, {"tables": tables})
+    return report(MODELS, [dict(row) for row in result.mappings()])
@@ -0,0 +1,95 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import text
+
+from backend import schemas
+from backend.database import DBSession, get_session
+from backend.routers.handler_factory import execute
+from backend.utils.request_metrics import TimedRoute
+
+router = APIRouter(prefix="/aggregates", route_class=TimedRoute)
+
+# beer_sales and beer_daily_sales are kept up to date by triggers on orders
+# (migration 0003), so these read one row per beer (per day for the sales
+# rate) instead of scanning orders.
+BEER_SALES = """
+    SELECT
+        beers.beer_id,
+        beers.name,
+        beers.style,
+        coalesce(sales.orders, 0) AS orders,
+        coalesce(sales.units, 0) AS units_sold,
+        coalesce(sales.revenue, 0) AS revenue,
+        stock.qty_in_stock,
+        coalesce(recent.units, 0)::float / CAST(:days AS integer) AS units_per_day,
+        stock.qty_in_stock
+            / nullif(recent.units::float / CAST(:days AS integer), 0)
+            AS days_of_stock_left
+    FROM beers
+    LEFT JOIN beer_sales AS sales ON sales.beer_id = beers.beer_id
+    LEFT JOIN stock ON stock.beer_id = beers.beer_id
+    LEFT JOIN (
+        SELECT beer_id, sum(units) AS units
+        FROM beer_daily_sales
+        WHERE day > current_date - CAST(:days AS integer)
+        GROUP BY beer_id
+    ) AS recent ON recent.beer_id = beers.beer_id
+    WHERE CAST(:style AS varchar) IS NULL OR beers.style = :style
+    ORDER BY {order}
+    LIMIT :limit OFFSET :skip
+"""
+
+BEER_SALES_ORDER = {
+    "beer_id": "beers.beer_id",
+    "revenue": "revenue DESC, beers.beer_id",
+    "units_sold": "units_sold DESC, beers.beer_id",
+    "days_of_stock_left": "days_of_stock_left NULLS LAST, beers.beer_id",
+}
+
+STYLE_SALES = text("""
+    SELECT
+        beers.style,
+        count(*) AS beers,
+        coalesce(sum(sales.orders), 0)::bigint AS orders,
+        coalesce(sum(sales.units), 0)::bigint AS units_sold,
+        coalesce(sum(sales.revenue), 0) AS revenue
+    FROM beers
+    LEFT JOIN beer_sales AS sales ON sales.beer_id = beers.beer_id
+    GROUP BY beers.style
+    ORDER BY units_sold DESC, beers.style
+    """)
+
+# Rebuilding the summaries locks orders, so it lives with the other
+# maintenance endpoints: POST /v1/migrator/aggregates/rebuild.
+
+
+@router.get("/beers", response_model=list[schemas.BeerSales])
+async def get_beer_sales(
+    db: DBSession = Depends(get_session),
+    days: int = 30,
+    sort: Literal["beer_id", "revenue", "units_sold", "days_of_stock_left"] = "revenue",
+    style: str | None = None,
+    skip: int = 0,
+    limit: int = 100,
+):
+    """Revenue and units sold per beer, with days of stock left.
+
+    Days of stock left is the stock on hand over the average units sold per
+    day in the last `days` days; null when nothing sold in that window.
+    """
+    statement = text(BEER_SALES.format(order=BEER_SALES_ORDER[sort]))
+    params = {
+        "days": max(days, 1),
+        "style": style,
+        "skip": skip,
+        "limit": limit,
+    }
+    result = await execute(db, statement, params)
+    return result.mappings().all()
+
+
+@router.get("/styles", response_model=list[schemas.StyleSales])
+async def get_style_sales(db: DBSession = Depends(get_session)):
+    result = await execute(db, STYLE_SALES)
+    return result.mappings().all()
@@ -1,52 +1,254 @@
 import os
+import re
 
 from fastapi import APIRouter, Depends, HTTPException, Response, Request
 
-from sqlalchemy.orm import Session
+from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
 
-from backend.database import get_db
+from backend.database import DBSession, get_session
 from backend import models, schemas, settings
 
 from backend.utils.error_handler import response_from_error
+from backend.utils.request_metrics import TimedRoute
 from backend.routers.handler_factory import (
+    cache_key,
+    execute,
+    ExportFormat,
+    export_all,
     get_all,
     get_one,
     create_one,
     delete_one,
     update_one,
+    create_many,
+    update_many,
+    delete_many,
 )
+from backend.utils.cache import CACHE_HITS, CACHE_MISSES, MISSING, response_cache
 
 PAGE_LIMIT = int(os.getenv("BEER_PAGE_LIMIT", settings.BEER_PAGE_LIMIT))
 
-router = APIRouter(prefix="/beers")
+router = APIRouter(prefix="/beers", route_class=TimedRoute)
+
+# search_vector, beer_search_words and their indexes come from migration
+# 0006, name_vector and ix_beers_search_order from 0008. Beers whose name
+# has every word come first, then the other matches; each group is in
+# (length(name), beer_id) order. That is the order ts_rank would give with
+# the name weighted above the style and normalization by length, but it
+# can be read off ix_beers_search_order: a common word stops after a page
+# of matches instead of ranking every one of them (50-470 ms on a million
+# beers), and a rare one is sorted after its GIN lookup. Each group is
+# limited to :window (skip + limit) so the planner picks between the two
+# per page.
+SEARCH_BEERS = text("""
+    (
+        SELECT beer_id, name, style, abv, price
+        FROM beers
+        WHERE name_vector @@ to_tsquery('simple', :query)
+        ORDER BY length(name), beer_id
+        LIMIT :window
+    )
+    UNION ALL
+    (
+        SELECT beer_id, name, style, abv, price
+        FROM beers
+        WHERE search_vector @@ to_tsquery('simple', :query)
+            AND NOT name_vector @@ to_tsquery('simple', :query)
+        ORDER BY length(name), beer_id
+        LIMIT :window
+    )
+    LIMIT :limit OFFSET :skip
+    """)
+
+# Each term replaced by the most similar word of the catalogue, or kept
+# when no word is similar enough (pg_trgm.similarity_threshold)
+CORRECT_TERMS = text("""
+    SELECT coalesce(
+        (
+            SELECT word
+            FROM beer_search_words
+            WHERE word % term
+            ORDER BY similarity(word, term) DESC, word
+            LIMIT 1
+        ),
+        term
+    )
+    FROM unnest(CAST(:terms AS text[])) WITH ORDINALITY AS terms (term, position)
+    ORDER BY position
+    """)
+
+
+def _search_terms(q: str) -> list:
+    # The words to_tsvector('simple', ...) would find: runs of letters and
+    # digits, lower-cased, so nothing in q is read as tsquery syntax
+    return re.findall(r"[^\W_]+", q.lower())
+
+
+def _tsquery(terms: list) -> str:
+    # Every term has to match; the last one only as a prefix, for input
+    # that is still being typed
+    return " & ".join(terms[:-1] + [terms[-1] + ":*"])
+
+
+async def _search(db: DBSession, terms: list, skip: int, limit: int) -> list:
+    result = await execute(
+        db,
+        SEARCH_BEERS,
+        {
+            "query": _tsquery(terms),
+            "window": skip + limit,
+            "skip": skip,
+            "limit": limit,
+        },
+    )
+    return [dict(row) for row in result.mappings()]
 
 
 @router.get("/", response_model=list[schemas.Beer])
 async def get_beers(
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: DBSession = Depends(get_session),
     skip: int = 0,
     limit: int = PAGE_LIMIT,
+    cursor: str | None = None,
 ):
-    return await get_all(models.Beer, request, db, skip, limit)
+    return await get_all(
+        models.Beer,
+        request,
+        db,
+        skip,
+        limit,
+        response,
+        cursor,
+        cached=True,
+        schema=schemas.Beer,
+    )
+
+
+@router.get("/search", response_model=list[schemas.Beer])
+async def search_beers(
+    q: str,
+    response: Response,
+    db: DBSession = Depends(get_session),
+    skip: int = 0,
+    limit: int = PAGE_LIMIT,
+):
+    """Beers whose name and style contain every word of `q`, best first.
+
+    The last word also matches as a prefix, so the endpoint can back an
+    autocomplete. Beers with every word in the name rank above the rest,
+    shorter names first. When nothing matches, each word is swapped for the
+    closest word in the catalogue and the search runs again; the words
+    actually searched for are then returned in the X-Search-Query header.
+
+    Every match can be paged to; deep pages of a common word cost more,
+    as the index is read up to skip + limit.
+    """
+    if skip < 0 or limit < 1:
+        raise HTTPException(
+            status_code=400, detail="skip must be at least 0 and limit at least 1\n"
+        )
+    terms = _search_terms(q)
+    if not terms:
+        return []
+
+    key = await cache_key(
+        models.Beer, db, "search", f"{skip}:{limit}:{' '.join(terms)}"
+    )
+    page = await response_cache.get(key)
+    counter = CACHE_MISSES if page is MISSING else CACHE_HITS
+    counter.inc(model=models.Beer.__name__)
+
+    if page is MISSING:
+        items = await _search(db, terms, skip, limit)
+        corrected = None
+        # A page past the last match is empty too; only a query that
+        # matches nothing at all is corrected
+        if not items and (skip == 0 or not await _search(db, terms, 0, 1)):
+            result = await execute(db, CORRECT_TERMS, {"terms": terms})
+            suggestion = list(result.scalars())
+            if suggestion != terms:
+                items = await _search(db, suggestion, skip, limit)
+                corrected = " ".join(suggestion) if items else None
+        page = {"items": items, "corrected": corrected}
+        await response_cache.set(key, page)
+
+    if page["corrected"] is not None:
+        response.headers["X-Search-Query"] = page["corrected"]
+    return page["items"]
+
+
+@router.get("/export")
+async def export_beers(request: Request, format: ExportFormat = "ndjson"):
+    return await export_all(models.Beer, schemas.Beer, request, format)
+
+
+@router.post("/bulk", response_model=schemas.BulkResult[schemas.Beer], status_code=201)
+async def create_beers(
+    beers: list[schemas.BeerCreate],
+    response: Response,
+    db: DBSession = Depends(get_session),
+):
+    return await create_many(models.Beer, beers, db, response)
+
+
+@router.patch("/bulk", response_model=schemas.BulkResult[schemas.Beer])
+async def update_beers(
+    beers: list[schemas.Beer],
+    response: Response,
+    db: DBSession = Depends(get_session),
+):
+    return await update_many(models.Beer, beers, db, "beer_id", response)
+
+
+@router.delete("/bulk", response_model=schemas.BulkResult[int])
+async def delete_beers(
+    body: schemas.BulkDelete,
+    response: Response,
+    db: DBSession = Depends(get_session),
+):
+    return await delete_many(models.Beer, body.ids, db, "beer_id", response)
 
 
 @router.get("/{beer_id}", response_model=schemas.Beer)
-async def get_beer_by_id(beer_id: int, db: Session = Depends(get_db)):
-    return await get_one(models.Beer, beer_id, db, "beer_id")
+async def get_beer_by_id(
+    beer_id: int,
+    request: Request,
+    response: Response,
+    db: DBSession = Depends(get_session),
+):
+    return await get_one(
+        models.Beer,
+        beer_id,
+        db,
+        "beer_id",
+        cached=True,
+        request=request,
+        response=response,
+    )
 
 
 @router.post("/", response_model=schemas.Beer, status_code=201)
-async def create_beer(beer: schemas.BeerCreate, db: Session = Depends(get_db)):
+async def create_beer(beer: schemas.BeerCreate, db: DBSession = Depends(get_session)):
     return await create_one(models.Beer, beer, db)
 
 
 @router.delete("/{beer_id}")
-async def delete_beer(beer_id: int, db: Session = Depends(get_db)):
+async def delete_beer(beer_id: int, db: DBSession = Depends(get_session)):
     return await delete_one(models.Beer, beer_id, db, "beer_id")
 
 
 @router.put("/{beer_id}", response_model=schemas.Beer)
-async def update_beer(beer_id: int, beer: schemas.Beer, db: Session = Depends(get_db)):
+async def update_beer(
+    beer_id: int, beer: schemas.Beer, db: DBSession = Depends(get_session)
+):
     return await update_one(models.Beer, beer, beer_id, db, "beer_id")
+
+
+@router.patch("/{beer_id}", response_model=schemas.Beer)
+async def patch_beer(
+    beer_id: int, beer: schemas.BeerPatch, db: DBSession = Depends(get_session)
+):
+    return await update_one(models.Beer, beer, beer_id, db, "beer_id", partial=True)
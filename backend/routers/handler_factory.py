@@ -1,54 +1,622 @@
-from pydantic import BaseModel
-from typing import Type, List
+import csv
+import io
+import json
+import time
+from functools import lru_cache
+from urllib.parse import urlencode
+
+from pydantic import BaseModel, TypeAdapter, create_model
+from typing import Literal, Type, List
 
 from fastapi import Depends, HTTPException, Response, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    and_,
+    bindparam,
+    delete,
+    false,
+    func,
+    insert,
+    inspect,
+    literal,
+    or_,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.declarative import DeclarativeMeta
 
-from backend.database import get_db
+from backend import schemas, settings
+from backend.database import (
+    REPLICA_ERRORS,
+    DBSession,
+    get_session,
+    init_db,
+    on_primary,
+    read_async_session,
+    read_replica,
+    read_session,
+)
 
-from backend.utils.query_to_filters import query_to_filters
+from backend.utils.cache import CACHE_HITS, CACHE_MISSES, MISSING, response_cache
+from backend.utils.conditional import etag_for, is_fresh, not_modified, validators
+from backend.utils.cursor import decode_cursor, encode_cursor
+from backend.utils.fast_json import encode_rows
+from backend.utils.index_advisor import record_query
+from backend.utils.replicas import Replica
+from backend.utils.request_metrics import phase
+from backend.utils.single_flight import read_flights
+from backend.utils.query_to_filters import (
+    coerce_value,
+    compile_filters,
+    compile_sort,
+    queryable_fields,
+)
 from backend.utils.error_handler import response_from_error
 
 
+# The handlers accept either a sync Session or an AsyncSession (DB_ASYNC=1).
+# Only the calls that hit the database differ between the two, so they go
+# through these helpers and everything else stays shared. A sync session's
+# round trips run on the threadpool: on the event loop they would stall
+# every other request, and identical reads could never overlap to share
+# one query (see _single_flight). The handler awaits each call, so the
+# session is still only used by one thread at a time.
+async def execute(db: DBSession, statement, params=None):
+    if isinstance(db, AsyncSession):
+        return await db.execute(statement, params)
+    return await run_in_threadpool(db.execute, statement, params)
+
+
+async def commit(db: DBSession):
+    if isinstance(db, AsyncSession):
+        await db.commit()
+    else:
+        await run_in_threadpool(db.commit)
+
+
+async def rollback(db: DBSession):
+    if isinstance(db, AsyncSession):
+        await db.rollback()
+    else:
+        await run_in_threadpool(db.rollback)
+
+
+async def _begin_nested(db: DBSession):
+    if isinstance(db, AsyncSession):
+        return await db.begin_nested()
+    return await run_in_threadpool(db.begin_nested)
+
+
+async def _end_nested(db: DBSession, savepoint, commit: bool):
+    if isinstance(db, AsyncSession):
+        await (savepoint.commit() if commit else savepoint.rollback())
+    else:
+        await run_in_threadpool(savepoint.commit if commit else savepoint.rollback)
+
+
+async def _refresh(db: DBSession, db_item):
+    if isinstance(db, AsyncSession):
+        await db.refresh(db_item)
+    else:
+        await run_in_threadpool(db.refresh, db_item)
+
+
+async def _delete(db: DBSession, db_item):
+    if isinstance(db, AsyncSession):
+        await db.delete(db_item)
+    else:
+        db.delete(db_item)
+
+
+async def _first_by_id(
+    model: Type[DeclarativeMeta], item_id: int, db: DBSession, id_field: str
+):
+    statement = select(model).filter(getattr(model, id_field) == item_id)
+    result = await execute(db, statement)
+    return result.scalars().first()
+
+
+def as_dict(db_item) -> dict:
+    if isinstance(db_item, dict):
+        return db_item
+    mapper = inspect(db_item).mapper
+    return {attr.key: getattr(db_item, attr.key) for attr in mapper.column_attrs}
+
+
+def _read_target(db: DBSession) -> str:
+    return "primary" if on_primary(db) else "replica"
+
+
+async def cache_key(
+    model: Type[DeclarativeMeta], db: DBSession, kind: str, detail: str
+) -> str:
+    # Every write bumps the table's generation, which orphans all of its
+    # cached entries at once instead of hunting down the affected keys.
+    # Reads from the primary and from replicas are kept apart: a lagging
+    # replica can refill the cache right after a write, and a client that
+    # has to see its own writes (see read_replica) must not be served that.
+    namespace = model.__tablename__
+    generation = await response_cache.generation(namespace)
+    return f"{namespace}:{generation}:{_read_target(db)}:{kind}:{detail}"
+
+
+async def invalidate(model: Type[DeclarativeMeta]):
+    # Before the first await, so no read can join a query from before the
+    # write in between
+    read_flights.detach(model.__tablename__)
+    await response_cache.bump(model.__tablename__)
+
+
+async def _single_flight(
+    model: Type[DeclarativeMeta], db: DBSession, kind: str, detail: str, function
+):
+    """`function()`, shared with identical reads in flight (COALESCE_READS).
+
+    Waiting requests never run a query, so they never check out a pooled
+    connection either. Reads that have to see the primary (a client that
+    just wrote) only share with each other, never with a replica read.
+    """
+    if not settings.COALESCE_READS:
+        return await function()
+    return await read_flights.run(
+        model.__tablename__,
+        f"{_read_target(db)}:{kind}:{detail}",
+        function,
+        model=model.__name__,
+        kind=kind,
+    )
+
+
+def _keyset_clause(sort_keys: tuple, values: list):
+    """Rows strictly after `values` in the order given by `sort_keys`.
+
+    Nullable columns sort NULLS LAST (see SortPlan.order_by): after a value
+    come the greater (or, descending, smaller) values and then the NULLs,
+    and after a NULL only the rows that tie with it.
+    """
+    nullable = any(column.nullable for column, _ in sort_keys)
+    if not nullable and all(desc == sort_keys[0][1] for _, desc in sort_keys):
+        columns = tuple_(*(column for column, _ in sort_keys))
+        bounds = tuple_(
+            *(literal(v, column.type) for (column, _), v in zip(sort_keys, values))
+        )
+        return columns < bounds if sort_keys[0][1] else columns > bounds
+
+    # Mixed directions and NULLs cannot use a row comparison, so spell it
+    # out: (a > x OR a IS NULL) OR (a = x AND b < y) OR ...
+    clauses, ties = [], []
+    for (column, desc), value in zip(sort_keys, values):
+        if value is None:
+            ties.append(column.is_(None))
+            continue
+        after = column < value if desc else column > value
+        if column.nullable:
+            after = or_(after, column.is_(None))
+        clauses.append(and_(*ties, after))
+        ties.append(column == value)
+    return or_(*clauses) if clauses else false()
+
+
+def _parse_fields(model, schema: Type[BaseModel] | None, raw_fields: str | None):
+    if not raw_fields:
+        return None
+    allowed = schema.model_fields if schema is not None else inspect(model).columns
+    fields = tuple(dict.fromkeys(f.strip() for f in raw_fields.split(",") if f.strip()))
+    for field in fields:
+        if field not in allowed:
+            raise HTTPException(status_code=400, detail=f"Unknown field: {field}\n")
+    return fields
+
+
+def _render_projection(schema: Type[BaseModel] | None, fields: tuple, rows: list):
+    with phase("render"):
+        if schema is None:
+            return json.dumps(jsonable_encoder(rows))
+        if settings.FAST_JSON:
+            return encode_rows(schema, fields, rows)
+        adapter = _projection_adapter(schema, fields)
+        return adapter.dump_json(adapter.validate_python(rows))
+
+
+@lru_cache(maxsize=256)
+def _projection_adapter(schema: Type[BaseModel], fields: tuple) -> TypeAdapter:
+    # Same field types as the full response model, so a projected field is
+    # serialized exactly as it would be in the unprojected response.
+    partial = create_model(
+        f"{schema.__name__}Fields",
+        **{field: (schema.model_fields[field].annotation, ...) for field in fields},
+    )
+    return TypeAdapter(list[partial])
+
+
+async def _fetch_page(
+    model: Type[DeclarativeMeta],
+    request: Request,
+    db: DBSession,
+    skip: int,
+    limit: int,
+    cursor: str | None,
+    fields: tuple | None,
+    queryable: frozenset,
+) -> tuple[list, str | None]:
+    plan = compile_filters(model, str(request.url.query), queryable)
+    sort = compile_sort(model, request.query_params.get("sort"), queryable)
+    record_query(model, plan.shape, sort.keys)
+
+    if fields is None:
+        statement = select(model)
+    else:
+        # The sort keys ride along so the next cursor can be built from the
+        # last row; they are dropped again before the response is written.
+        columns = inspect(model).columns
+        selected = dict.fromkeys(fields + sort.fields)
+        statement = select(*(columns[field] for field in selected))
+    statement = plan.apply(statement).order_by(*sort.order_by)
+
+    def rows(result) -> list:
+        return result.scalars().all() if fields is None else _as_dicts(result)
+
+    if cursor is None:
+        statement = statement.offset(skip).limit(limit)
+        return rows(await execute(db, statement, plan.parameters)), None
+
+    after = decode_cursor(cursor, len(sort.keys))
+    if after is not None:
+        values = [
+            coerce_value(column, column.key, value) if isinstance(value, str) else value
+            for (column, _), value in zip(sort.keys, after)
+        ]
+        statement = statement.filter(_keyset_clause(sort.keys, values))
+
+    # One extra row tells us whether there is a next page without a
+    # trailing empty request.
+    statement = statement.limit(limit + 1)
+    items = rows(await execute(db, statement, plan.parameters))
+    if len(items) <= limit:
+        return items, None
+
+    items = items[:limit]
+    last = as_dict(items[-1])
+    return items, encode_cursor([last[field] for field in sort.fields])
+
+
+CountMode = Literal["exact", "estimate"]
+
+
+async def _estimate_rows(db: DBSession, statement) -> int:
+    # The planner's row estimate for the filtered select. EXPLAIN cannot
+    # take bind parameters, so the values are rendered into the SQL (and
+    # colons escaped so text() does not read them as parameters).
+    sql = str(
+        statement.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+    result = await execute(db, text("EXPLAIN (FORMAT JSON) " + sql.replace(":", r"\:")))
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def _count(model: Type[DeclarativeMeta], plan, db: DBSession, mode: str) -> int:
+    if mode == "exact":
+        statement = plan.apply(select(func.count()).select_from(model))
+        return (await execute(db, statement, plan.parameters)).scalar()
+
+    if not plan.clauses:
+        # reltuples is kept current by autovacuum/ANALYZE and is -1 for a
+        # table that has never been analyzed; the planner still estimates
+        # those from the table's size on disk.
+        statement = text(
+            "SELECT reltuples FROM pg_class WHERE oid = to_regclass(:table)"
+        )
+        result = await execute(db, statement, {"table": model.__tablename__})
+        reltuples = result.scalar()
+        if reltuples is not None and reltuples >= 0:
+            return int(reltuples)
+
+    key = inspect(model).primary_key[0]
+    return await _estimate_rows(db, plan.apply(select(key)).params(plan.parameters))
+
+
+async def _total_count(
+    model: Type[DeclarativeMeta],
+    request: Request,
+    db: DBSession,
+    mode: str,
+    queryable: frozenset,
+) -> int:
+    """Rows matching the query-string filters, cached for COUNT_CACHE_TTL.
+
+    The cache key covers only the filters, so paging or re-sorting the same
+    list reuses the count; any write to `model` invalidates it.
+    """
+    plan = compile_filters(model, str(request.url.query), queryable)
+    filters = json.dumps([plan.shape, sorted(plan.parameters.items())], default=str)
+    key = await cache_key(model, db, f"count-{mode}", filters)
+    total = await response_cache.get(key)
+    if total is MISSING:
+        total = await _count(model, plan, db, mode)
+        await response_cache.set(key, total, ttl=settings.COUNT_CACHE_TTL)
+    return total
+
+
 async def get_all(
     model: Type[DeclarativeMeta],
     request: Request,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_session),
     skip: int = 0,
     limit: int = 20,
+    response: Response | None = None,
+    cursor: str | None = None,
+    cached: bool = False,
+    schema: Type[BaseModel] | None = None,
+    queryable: frozenset | None = None,
 ) -> List:
+    """List `model` rows matching the query-string filters.
+
+    Rows are ordered by `sort=` (comma separated, '-' for descending) with
+    the primary key as the final tie-breaker. `fields=` selects only the
+    listed `schema` fields from the database and returns just those. Only
+    the `queryable` fields (by default, the `schema` fields) can be filtered
+    and sorted on.
+
+    Passing `cursor` (empty for the first page) switches from OFFSET paging
+    to keyset paging on the sort keys: `skip` is ignored, and the cursor for
+    the next page is returned in the X-Next-Cursor header (absent on the
+    last page).
+
+    With `cached`, pages are served from the response cache, keyed by the
+    normalized query string, until a write to `model` invalidates them.
+
+    `count=exact` adds an X-Total-Count header from a COUNT(*) with the same
+    filters; `count=estimate` takes it from pg_class.reltuples (unfiltered)
+    or the planner's row estimate (filtered) instead, which costs nothing on
+    large tables but can be off by a few percent.
+
+    With FAST_JSON, a full page is fetched and rendered like a projection of
+    every `schema` field: plain rows encoded straight to bytes, without a
+    pydantic model per row.
+
+    Pages carry an ETag (a hash of their rows) and a Last-Modified (when
+    they were read from the database). A request whose If-None-Match or
+    If-Modified-Since still matches gets an empty 304 instead; with
+    `cached`, both are kept with the page, so that costs no query at all.
+    """
     try:
-        raw_query_string = str(request.url.query)
-        filters = query_to_filters(raw_query_string)
+        if queryable is None:
+            queryable = queryable_fields(model, schema)
+        fields = _parse_fields(model, schema, request.query_params.get("fields"))
+        count_mode = request.query_params.get("count")
+        if count_mode is not None and count_mode not in CountMode.__args__:
+            raise HTTPException(status_code=400, detail="Invalid count mode\n")
+        if fields is None and settings.FAST_JSON and schema is not None:
+            fields = tuple(schema.model_fields)
+
+        page = MISSING
+        query = urlencode(sorted(request.query_params.multi_items()))
+        if cached:
+            key = await cache_key(model, db, "page", f"{skip}:{limit}:{query}")
+            page = await response_cache.get(key)
+            counter = CACHE_MISSES if page is MISSING else CACHE_HITS
+            counter.inc(model=model.__name__)
+
+        async def fetch_page() -> dict:
+            items, next_cursor = await _fetch_page(
+                model, request, db, skip, limit, cursor, fields, queryable
+            )
+            rows = [as_dict(item) for item in items]
+            with phase("etag"):
+                etag = etag_for([rows, next_cursor])
+            page = {
+                "items": rows,
+                "next_cursor": next_cursor,
+                "etag": etag,
+                "modified": time.time(),
+            }
+            if cached:
+                await response_cache.set(key, page)
+            return page
+
+        if page is MISSING:
+            page = await _single_flight(
+                model, db, "page", f"{skip}:{limit}:{query}", fetch_page
+            )
+
+        headers = {}
+        etag = page["etag"]
+        if page["next_cursor"] is not None:
+            headers["X-Next-Cursor"] = page["next_cursor"]
+        if count_mode is not None:
+            total = await _total_count(model, request, db, count_mode, queryable)
+            headers["X-Total-Count"] = str(total)
+            etag = etag_for([etag, total])
+        headers.update(validators(etag, page["modified"]))
+        if is_fresh(request, etag, page["modified"]):
+            return not_modified(headers)
 
-        query = db.query(model)
-        for filter in filters:
-            column = getattr(model, filter["field"], None)
-            if column:
-                query = query.filter(filter["op"](column, filter["value"]))
+        if fields is not None:
+            # A projection no longer matches the route's response_model (and a
+            # FAST_JSON page skips it), so the body is rendered here.
+            rows = [{field: row[field] for field in fields} for row in page["items"]]
+            return Response(
+                _render_projection(schema, fields, rows),
+                media_type="application/json",
+                headers=headers,
+            )
 
-        items = query.offset(skip).limit(limit).all()
-        return items
+        if response is not None:
+            response.headers.update(headers)
+        return page["items"]
 
     except IntegrityError as e:
         code, message = response_from_error(e)
         raise HTTPException(status_code=code, detail=message)
 
 
+ExportFormat = Literal["ndjson", "csv"]
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _serialize_rows(schema: Type[BaseModel], rows, format: ExportFormat) -> str:
+    items = [schema.model_validate(dict(row)).model_dump(mode="json") for row in rows]
+    if format == "csv":
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, fieldnames=list(schema.model_fields)).writerows(items)
+        return buffer.getvalue()
+    return "".join(json.dumps(item) + "\n" for item in items)
+
+
+def _csv_header(schema: Type[BaseModel]) -> str:
+    buffer = io.StringIO()
+    csv.DictWriter(buffer, fieldnames=list(schema.model_fields)).writeheader()
+    return buffer.getvalue()
+
+
+def _stream_rows(
+    statement,
+    params: dict,
+    schema: Type[BaseModel],
+    format: ExportFormat,
+    replica: Replica | None = None,
+):
+    # StreamingResponse drains sync iterators in the threadpool, so the
+    # blocking fetches here stay off the event loop.
+    if format == "csv":
+        yield _csv_header(schema)
+    with read_session(replica) as db:
+        try:
+            result = db.execute(statement, params).mappings()
+            for partition in result.partitions():
+                yield _serialize_rows(schema, partition, format)
+        except REPLICA_ERRORS as e:
+            # As get_routed_db does; the response has already started, so
+            # this export fails, but the next requests skip the replica.
+            if replica:
+                replica.mark_down(e)
+            raise
+
+
+async def _stream_rows_async(
+    statement,
+    params: dict,
+    schema: Type[BaseModel],
+    format: ExportFormat,
+    replica: Replica | None = None,
+):
+    if format == "csv":
+        yield _csv_header(schema)
+    async with read_async_session(replica) as db:
+        try:
+            result = await db.stream(statement, params)
+            async for partition in result.mappings().partitions():
+                yield _serialize_rows(schema, partition, format)
+        except REPLICA_ERRORS as e:
+            if replica:
+                replica.mark_down(e)
+            raise
+
+
+async def export_all(
+    model: Type[DeclarativeMeta],
+    schema: Type[BaseModel],
+    request: Request,
+    format: ExportFormat = "ndjson",
+    queryable: frozenset | None = None,
+) -> StreamingResponse:
+    """Stream every `model` row matching the query-string filters.
+
+    Rows are read through a server-side cursor EXPORT_BATCH_SIZE at a time
+    and written out as they arrive, so memory stays flat regardless of the
+    table size. Only the columns of `schema` are selected and emitted, and
+    only those (or the `queryable` fields, if given) can be filtered on.
+
+    The export runs on its own session: the request-scoped one from
+    get_session may be closed before the body has finished streaming.
+    """
+    columns = [getattr(model, field) for field in schema.model_fields]
+    key = inspect(model).primary_key[0]
+
+    if queryable is None:
+        queryable = queryable_fields(model, schema)
+    plan = compile_filters(model, str(request.url.query), queryable)
+
+    statement = (
+        plan.apply(select(*columns))
+        .order_by(key)
+        .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+    )
+
+    init_db()
+    replica = await read_replica(request)
+    if settings.DB_ASYNC:
+        rows = _stream_rows_async(statement, plan.parameters, schema, format, replica)
+    else:
+        rows = _stream_rows(statement, plan.parameters, schema, format, replica)
+
+    headers = {}
+    if format == "csv":
+        headers["Content-Disposition"] = (
+            f'attachment; filename="{model.__tablename__}.csv"'
+        )
+    return StreamingResponse(
+        rows, media_type=EXPORT_MEDIA_TYPES[format], headers=headers
+    )
+
+
 async def get_one(
     model: Type[DeclarativeMeta],
     item_id: int,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_session),
     id_field: str = "id",
+    cached: bool = False,
+    request: Request | None = None,
+    response: Response | None = None,
 ):
+    """The `model` row with `id_field` = `item_id`, or 404.
+
+    Sets ETag and Last-Modified on `response`, and answers 304 when the
+    validators in `request` still match, as get_all does for pages.
+    """
     try:
-        db_item = db.query(model).filter(getattr(model, id_field) == item_id).first()
-        if db_item is None:
-            raise HTTPException(status_code=404, detail=f"{model.__name__} not found\n")
-        return db_item
+        entry = MISSING
+        if cached:
+            key = await cache_key(model, db, "item", str(item_id))
+            entry = await response_cache.get(key)
+            counter = CACHE_MISSES if entry is MISSING else CACHE_HITS
+            counter.inc(model=model.__name__)
+
+        async def fetch_item() -> dict:
+            db_item = await _first_by_id(model, item_id, db, id_field)
+            if db_item is None:
+                raise HTTPException(
+                    status_code=404, detail=f"{model.__name__} not found\n"
+                )
+            row = as_dict(db_item)
+            entry = {"item": row, "etag": etag_for(row), "modified": time.time()}
+            if cached:
+                await response_cache.set(key, entry)
+            return entry
+
+        if entry is MISSING:
+            entry = await _single_flight(model, db, "item", str(item_id), fetch_item)
+
+        headers = validators(entry["etag"], entry["modified"])
+        if request is not None and is_fresh(request, entry["etag"], entry["modified"]):
+            return not_modified(headers)
+        if response is not None:
+            response.headers.update(headers)
+        return entry["item"]
 
     except IntegrityError as e:
         code, message = response_from_error(e)
@@ -58,13 +626,14 @@ async def get_one(
 async def create_one(
     model: Type[DeclarativeMeta],
     schema: BaseModel,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_session),
 ):
     try:
         db_item = model(**schema.model_dump())
         db.add(db_item)
-        db.commit()
-        db.refresh(db_item)
+        await commit(db)
+        await invalidate(model)
+        await _refresh(db, db_item)
         return db_item
 
     except IntegrityError as e:
@@ -75,15 +644,17 @@ async def create_one(
 async def delete_one(
     model: Type[DeclarativeMeta],
     item_id: int,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_session),
     id_field: str = "id",
 ):
+    """Delete one row with a single DELETE ... RETURNING; 404 if none matched."""
+    key = getattr(model, id_field)
     try:
-        db_item = db.query(model).filter(getattr(model, id_field) == item_id).first()
-        if db_item is None:
+        statement = delete(model).filter(key == item_id).returning(key)
+        if (await execute(db, statement)).first() is None:
             raise HTTPException(status_code=404, detail=f"{model.__name__} not found\n")
-        db.delete(db_item)
-        db.commit()
+        await commit(db)
+        await invalidate(model)
         return Response(status_code=204)
 
     except IntegrityError as e:
@@ -95,22 +666,246 @@ async def update_one(
     model: Type[DeclarativeMeta],
     schema: BaseModel,
     item_id: int,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_session),
     id_field: str = "id",
+    partial: bool = False,
 ):
+    """Update one row with a single UPDATE ... RETURNING; 404 if none matched.
+
+    By default (PUT) None values leave the column untouched. With `partial`
+    (PATCH) exactly the fields sent in the request body are written, so a
+    column can also be cleared to null, and nothing else is touched.
+    """
+    key = getattr(model, id_field)
+    columns = model.__table__.columns
+    if partial:
+        values = schema.model_dump(exclude_unset=True)
+    else:
+        values = {
+            attr: value
+            for attr, value in schema.model_dump().items()
+            if value is not None
+        }
+
     try:
-        db_item = db.query(model).filter(getattr(model, id_field) == item_id).first()
+        if values:
+            statement = (
+                update(model)
+                .filter(key == item_id)
+                .values(**values)
+                .returning(*columns)
+            )
+        else:
+            statement = select(*columns).filter(key == item_id)
+
+        db_item = (await execute(db, statement)).mappings().first()
         if db_item is None:
             raise HTTPException(status_code=404, detail=f"{model.__name__} not found\n")
 
-        for attr, value in schema.model_dump().items():
-            if value is not None:
-                setattr(db_item, attr, value)
-
-        db.commit()
-        db.refresh(db_item)
-        return db_item
+        if values:
+            await commit(db)
+            await invalidate(model)
+        return dict(db_item)
 
     except IntegrityError as e:
         code, message = response_from_error(e)
         raise HTTPException(status_code=code, detail=message)
+
+
+def _bulk_error(index: int, code: int, detail: str) -> schemas.BulkError:
+    return schemas.BulkError(index=index, status_code=code, detail=detail)
+
+
+async def _apply_per_item(
+    model: Type[DeclarativeMeta], db: DBSession, rows: list, run_one
+) -> tuple[list, list]:
+    """Retry a failed batch one row at a time, each inside its own SAVEPOINT.
+
+    This only runs after the batched statement raised, to find out which
+    rows were at fault. Rows that succeed are kept and committed together;
+    the others are reported with the status code and message that
+    response_from_error gives for their IntegrityError.
+    """
+    await rollback(db)
+    items, errors = [], []
+    for index, row in rows:
+        savepoint = await _begin_nested(db)
+        try:
+            items.extend(await run_one(row))
+            await _end_nested(db, savepoint, commit=True)
+        except IntegrityError as e:
+            await _end_nested(db, savepoint, commit=False)
+            code, message = response_from_error(e)
+            errors.append(_bulk_error(index, code, message))
+    await commit(db)
+    await invalidate(model)
+    return items, errors
+
+
+def _as_dicts(result) -> list:
+    # Plain dicts instead of ORM objects: commit() expires instances, and
+    # reloading them one by one would undo the point of batching.
+    return [dict(row) for row in result.mappings()]
+
+
+async def _update_by_key(
+    model: Type[DeclarativeMeta], db: DBSession, id_field: str, rows: list
+):
+    """executemany UPDATE ... WHERE id_field = :key, one per set of columns.
+
+    The ORM's bulk UPDATE would key each row on the full primary key,
+    which for a partitioned table includes the partition column that a
+    PATCH body does not carry.
+    """
+    table = model.__table__
+    groups = {}
+    for row in rows:
+        values = {attr: value for attr, value in row.items() if attr != id_field}
+        if values:
+            groups.setdefault(tuple(values), []).append(row)
+    for attrs, group in groups.items():
+        # Bind names get a prefix so they cannot clash with column names
+        statement = (
+            update(table)
+            .where(table.c[id_field] == bindparam("key_"))
+            .values({attr: bindparam(f"set_{attr}") for attr in attrs})
+        )
+        params = [
+            {"key_": row[id_field], **{f"set_{attr}": row[attr] for attr in attrs}}
+            for row in group
+        ]
+        await execute(db, statement, params)
+
+
+def _bulk_result(items: list, errors: list, response: Response | None) -> dict:
+    if errors and response is not None:
+        response.status_code = 207
+    return {"items": items, "errors": sorted(errors, key=lambda error: error.index)}
+
+
+async def create_many(
+    model: Type[DeclarativeMeta],
+    schema_list: list[BaseModel],
+    db: DBSession = Depends(get_session),
+    response: Response | None = None,
+):
+    """Insert every item with batched multi-row INSERT ... RETURNING.
+
+    All rows go out in one transaction; SQLAlchemy packs them into as few
+    INSERT statements as the driver allows. If the batch hits an integrity
+    error the valid rows are still created and the failing ones are listed
+    in `errors` by their index in the request (HTTP 207).
+    """
+    rows = [item.model_dump() for item in schema_list]
+    columns = model.__table__.columns
+    statement = insert(model).returning(*columns, sort_by_parameter_order=True)
+
+    async def run_one(row):
+        return _as_dicts(await execute(db, statement, [row]))
+
+    try:
+        if not rows:
+            return _bulk_result([], [], response)
+        items = _as_dicts(await execute(db, statement, rows))
+        await commit(db)
+        await invalidate(model)
+        return _bulk_result(items, [], response)
+
+    except IntegrityError:
+        items, errors = await _apply_per_item(model, db, list(enumerate(rows)), run_one)
+        return _bulk_result(items, errors, response)
+
+
+async def update_many(
+    model: Type[DeclarativeMeta],
+    schema_list: list[BaseModel],
+    db: DBSession = Depends(get_session),
+    id_field: str = "id",
+    response: Response | None = None,
+):
+    """Update many rows, matched by `id_field`, in a single transaction.
+
+    Like update_one, None values leave the column untouched. Unknown ids
+    come back as 404 entries in `errors`; the rest are written with one
+    executemany UPDATE keyed on `id_field` per set of changed columns.
+    """
+    key = getattr(model, id_field)
+    columns = model.__table__.columns
+    rows = [
+        {attr: value for attr, value in item.model_dump().items() if value is not None}
+        for item in schema_list
+    ]
+    ids = [row.get(id_field) for row in rows]
+
+    async def run_one(row):
+        await _update_by_key(model, db, id_field, [row])
+        return _as_dicts(
+            await execute(db, select(*columns).filter(key == row[id_field]))
+        )
+
+    errors, pending = [], []
+    try:
+        result = await execute(db, select(key).filter(key.in_(ids)))
+        existing = set(result.scalars().all())
+
+        errors = [
+            _bulk_error(index, 404, f"{model.__name__} not found\n")
+            for index, item_id in enumerate(ids)
+            if item_id not in existing
+        ]
+        pending = [
+            (index, row) for index, row in enumerate(rows) if ids[index] in existing
+        ]
+        if not pending:
+            return _bulk_result([], errors, response)
+
+        await _update_by_key(model, db, id_field, [row for _, row in pending])
+        await commit(db)
+        await invalidate(model)
+
+        statement = select(*columns).filter(key.in_(list(existing))).order_by(key)
+        return _bulk_result(_as_dicts(await execute(db, statement)), errors, response)
+
+    except IntegrityError:
+        items, failed = await _apply_per_item(model, db, pending, run_one)
+        return _bulk_result(items, errors + failed, response)
+
+
+async def delete_many(
+    model: Type[DeclarativeMeta],
+    item_ids: list[int],
+    db: DBSession = Depends(get_session),
+    id_field: str = "id",
+    response: Response | None = None,
+):
+    """Delete every id in `item_ids` with one DELETE ... RETURNING.
+
+    `items` lists the ids that were removed; ids with no row are reported
+    as 404 entries in `errors`.
+    """
+    key = getattr(model, id_field)
+
+    async def run_one(item_id):
+        statement = delete(model).filter(key == item_id).returning(key)
+        return (await execute(db, statement)).scalars().all()
+
+    try:
+        statement = delete(model).filter(key.in_(item_ids)).returning(key)
+        deleted = (await execute(db, statement)).scalars().all()
+        await commit(db)
+        await invalidate(model)
+        errors = []
+
+    except IntegrityError:
+        deleted, errors = await _apply_per_item(
+            model, db, list(enumerate(item_ids)), run_one
+        )
+
+    removed = set(deleted)
+    failed = {error.index for error in errors}
+    errors += [
+        _bulk_error(index, 404, f"{model.__name__} not found\n")
+        for index, item_id in enumerate(item_ids)
+        if item_id not in removed and index not in failed
+    ]
+    return _bulk_result(deleted, errors, response)
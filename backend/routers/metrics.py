@@ -0,0 +1,36 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from backend.utils.metrics import render_prometheus
+from backend.utils.request_metrics import TimedRoute, statement_stats
+from backend.utils.single_flight import coalescing_stats
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Prometheus Metrics",
+    description="Expose connection pool and handler metrics in Prometheus text format.",
+)
+async def get_metrics():
+    return render_prometheus()
+
+
+@router.get(
+    "/metrics/statements",
+    summary="SQL Statement Timings",
+    description="The statements with the most total execution time since startup.",
+)
+async def get_statement_metrics(limit: int = 50):
+    return statement_stats(limit)
+
+
+@router.get(
+    "/metrics/coalescing",
+    summary="Read Coalescing",
+    description="Per read: queries run, identical reads that shared them, and waits that timed out.",
+)
+async def get_coalescing_metrics(limit: int = 50):
+    return coalescing_stats(limit)
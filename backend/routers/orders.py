@@ -2,51 +2,183 @@ import os
 
 from fastapi import APIRouter, Depends, HTTPException, Response, Request
 
-from sqlalchemy.orm import Session
+from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
 
-from backend.database import get_db
+from backend.database import DBSession, get_session
 from backend import models, schemas, settings
 
 from backend.utils.error_handler import response_from_error
+from backend.utils.request_metrics import TimedRoute
 from backend.routers.handler_factory import (
+    ExportFormat,
+    export_all,
     get_all,
     get_one,
     create_one,
     delete_one,
     update_one,
+    create_many,
+    update_many,
+    delete_many,
+    commit,
+    execute,
+    invalidate,
+    rollback,
 )
 
 PAGE_LIMIT = int(os.getenv("ORDERS_PAGE_LIMIT", settings.BEER_PAGE_LIMIT))
 
-router = APIRouter(prefix="/orders")
+router = APIRouter(prefix="/orders", route_class=TimedRoute)
+
+# Reserve the stock and record the order in one statement. The UPDATE only
+# matches while enough stock is left, and its row lock makes concurrent
+# checkouts of the same beer queue up and re-check that condition, so stock
+# can never go below zero. Data-modifying CTEs always run to completion:
+# when no order comes back the caller has to roll the decrement back.
+PLACE_ORDER = text("""
+    WITH reserved AS (
+        UPDATE stock SET qty_in_stock = qty_in_stock - :qty
+        WHERE beer_id = :beer_id AND qty_in_stock >= :qty
+        RETURNING beer_id
+    )
+    INSERT INTO orders (beer_id, user_id, qty, ordered_at, price)
+    SELECT reserved.beer_id, users.user_id, :qty, now(), beers.price * :qty
+    FROM reserved
+    JOIN beers ON beers.beer_id = reserved.beer_id
+    JOIN users ON users.user_id = :user_id
+    RETURNING order_id, beer_id, user_id, qty, ordered_at, price
+    """)
+
+PLACE_ORDER_FAILURE = text("""
+    SELECT
+        (SELECT qty_in_stock FROM stock WHERE beer_id = :beer_id),
+        EXISTS (SELECT 1 FROM users WHERE user_id = :user_id)
+    """)
 
 
 @router.get("/", response_model=list[schemas.Order])
 async def get_orders(
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: DBSession = Depends(get_session),
     skip: int = 0,
     limit: int = PAGE_LIMIT,
+    cursor: str | None = None,
 ):
-    return await get_all(models.Order, request, db, skip, limit)
+    return await get_all(
+        models.Order,
+        request,
+        db,
+        skip,
+        limit,
+        response,
+        cursor,
+        schema=schemas.Order,
+    )
+
+
+@router.get("/export")
+async def export_orders(request: Request, format: ExportFormat = "ndjson"):
+    return await export_all(models.Order, schemas.Order, request, format)
+
+
+@router.post("/bulk", response_model=schemas.BulkResult[schemas.Order], status_code=201)
+async def create_orders(
+    orders: list[schemas.OrderCreate],
+    response: Response,
+    db: DBSession = Depends(get_session),
+):
+    return await create_many(models.Order, orders, db, response)
+
+
+@router.patch("/bulk", response_model=schemas.BulkResult[schemas.Order])
+async def update_orders(
+    orders: list[schemas.Order],
+    response: Response,
+    db: DBSession = Depends(get_session),
+):
+    return await update_many(models.Order, orders, db, "order_id", response)
+
+
+@router.delete("/bulk", response_model=schemas.BulkResult[int])
+async def delete_orders(
+    body: schemas.BulkDelete,
+    response: Response,
+    db: DBSession = Depends(get_session),
+):
+    return await delete_many(models.Order, body.ids, db, "order_id", response)
+
+
+@router.post("/place", response_model=schemas.Order, status_code=201)
+async def place_order(order: schemas.OrderPlace, db: DBSession = Depends(get_session)):
+    """Take `qty` of a beer out of stock and create the order, atomically.
+
+    Priced at the beer's current price. 409 if there is not enough stock,
+    in which case nothing is changed.
+    """
+    try:
+        params = order.model_dump()
+        result = await execute(db, PLACE_ORDER, params)
+        placed = result.mappings().first()
+        if placed is None:
+            await rollback(db)
+            result = await execute(db, PLACE_ORDER_FAILURE, params)
+            in_stock, user_exists = result.first()
+            if in_stock is None:
+                raise HTTPException(status_code=404, detail="Stock not found\n")
+            if not user_exists:
+                raise HTTPException(status_code=404, detail="User not found\n")
+            raise HTTPException(status_code=409, detail="Not enough stock\n")
+
+        await commit(db)
+        await invalidate(models.Stock)
+        await invalidate(models.Order)
+        return dict(placed)
+
+    except IntegrityError as e:
+        code, message = response_from_error(e)
+        raise HTTPException(status_code=code, detail=message)
 
 
 @router.get("/{order_id}", response_model=schemas.Order)
-async def get_order_by_id(order_id: int, db: Session = Depends(get_db)):
-    return await get_one(models.Order, order_id, db, "order_id")
+async def get_order_by_id(
+    order_id: int,
+    request: Request,
+    response: Response,
+    db: DBSession = Depends(get_session),
+):
+    return await get_one(
+        models.Order,
+        order_id,
+        db,
+        "order_id",
+        request=request,
+        response=response,
+    )
 
 
 @router.post("/", response_model=schemas.Order, status_code=201)
-async def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db)):
+async def create_order(
+    order: schemas.OrderCreate, db: DBSession = Depends(get_session)
+):
     return await create_one(models.Order, order, db)
 
 
 @router.delete("/{order_id}")
-async def delete_order(order_id: int, db: Session = Depends(get_db)):
+async def delete_order(order_id: int, db: DBSession = Depends(get_session)):
     return await delete_one(models.Order, order_id, db, "order_id")
 
 
 @router.put("/{order_id}", response_model=schemas.Order)
-async def update(order_id: int, order: schemas.Order, db: Session = Depends(get_db)):
+async def update(
+    order_id: int, order: schemas.Order, db: DBSession = Depends(get_session)
+):
     return await update_one(models.Order, order, order_id, db, "order_id")
+
+
+@router.patch("/{order_id}", response_model=schemas.Order)
+async def patch_order(
+    order_id: int, order: schemas.OrderPatch, db: DBSession = Depends(get_session)
+):
+    return await update_one(models.Order, order, order_id, db, "order_id", partial=True)
@@ -1,55 +1,167 @@
 import os
 
-from fastapi import APIRouter, Depends, HTTPException, Response, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Request
+from fastapi.responses import StreamingResponse
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 
-from backend.database import get_db
+from backend.database import DBSession, get_primary_session, get_session
 from backend import models, schemas, settings
 
 from backend.utils.error_handler import response_from_error
+from backend.utils.request_metrics import TimedRoute
+from backend.utils.stock_stream import STOCK_CHANGES, stream_events
 from backend.routers.handler_factory import (
+    execute,
+    rollback,
+    ExportFormat,
+    export_all,
     get_all,
     get_one,
     create_one,
     delete_one,
     update_one,
+    create_many,
+    update_many,
+    delete_many,
 )
 
-
 PAGE_LIMIT = int(os.getenv("STOCK_PAGE_LIMIT", settings.STOCK_PAGE_LIMIT))
 
-router = APIRouter(prefix="/stock")
+router = APIRouter(prefix="/stock", route_class=TimedRoute)
 
 
 @router.get("/", response_model=list[schemas.Stock])
 async def get_stock(
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: DBSession = Depends(get_session),
     skip: int = 0,
     limit: int = PAGE_LIMIT,
+    cursor: str | None = None,
+):
+    return await get_all(
+        models.Stock,
+        request,
+        db,
+        skip,
+        limit,
+        response,
+        cursor,
+        cached=True,
+        schema=schemas.Stock,
+    )
+
+
+@router.get("/export")
+async def export_stock(request: Request, format: ExportFormat = "ndjson"):
+    return await export_all(models.Stock, schemas.Stock, request, format)
+
+
+@router.get("/stream")
+async def stream_stock(
+    beer_id: list[int] | None = Query(None),
+    db: DBSession = Depends(get_primary_session),
+):
+    """Server-sent events with the stock levels, then every change to them.
+
+    Pass `beer_id` (repeatable) to follow only those beers. Fed by the
+    stock_notify trigger through one LISTEN connection per worker.
+
+    The snapshot is read from the primary, where LISTEN runs: a lagging
+    replica could miss a change whose notification already went by.
+    """
+    if len(STOCK_CHANGES.subscriptions) >= settings.STOCK_STREAM_MAX_SUBSCRIBERS:
+        raise HTTPException(status_code=503, detail="Too many stock streams\n")
+
+    # Subscribe before reading the snapshot, so no change falls in between
+    subscription = await STOCK_CHANGES.subscribe(set(beer_id) if beer_id else None)
+    try:
+        statement = select(
+            models.Stock.stock_id, models.Stock.beer_id, models.Stock.qty_in_stock
+        ).order_by(models.Stock.stock_id)
+        if beer_id:
+            statement = statement.where(models.Stock.beer_id.in_(beer_id))
+        result = await execute(db, statement)
+        snapshot = [dict(row) for row in result.mappings()]
+        # Return the connection to the pool now, not when the stream ends
+        await rollback(db)
+    except BaseException:
+        STOCK_CHANGES.unsubscribe(subscription)
+        raise
+
+    return StreamingResponse(
+        stream_events(subscription, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/bulk", response_model=schemas.BulkResult[schemas.Stock], status_code=201)
+async def create_stock_items(
+    stock: list[schemas.StockCreate],
+    response: Response,
+    db: DBSession = Depends(get_session),
+):
+    return await create_many(models.Stock, stock, db, response)
+
+
+@router.patch("/bulk", response_model=schemas.BulkResult[schemas.Stock])
+async def update_stock_items(
+    stock: list[schemas.Stock],
+    response: Response,
+    db: DBSession = Depends(get_session),
+):
+    return await update_many(models.Stock, stock, db, "stock_id", response)
+
+
+@router.delete("/bulk", response_model=schemas.BulkResult[int])
+async def delete_stock_items(
+    body: schemas.BulkDelete,
+    response: Response,
+    db: DBSession = Depends(get_session),
 ):
-    return await get_all(models.Stock, request, db, skip, limit)
+    return await delete_many(models.Stock, body.ids, db, "stock_id", response)
 
 
 @router.get("/{stock_id}", response_model=schemas.Stock)
-async def get_stock_by_id(stock_id: int, db: Session = Depends(get_db)):
-    return await get_one(models.Stock, stock_id, db, "stock_id")
+async def get_stock_by_id(
+    stock_id: int,
+    request: Request,
+    response: Response,
+    db: DBSession = Depends(get_session),
+):
+    return await get_one(
+        models.Stock,
+        stock_id,
+        db,
+        "stock_id",
+        cached=True,
+        request=request,
+        response=response,
+    )
 
 
 @router.post("/", response_model=schemas.Stock, status_code=201)
-async def create_stock(stock: schemas.Stock, db: Session = Depends(get_db)):
+async def create_stock(stock: schemas.Stock, db: DBSession = Depends(get_session)):
     return await create_one(models.Stock, stock, db)
 
 
 @router.delete("/{stock_id}")
-async def delete_stock(stock_id: int, db: Session = Depends(get_db)):
+async def delete_stock(stock_id: int, db: DBSession = Depends(get_session)):
     return await delete_one(models.Stock, stock_id, db, "stock_id")
 
 
 @router.put("/{stock_id}", response_model=schemas.Stock)
 async def update_stock(
-    stock_id: int, stock: schemas.Stock, db: Session = Depends(get_db)
+    stock_id: int, stock: schemas.Stock, db: DBSession = Depends(get_session)
 ):
     return await update_one(models.Stock, stock, stock_id, db, "stock_id")
+
+
+@router.patch("/{stock_id}", response_model=schemas.Stock)
+async def patch_stock(
+    stock_id: int, stock: schemas.StockPatch, db: DBSession = Depends(get_session)
+):
+    return await update_one(models.Stock, stock, stock_id, db, "stock_id", partial=True)
@@ -2,51 +2,175 @@ import os
 
 from fastapi import APIRouter, Depends, HTTPException, Response, Request
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
 from sqlalchemy.exc import IntegrityError
 
-from backend.database import get_db
+from backend.database import DBSession, get_session
 from backend import models, schemas, settings
 
 from backend.utils.error_handler import response_from_error
+from backend.utils.passwords import (
+    dummy_hash,
+    hash_password,
+    hash_passwords,
+    verify_password,
+)
+from backend.utils.query_to_filters import queryable_fields
+from backend.utils.request_metrics import TimedRoute
 from backend.routers.handler_factory import (
+    as_dict,
+    commit,
+    execute,
+    invalidate,
+    ExportFormat,
+    export_all,
     get_all,
     get_one,
     create_one,
     delete_one,
     update_one,
+    create_many,
+    update_many,
+    delete_many,
 )
 
 PAGE_LIMIT = int(os.getenv("USER_PAGE_LIMIT", settings.USER_PAGE_LIMIT))
 
-router = APIRouter(prefix="/users")
+router = APIRouter(prefix="/users", route_class=TimedRoute)
+
+# Left out explicitly, so the hashes can never be probed through filters or
+# sort= even if a response schema starts to carry the column: every hash
+# begins with the same "$scrypt$..." prefix.
+QUERY_FIELDS = queryable_fields(models.User, schemas.User) - {"password"}
 
 
 @router.get("/", response_model=list[schemas.User])
 async def get_users(
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: DBSession = Depends(get_session),
     skip: int = 0,
     limit: int = PAGE_LIMIT,
+    cursor: str | None = None,
 ):
-    return await get_all(models.User, request, db, skip, limit)
+    return await get_all(
+        models.User,
+        request,
+        db,
+        skip,
+        limit,
+        response,
+        cursor,
+        schema=schemas.User,
+        queryable=QUERY_FIELDS,
+    )
+
+
+@router.get("/export")
+async def export_users(request: Request, format: ExportFormat = "ndjson"):
+    return await export_all(
+        models.User, schemas.User, request, format, queryable=QUERY_FIELDS
+    )
+
+
+@router.post("/bulk", response_model=schemas.BulkResult[schemas.User], status_code=201)
+async def create_users(
+    users: list[schemas.UserCreate],
+    response: Response,
+    db: DBSession = Depends(get_session),
+):
+    hashed = await hash_passwords([user.password for user in users])
+    for user, password in zip(users, hashed):
+        user.password = password
+    return await create_many(models.User, users, db, response)
 
 
-@router.get("/{user_id}")
-async def get_user_by_id(user_id: int, db: Session = Depends(get_db)):
-    return await get_one(models.User, user_id, db, "user_id")
+@router.patch("/bulk", response_model=schemas.BulkResult[schemas.User])
+async def update_users(
+    users: list[schemas.User],
+    response: Response,
+    db: DBSession = Depends(get_session),
+):
+    return await update_many(models.User, users, db, "user_id", response)
+
+
+@router.delete("/bulk", response_model=schemas.BulkResult[int])
+async def delete_users(
+    body: schemas.BulkDelete,
+    response: Response,
+    db: DBSession = Depends(get_session),
+):
+    return await delete_many(models.User, body.ids, db, "user_id", response)
+
+
+@router.post("/login", response_model=schemas.User)
+async def login(credentials: schemas.UserLogin, db: DBSession = Depends(get_session)):
+    """Check an email and password; 401 if either is wrong.
+
+    A stored password that predates hashing, or was hashed with older cost
+    settings, is replaced by a current hash on a successful login.
+    """
+    result = await execute(
+        db, select(models.User).where(models.User.email == credentials.email)
+    )
+    user = result.scalars().first()
+    stored = user.password if user is not None else dummy_hash()
+    matches, new_hash = await verify_password(credentials.password, stored)
+    if user is None or not matches:
+        raise HTTPException(status_code=401, detail="Invalid email or password\n")
+
+    found = as_dict(user)
+    if new_hash is not None:
+        await execute(
+            db,
+            update(models.User)
+            .where(models.User.user_id == found["user_id"])
+            .values(password=new_hash),
+        )
+        await commit(db)
+        await invalidate(models.User)
+    return found
+
+
+@router.get("/{user_id}", response_model=schemas.User)
+async def get_user_by_id(
+    user_id: int,
+    request: Request,
+    response: Response,
+    db: DBSession = Depends(get_session),
+):
+    return await get_one(
+        models.User,
+        user_id,
+        db,
+        "user_id",
+        request=request,
+        response=response,
+    )
 
 
 @router.post("/", response_model=schemas.User, status_code=201)
-async def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: schemas.UserCreate, db: DBSession = Depends(get_session)):
+    user.password = await hash_password(user.password)
     return await create_one(models.User, user, db)
 
 
 @router.delete("/{user_id}")
-async def delete_user(user_id: int, db: Session = Depends(get_db)):
+async def delete_user(user_id: int, db: DBSession = Depends(get_session)):
     return await delete_one(models.User, user_id, db, "user_id")
 
 
 @router.put("/{user_id}", response_model=schemas.User)
-async def update_user(user_id: int, user: schemas.User, db: Session = Depends(get_db)):
+async def update_user(
+    user_id: int, user: schemas.User, db: DBSession = Depends(get_session)
+):
     return await update_one(models.User, user, user_id, db, "user_id")
+
+
+@router.patch("/{user_id}", response_model=schemas.User)
+async def patch_user(
+    user_id: int, user: schemas.UserPatch, db: DBSession = Depends(get_session)
+):
+    if user.password is not None:
+        user.password = await hash_password(user.password)
+    return await update_one(models.User, user, user_id, db, "user_id", partial=True)
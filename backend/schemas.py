@@ -1,5 +1,6 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import date, datetime
+from typing import Generic, TypeVar
 
 
 # Beer models
@@ -20,6 +21,13 @@ class Beer(BeerBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class BeerPatch(BaseModel):
+    name: str | None = None
+    style: str | None = None
+    abv: float | None = None
+    price: float | None = None
+
+
 # User models
 class UserBase(BaseModel):
     name: str
@@ -38,6 +46,19 @@ class User(UserBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class UserLogin(BaseModel):
+    email: str
+    password: str
+
+
+class UserPatch(BaseModel):
+    name: str | None = None
+    email: str | None = None
+    address: str | None = None
+    phone: str | None = None
+    password: str | None = None
+
+
 # Order models
 class OrderBase(BaseModel):
     beer_id: int
@@ -51,12 +72,26 @@ class OrderCreate(OrderBase):
     pass
 
 
+class OrderPlace(BaseModel):
+    beer_id: int
+    user_id: int
+    qty: int = Field(gt=0)
+
+
 class Order(OrderBase):
     order_id: int
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class OrderPatch(BaseModel):
+    beer_id: int | None = None
+    user_id: int | None = None
+    qty: int | None = None
+    ordered_at: datetime | None = None
+    price: float | None = None
+
+
 # Stock models
 class StockBase(BaseModel):
     beer_id: int
@@ -74,6 +109,12 @@ class Stock(StockBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class StockPatch(BaseModel):
+    beer_id: int | None = None
+    qty_in_stock: int | None = None
+    date_of_arrival: date | None = None
+
+
 # Migration models
 class MigrationBase(BaseModel):
     migration_filename: str
@@ -82,5 +123,82 @@ class MigrationBase(BaseModel):
 class Migration(MigrationBase):
     migration_id: int
     date_of_migration: datetime
+    checksum: str | None = None
+    duration_ms: float | None = None
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class AppliedMigration(MigrationBase):
+    # None for a migration recorded before 0007 added checksums
+    checksum: str | None
+    duration_ms: float
+
+
+class MigrationRun(BaseModel):
+    applied: list[AppliedMigration]
+    total_ms: float
+    state: Migration
+
+
+class MigrationRollback(BaseModel):
+    rolled_back: list[AppliedMigration]
+    total_ms: float
+    state: Migration
+
+
+class OrderPartition(BaseModel):
+    name: str
+    bounds: str
+    rows_estimate: int
+    bytes: int
+
+
+class PartitionMaintenance(BaseModel):
+    created: list[str]
+    expired: list[str]
+
+
+# Aggregate models
+class BeerSales(BaseModel):
+    beer_id: int
+    name: str
+    style: str
+    orders: int
+    units_sold: int
+    revenue: float
+    qty_in_stock: int | None
+    units_per_day: float
+    days_of_stock_left: float | None
+
+
+class StyleSales(BaseModel):
+    style: str
+    beers: int
+    orders: int
+    units_sold: int
+    revenue: float
+
+
+class SalesRebuild(BaseModel):
+    beers: int
+    days: int
+
+
+# Bulk operation models
+ItemT = TypeVar("ItemT")
+
+
+class BulkError(BaseModel):
+    index: int
+    status_code: int
+    detail: str
+
+
+class BulkResult(BaseModel, Generic[ItemT]):
+    items: list[ItemT]
+    errors: list[BulkError]
+
+
+class BulkDelete(BaseModel):
+    ids: list[int]
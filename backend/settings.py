@@ -12,3 +12,122 @@ PGHOST = os.getenv("PGHOST", "localhost")
 PORT = os.getenv("PORT", "5432")
 DB_USER = os.getenv("DB_USER", "aviv")
 PASSWORD = os.getenv("BEERPY_PASSWORD", "")
+
+# Run the CRUD routers on an asyncpg-backed AsyncSession instead of psycopg2
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+
+# Connection pool, applied to both the sync and async engines
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+# Rows fetched per server-side cursor round trip by the /export endpoints
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Read-through response cache: "memory" (per worker), "redis" (shared) or "none"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_TTL = float(os.getenv("CACHE_TTL", "5"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+# X-Total-Count values are kept this long per filter set (seconds)
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "10"))
+
+# Render list pages from plain rows with orjson (stdlib json if it is not
+# installed) instead of building a response_model object per row
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1"
+
+# Pending migrations committed per transaction by /v1/migrator/migrate (0 = all at once)
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "0"))
+
+# Per-transaction limits for migrations, in Postgres interval syntax ("0" = none)
+MIGRATION_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+MIGRATION_STATEMENT_TIMEOUT = os.getenv("MIGRATION_STATEMENT_TIMEOUT", "0")
+
+# Online backfills (NNNN_name.backfill.sql): rows of key range per chunk,
+# pause between chunks, per-chunk statement timeout and retries on timeout
+MIGRATION_BACKFILL_BATCH_SIZE = int(os.getenv("MIGRATION_BACKFILL_BATCH_SIZE", "10000"))
+MIGRATION_BACKFILL_SLEEP = float(os.getenv("MIGRATION_BACKFILL_SLEEP", "0.1"))
+MIGRATION_BACKFILL_STATEMENT_TIMEOUT = os.getenv(
+    "MIGRATION_BACKFILL_STATEMENT_TIMEOUT", "30s"
+)
+MIGRATION_BACKFILL_RETRIES = int(os.getenv("MIGRATION_BACKFILL_RETRIES", "3"))
+
+# Startup connection check: attempts, first backoff and backoff cap (seconds).
+# DB_CONNECT_RETRIES=0 skips the check and lets the first request connect.
+DB_CONNECT_RETRIES = int(os.getenv("DB_CONNECT_RETRIES", "5"))
+DB_CONNECT_BACKOFF = float(os.getenv("DB_CONNECT_BACKOFF", "0.5"))
+DB_CONNECT_BACKOFF_MAX = float(os.getenv("DB_CONNECT_BACKOFF_MAX", "8"))
+
+# Request instrumentation: Server-Timing header on every response, slow
+# query log threshold (ms, 0 = off) and whether it includes bound
+# parameters (off by default; password and email values are masked even
+# then), repeats of one statement per request reported as a possible N+1
+# (0 = off), and distinct statements tracked by /metrics/statements
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_PARAMS = os.getenv("SLOW_QUERY_PARAMS", "0") == "1"
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+STATEMENT_STATS_MAX = int(os.getenv("STATEMENT_STATS_MAX", "500"))
+
+# Read replicas as comma-separated "host[:port]"; they share DATABASE,
+# DB_USER and BEERPY_PASSWORD with the primary. GET requests are spread
+# over them round-robin. After a write the client reads from the primary
+# for DB_REPLICA_STICKY_SECONDS. A replica that fails is skipped for
+# DB_REPLICA_RETRY_SECONDS and then probed before it takes reads again.
+DB_REPLICA_HOSTS = [
+    host.strip()
+    for host in os.getenv("DB_REPLICA_HOSTS", "").split(",")
+    if host.strip()
+]
+DB_REPLICA_STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "10"))
+DB_REPLICA_CONNECT_TIMEOUT = int(os.getenv("DB_REPLICA_CONNECT_TIMEOUT", "2"))
+
+# /stock/stream: seconds between keepalive comments, the reconnect delay
+# sent to clients (ms) and open streams allowed per worker
+STOCK_STREAM_HEARTBEAT = float(os.getenv("STOCK_STREAM_HEARTBEAT", "15"))
+STOCK_STREAM_RETRY_MS = int(os.getenv("STOCK_STREAM_RETRY_MS", "1000"))
+STOCK_STREAM_MAX_SUBSCRIBERS = int(os.getenv("STOCK_STREAM_MAX_SUBSCRIBERS", "1000"))
+
+# Password hashing (scrypt) runs off the event loop in a "thread" or
+# "process" pool of PASSWORD_HASH_WORKERS; "inline" runs it in the handler.
+# Past PASSWORD_HASH_MAX_PENDING queued operations requests get a 503.
+# Cost: N = 2**PASSWORD_SCRYPT_LOG_N, using 128 * N * r bytes per hash.
+PASSWORD_HASH_POOL = os.getenv("PASSWORD_HASH_POOL", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+PASSWORD_SCRYPT_LOG_N = int(os.getenv("PASSWORD_SCRYPT_LOG_N", "14"))
+PASSWORD_SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+PASSWORD_SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+
+# Monthly orders partitions (migrations 0005-0010): every
+# ORDERS_PARTITION_INTERVAL seconds (0 = never) each worker makes sure the
+# next ORDERS_PARTITION_AHEAD months have a partition. Months older than ORDERS_RETENTION_MONTHS before
+# the current one are detached (kept as archived_orders_YYYY_MM tables) or,
+# with ORDERS_RETENTION_DETACH=0, dropped; 0 keeps every month.
+ORDERS_PARTITION_INTERVAL = float(os.getenv("ORDERS_PARTITION_INTERVAL", "3600"))
+ORDERS_PARTITION_AHEAD = int(os.getenv("ORDERS_PARTITION_AHEAD", "3"))
+ORDERS_RETENTION_MONTHS = int(os.getenv("ORDERS_RETENTION_MONTHS", "0"))
+ORDERS_RETENTION_DETACH = os.getenv("ORDERS_RETENTION_DETACH", "1") == "1"
+
+# Responses of COMPRESSION_MIN_SIZE bytes or more are compressed with the
+# first of COMPRESSION_ENCODINGS that the client accepts; "br" needs the
+# brotli package, and an empty list turns compression off.
+COMPRESSION_ENCODINGS = [
+    encoding.strip()
+    for encoding in os.getenv("COMPRESSION_ENCODINGS", "gzip").split(",")
+    if encoding.strip()
+]
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+# Identical reads in flight at the same time (same route, parameters and
+# primary/replica target) share one query: the first runs it and the rest
+# wait up to COALESCE_TIMEOUT seconds for its result before running their
+# own. The first COALESCE_STATS_MAX keys get counts at /metrics/coalescing.
+COALESCE_READS = os.getenv("COALESCE_READS", "1") == "1"
+COALESCE_TIMEOUT = float(os.getenv("COALESCE_TIMEOUT", "1"))
+COALESCE_STATS_MAX = int(os.getenv("COALESCE_STATS_MAX", "500"))
@@ -0,0 +1,20 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+
+@pytest.fixture
+def sqlite_engine():
+    """An in-memory SQLite database, for tests of the generated statements.
+
+    Sync sessions run their statements on the threadpool (see
+    handler_factory.execute), so the one connection is shared across
+    threads.
+    """
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    yield engine
+    engine.dispose()
@@ -0,0 +1,129 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, exc, text
+
+from backend.migrator import migrator_utils
+
+BACKFILL = "0002_items_done.backfill.sql"
+LATER_BACKFILL = "0003_items_later.backfill.sql"
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """A file SQLite database with the few Postgres functions the migrator calls.
+
+    to_regclass looks the table up over a second connection, which sees what
+    the migrator has committed; every table it asks about is created and
+    committed before the question.
+    """
+    path = tmp_path / "migrations.db"
+
+    def to_regclass(name):
+        with sqlite3.connect(path) as other:
+            found = other.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (name,),
+            ).fetchone()
+        return name if found else None
+
+    engine = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def add_functions(connection, record):
+        connection.create_function("set_config", 3, lambda name, value, local: value)
+        connection.create_function("pg_advisory_lock", 1, lambda key: 1)
+        connection.create_function("pg_advisory_unlock", 1, lambda key: 1)
+        connection.create_function(
+            "clock_timestamp", 0, lambda: datetime.now().isoformat()
+        )
+        connection.create_function("to_regclass", 1, to_regclass)
+
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE migrations (migration_filename VARCHAR PRIMARY KEY, "
+                "date_of_migration TIMESTAMP, checksum VARCHAR, duration_ms FLOAT)"
+            )
+        )
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, done INTEGER)"))
+        conn.execute(
+            text("INSERT INTO items (id, done) VALUES (:id, 0)"),
+            [{"id": i} for i in range(1, 11)],
+        )
+
+    folder = tmp_path / "migrations"
+    folder.mkdir()
+    (folder / BACKFILL).write_text(
+        "-- backfill: items.id\n"
+        "UPDATE items SET done = done + check_item(id) "
+        "WHERE id > :start AND id <= :end"
+    )
+    (folder / "0002_items_done.down.sql").write_text("UPDATE items SET done = 0")
+    monkeypatch.setattr(migrator_utils, "MIGRATION_FOLDER", f"{folder}/")
+    monkeypatch.setattr(migrator_utils, "get_engine", lambda: engine)
+    # Postgres reads this from information_schema; these tests always have
+    # the checksum columns
+    monkeypatch.setattr(migrator_utils, "has_checksums", lambda conn: True)
+    yield engine
+    engine.dispose()
+
+
+def check_item_failing_at(failing_id):
+    def check_item(item_id):
+        if item_id == failing_id:
+            raise ValueError(f"item {item_id}")
+        return 1
+
+    return check_item
+
+
+def run(engine, check_item) -> dict:
+    filepath = f"{migrator_utils.MIGRATION_FOLDER}{BACKFILL}"
+    with engine.connect() as conn:
+        conn.connection.driver_connection.create_function("check_item", 1, check_item)
+        return migrator_utils.run_backfill(conn, filepath, batch_size=3, sleep=0)
+
+
+def rows(engine, statement: str) -> list:
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(text(statement))]
+
+
+def test_interrupted_backfill_resumes_after_the_last_chunk(engine):
+    # The chunk (6, 9] fails; (0, 3] and (3, 6] are already committed
+    with pytest.raises(exc.OperationalError):
+        run(engine, check_item_failing_at(7))
+    assert rows(engine, "SELECT * FROM migration_backfills")[0][:2] == (BACKFILL, 6)
+    assert rows(engine, "SELECT migration_filename FROM migrations") == []
+
+    applied = run(engine, check_item_failing_at(None))
+    assert applied["migration_filename"] == BACKFILL
+    # Every item was updated exactly once: the second run started at id 7
+    assert rows(engine, "SELECT DISTINCT done FROM items") == [(1,)]
+    assert rows(engine, "SELECT * FROM migration_backfills") == []
+    assert rows(engine, "SELECT migration_filename FROM migrations") == [(BACKFILL,)]
+
+
+def test_rollback_clears_backfill_progress(engine):
+    run(engine, check_item_failing_at(None))
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO migration_backfills (migration_filename, last_key) "
+                "VALUES ('0001_init.backfill.sql', 5), (:later, 8)"
+            ),
+            {"later": LATER_BACKFILL},
+        )
+
+    rolled_back = migrator_utils.rollback_migrations(1)
+
+    assert [step["migration_filename"] for step in rolled_back] == [BACKFILL]
+    assert rows(engine, "SELECT DISTINCT done FROM items") == [(0,)]
+    assert rows(engine, "SELECT migration_filename FROM migrations") == []
+    # Progress of the rolled back migration and later ones is gone, so
+    # those backfills start over; earlier ones keep theirs
+    assert rows(engine, "SELECT migration_filename FROM migration_backfills") == [
+        ("0001_init.backfill.sql",)
+    ]
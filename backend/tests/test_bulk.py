@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import Response
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from backend import models, schemas
+from backend.routers.handler_factory import create_many, delete_many, update_many
+
+
+@pytest.fixture
+def db(sqlite_engine):
+    # Off by default in SQLite; delete_many below relies on it
+    @event.listens_for(sqlite_engine, "connect")
+    def foreign_keys(connection, record):
+        connection.execute("PRAGMA foreign_keys = ON")
+
+    for model in (models.Beer, models.User, models.Stock):
+        model.__table__.create(sqlite_engine)
+    with Session(sqlite_engine) as session:
+        session.add_all(
+            models.User(user_id=i, name=f"user{i}", email=f"user{i}@example.com")
+            for i in (1, 2)
+        )
+        session.add_all(
+            models.Beer(beer_id=i, name=f"beer{i}", style="IPA", abv=5, price=4)
+            for i in (1, 2, 3)
+        )
+        session.add(
+            models.Stock(
+                stock_id=1,
+                beer_id=2,
+                qty_in_stock=5,
+                date_of_arrival=datetime(2026, 1, 1),
+            )
+        )
+        session.commit()
+        yield session
+
+
+def user(user_id: int | None, email: str, name: str = "dana"):
+    fields = {"name": name, "email": email, "address": None, "phone": None}
+    if user_id is None:
+        return schemas.UserCreate(**fields, password="hops")
+    return schemas.User(**fields, user_id=user_id)
+
+
+def emails(db) -> list:
+    statement = select(models.User.email).order_by(models.User.user_id)
+    return db.execute(statement).scalars().all()
+
+
+def error_codes(result: dict) -> list:
+    return [(error.index, error.status_code) for error in result["errors"]]
+
+
+def test_create_many_keeps_the_valid_rows(db):
+    response = Response()
+    new = [user(None, "a@example.com"), user(None, "user1@example.com")]
+    new.append(user(None, "b@example.com"))
+    result = asyncio.run(create_many(models.User, new, db, response))
+
+    assert response.status_code == 207
+    assert [item["email"] for item in result["items"]] == [
+        "a@example.com",
+        "b@example.com",
+    ]
+    assert error_codes(result) == [(1, 400)]
+    # Committed: visible from a new transaction
+    db.rollback()
+    assert emails(db) == [
+        "user1@example.com",
+        "user2@example.com",
+        "a@example.com",
+        "b@example.com",
+    ]
+
+
+def test_create_many_without_errors_keeps_the_status(db):
+    response = Response(status_code=201)
+    result = asyncio.run(
+        create_many(models.User, [user(None, "a@example.com")], db, response)
+    )
+    assert response.status_code == 201
+    assert result["errors"] == []
+
+
+def test_update_many_reports_conflicts_and_unknown_ids(db):
+    response = Response()
+    changes = [
+        user(1, "first@example.com", name="renamed"),
+        user(2, "first@example.com"),
+        user(99, "ghost@example.com"),
+    ]
+    result = asyncio.run(update_many(models.User, changes, db, "user_id", response))
+
+    assert response.status_code == 207
+    assert [(item["user_id"], item["name"]) for item in result["items"]] == [
+        (1, "renamed")
+    ]
+    assert error_codes(result) == [(1, 400), (2, 404)]
+    db.rollback()
+    assert emails(db) == ["first@example.com", "user2@example.com"]
+
+
+def test_update_many_with_only_unknown_ids(db):
+    response = Response()
+    changes = [user(99, "ghost@example.com")]
+    result = asyncio.run(update_many(models.User, changes, db, "user_id", response))
+    assert result["items"] == []
+    assert error_codes(result) == [(0, 404)]
+
+
+def test_delete_many_keeps_referenced_rows(db):
+    response = Response()
+    # Beer 2 still has stock, beer 99 does not exist
+    result = asyncio.run(
+        delete_many(models.Beer, [1, 2, 99, 3], db, "beer_id", response)
+    )
+
+    assert response.status_code == 207
+    assert sorted(result["items"]) == [1, 3]
+    assert error_codes(result) == [(1, 500), (2, 404)]
+    db.rollback()
+    assert db.execute(select(models.Beer.beer_id)).scalars().all() == [2]
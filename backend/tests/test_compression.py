@@ -0,0 +1,174 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from backend import settings
+from backend.utils.compression import CompressionMiddleware, negotiate
+from backend.utils.conditional import (
+    is_fresh,
+    not_modified,
+    revalidated_etag,
+    validators,
+)
+
+BODY = "beer," * 1000
+ETAG = '"abc"'
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/page")
+    def page(request: Request):
+        headers = validators(ETAG, 0)
+        if is_fresh(request, ETAG, 0):
+            return not_modified(headers)
+        return PlainTextResponse(BODY, headers=headers)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("ipa")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(
+            (f"row {i}\n" for i in range(100)), media_type="text/csv"
+        )
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(
+            iter(["data: 1\n\n"] * 200), media_type="text/event-stream"
+        )
+
+    @app.get("/raw")
+    def raw():
+        return Response(BODY, headers={"Cache-Control": "no-transform"})
+
+    return app
+
+
+@pytest.fixture(scope="module")
+def client():
+    # TestClient decodes gzip bodies itself, so the encoding shows in headers
+    return TestClient(build_app())
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, deflate", "gzip"),
+        ("br;q=1.0, gzip;q=0.8", "br"),
+        ("gzip;q=0.5, br", "br"),
+        ("gzip;q=0", None),
+        ("*", "br"),
+        ("identity", None),
+        ("", None),
+    ],
+)
+def test_negotiate(header, expected):
+    assert negotiate(header, ["br", "gzip"]) == expected
+
+
+def test_large_body_is_gzipped_with_suffixed_etag(client):
+    response = client.get("/page", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == '"abc-gzip"'
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.text == BODY
+
+
+def test_identity_keeps_plain_etag(client):
+    response = client.get("/page", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == ETAG
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_small_body_is_left_alone(client):
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.text == "ipa"
+
+
+def test_streamed_body_is_gzipped_chunk_by_chunk(client):
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == "".join(f"row {i}\n" for i in range(100))
+
+
+@pytest.mark.parametrize("path", ["/events", "/raw"])
+def test_event_streams_and_no_transform_are_left_alone(client, path):
+    response = client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.parametrize("sent", ['"abc-gzip"', 'W/"abc-gzip"', '"x", "abc-gzip"'])
+def test_not_modified_repeats_the_suffixed_etag(client, sent):
+    response = client.get(
+        "/page", headers={"Accept-Encoding": "gzip", "If-None-Match": sent}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"abc-gzip"'
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert "content-encoding" not in response.headers
+
+
+def test_not_modified_for_the_plain_copy_keeps_plain_etag(client):
+    response = client.get("/page", headers={"If-None-Match": ETAG})
+    assert response.status_code == 304
+    assert response.headers["etag"] == ETAG
+
+
+def test_brotli(monkeypatch):
+    brotli = pytest.importorskip("brotli")
+    monkeypatch.setattr(settings, "COMPRESSION_ENCODINGS", ["br", "gzip"])
+    client = TestClient(build_app())
+    response = client.get("/page", headers={"Accept-Encoding": "br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["etag"] == '"abc-br"'
+    # httpx may or may not decode br itself, depending on what is installed
+    body = response.content
+    if body != BODY.encode():
+        body = brotli.decompress(body)
+    assert body == BODY.encode()
+
+
+def request_with(headers: dict) -> Request:
+    raw = [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+    return Request({"type": "http", "path": "/", "headers": raw})
+
+
+@pytest.mark.parametrize(
+    "headers, fresh",
+    [
+        ({"If-None-Match": ETAG}, True),
+        ({"If-None-Match": 'W/"abc"'}, True),
+        ({"If-None-Match": '"abc-br"'}, True),
+        ({"If-None-Match": '"x", W/"abc-gzip"'}, True),
+        ({"If-None-Match": "*"}, True),
+        ({"If-None-Match": '"abcd"'}, False),
+        (
+            {
+                "If-None-Match": '"x"',
+                "If-Modified-Since": "Thu, 01 Jan 2099 00:00:00 GMT",
+            },
+            False,
+        ),
+        ({"If-Modified-Since": "Thu, 01 Jan 2099 00:00:00 GMT"}, True),
+        ({"If-Modified-Since": "not a date"}, False),
+        ({}, False),
+    ],
+)
+def test_is_fresh(headers, fresh):
+    assert is_fresh(request_with(headers), ETAG, 1000) is fresh
+
+
+def test_revalidated_etag():
+    assert revalidated_etag('"x", W/"abc-gzip"', ETAG) == '"abc-gzip"'
+    assert revalidated_etag("*", ETAG) == ETAG
+    assert revalidated_etag(None, ETAG) == ETAG
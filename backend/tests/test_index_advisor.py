@@ -0,0 +1,52 @@
+from backend import models
+from backend.utils.index_advisor import advise, index_prefixes, report
+
+# What INDEXES returns for orders after migration 0010: the primary key is
+# (order_id, ordered_at), which the model does not declare
+ORDER_INDEXES = [
+    {
+        "table_name": "orders",
+        "index_name": "ix_orders_beer_id",
+        "method": "btree",
+        "columns": ["beer_id"],
+    },
+    {
+        "table_name": "orders",
+        "index_name": "orders_pkey",
+        "method": "btree",
+        "columns": ["order_id", "ordered_at"],
+    },
+    {
+        "table_name": "beers",
+        "index_name": "ix_beers_search_vector",
+        "method": "gin",
+        "columns": ["search_vector"],
+    },
+]
+
+
+def test_prefixes_come_from_the_database_rows():
+    assert index_prefixes(ORDER_INDEXES, models.Order) == [
+        ("beer_id",),
+        ("order_id", "ordered_at"),
+    ]
+    # GIN indexes do not serve b-tree filters and sorts
+    assert index_prefixes(ORDER_INDEXES, models.Beer) == []
+
+
+def test_existing_index_covers_its_leading_column():
+    assert advise(models.Order, (("beer_id", "eq"),), (), ORDER_INDEXES) is None
+
+
+def test_missing_index_is_suggested():
+    suggestion = advise(models.Order, (("user_id", "eq"),), (), ORDER_INDEXES)
+    assert suggestion == "CREATE INDEX ix_orders_user_id ON orders (user_id);"
+
+
+def test_report_lists_indexes_by_name():
+    tables = report([models.Order], ORDER_INDEXES)["tables"]
+    assert tables["orders"]["indexes"] == {
+        "ix_orders_beer_id": ["beer_id"],
+        "orders_pkey": ["order_id", "ordered_at"],
+    }
+    assert tables["orders"]["unindexed_columns"] == ["user_id", "qty", "price"]
@@ -0,0 +1,81 @@
+import asyncio
+from urllib.parse import urlencode
+
+import pytest
+from fastapi import Request
+from sqlalchemy.orm import Session
+
+from backend import models, schemas
+from backend.routers.handler_factory import _fetch_page
+from backend.utils.query_to_filters import queryable_fields
+
+QUERYABLE = queryable_fields(models.User, schemas.User)
+
+# Several NULLs in a row, so a page boundary falls inside the NULL block
+ADDRESSES = ["b", None, "a", None, "c", "a", None, None, "b", None]
+PHONES = [None, "1", None, "2", "1", None, None, "3", "2", None]
+
+
+@pytest.fixture
+def db(sqlite_engine):
+    # SQLite understands NULLS LAST and row values, so the generated
+    # clauses run as they would on Postgres.
+    models.User.__table__.create(sqlite_engine)
+    with Session(sqlite_engine) as session:
+        session.add_all(
+            models.User(
+                user_id=i + 1,
+                name=f"user{i}",
+                email=f"user{i}@example.com",
+                address=address,
+                phone=phone,
+            )
+            for i, (address, phone) in enumerate(zip(ADDRESSES, PHONES))
+        )
+        session.commit()
+        yield session
+
+
+def request_for(params: dict) -> Request:
+    query = urlencode(params).encode()
+    scope = {"type": "http", "path": "/users/", "query_string": query, "headers": []}
+    return Request(scope)
+
+
+def walk(db, sort: str, limit: int) -> list:
+    """Every user_id, page by page through the keyset cursor."""
+    seen, cursor = [], ""
+    for _ in range(len(ADDRESSES) + 1):
+        request = request_for({"sort": sort, "cursor": cursor})
+        items, cursor = asyncio.run(
+            _fetch_page(models.User, request, db, 0, limit, cursor, None, QUERYABLE)
+        )
+        seen += [item.user_id for item in items]
+        if cursor is None:
+            return seen
+    raise AssertionError("cursor pagination did not terminate")
+
+
+def offset_order(db, sort: str) -> list:
+    request = request_for({"sort": sort})
+    items, _ = asyncio.run(
+        _fetch_page(models.User, request, db, 0, 100, None, None, QUERYABLE)
+    )
+    return [item.user_id for item in items]
+
+
+@pytest.mark.parametrize(
+    "sort", ["address", "-address", "address,-phone", "-phone,address", "phone"]
+)
+@pytest.mark.parametrize("limit", [1, 2, 3])
+def test_cursor_pages_cover_null_sort_values_once(db, sort, limit):
+    expected = offset_order(db, sort)
+    assert sorted(expected) == list(range(1, len(ADDRESSES) + 1))
+    assert walk(db, sort, limit) == expected
+
+
+@pytest.mark.parametrize("sort", ["address", "-address"])
+def test_nulls_sort_last_in_both_directions(db, sort):
+    order = offset_order(db, sort)
+    nulls = [i + 1 for i, address in enumerate(ADDRESSES) if address is None]
+    assert sorted(order[-len(nulls) :]) == nulls
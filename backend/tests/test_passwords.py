@@ -0,0 +1,87 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from backend import settings
+from backend.utils import passwords
+
+
+@pytest.fixture(autouse=True)
+def cheap_cost(monkeypatch):
+    # Small scrypt parameters keep each hash to a few milliseconds
+    monkeypatch.setattr(settings, "PASSWORD_SCRYPT_LOG_N", 4)
+    monkeypatch.setattr(settings, "PASSWORD_SCRYPT_R", 1)
+    monkeypatch.setattr(settings, "PASSWORD_SCRYPT_P", 1)
+
+
+def test_hash_records_its_cost_and_salt():
+    stored = passwords.hash_password_sync("hops")
+    assert stored.startswith("$scrypt$ln=4,r=1,p=1$")
+    assert stored != passwords.hash_password_sync("hops")
+
+
+def test_verify_current_hash():
+    stored = passwords.hash_password_sync("hops")
+    assert passwords._verify_and_upgrade("hops", stored) == (True, None)
+    assert passwords._verify_and_upgrade("malt", stored) == (False, None)
+
+
+def test_plaintext_is_rehashed_when_it_matches():
+    matches, upgraded = passwords._verify_and_upgrade("hops", "hops")
+    assert matches
+    assert passwords._verify_and_upgrade("hops", upgraded) == (True, None)
+    assert passwords._verify_and_upgrade("malt", "hops") == (False, None)
+
+
+def test_old_cost_is_rehashed_at_the_current_cost(monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_SCRYPT_LOG_N", 5)
+    old = passwords.hash_password_sync("hops")
+    monkeypatch.setattr(settings, "PASSWORD_SCRYPT_LOG_N", 4)
+    matches, upgraded = passwords._verify_and_upgrade("hops", old)
+    assert matches
+    assert upgraded.startswith("$scrypt$ln=4,")
+    # A wrong password never gets a new hash
+    assert passwords._verify_and_upgrade("malt", old) == (False, None)
+
+
+def test_dummy_hash_matches_nothing():
+    dummy = passwords.dummy_hash()
+    assert passwords._parse(dummy) is not None
+    assert passwords._verify_and_upgrade("", dummy) == (False, None)
+
+
+def test_hash_passwords_keeps_order():
+    async def main():
+        return await passwords.hash_passwords(["a", "b", "c", "d", "e"])
+
+    hashed = asyncio.run(main())
+    assert all(passwords._verify_and_upgrade(p, h)[0] for p, h in zip("abcde", hashed))
+    assert not passwords._verify_and_upgrade("b", hashed[0])[0]
+
+
+def test_past_max_pending_is_503(monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_PENDING", 2)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_POOL", "thread")
+    release = threading.Event()
+
+    def blocked():
+        release.wait(5)
+        return "done"
+
+    async def main():
+        running = [asyncio.create_task(passwords._run(blocked)) for _ in range(2)]
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(HTTPException) as raised:
+                await passwords.hash_password("hops")
+            assert raised.value.status_code == 503
+        finally:
+            release.set()
+        assert await asyncio.gather(*running) == ["done", "done"]
+        # The slots are given back once the queued work finishes
+        assert passwords._pending == 0
+        assert (await passwords.verify_password("hops", "hops"))[0]
+
+    asyncio.run(main())
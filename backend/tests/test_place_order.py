@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from backend import models, schemas
+from backend.routers import orders
+
+# The reservation is a data-modifying CTE, which only Postgres runs; it is
+# checked as compiled SQL. The 404/409 branches after it runs are checked on
+# SQLite with a statement in its place that, like PLACE_ORDER when its
+# UPDATE matches no row, returns nothing.
+RESERVED_NOTHING = text("SELECT NULL AS order_id WHERE 0")
+
+
+def compiled(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_reservation_binds_the_order_fields():
+    binds = set(orders.PLACE_ORDER.compile().params)
+    assert binds == set(schemas.OrderPlace.model_fields)
+    assert set(orders.PLACE_ORDER_FAILURE.compile().params) <= binds
+
+
+def test_reservation_and_order_are_one_statement():
+    sql = " ".join(compiled(orders.PLACE_ORDER).split())
+    assert sql.count(";") == 0
+    assert sql.startswith("WITH reserved AS ( UPDATE stock")
+    # The guard sits in the UPDATE itself, so a concurrent checkout that
+    # waited for the row lock re-checks it against the new quantity
+    assert (
+        "WHERE beer_id = %(beer_id)s AND qty_in_stock >= %(qty)s RETURNING beer_id"
+        in sql
+    )
+    assert "INSERT INTO orders" in sql and "FROM reserved" in sql
+    # Priced from beers at the time of the order, not from the request
+    assert "beers.price * %(qty)s" in sql
+
+
+@pytest.fixture
+def db(sqlite_engine, monkeypatch):
+    monkeypatch.setattr(orders, "PLACE_ORDER", RESERVED_NOTHING)
+    for model in (models.Beer, models.User, models.Stock):
+        model.__table__.create(sqlite_engine)
+    with Session(sqlite_engine) as session:
+        session.add(models.Beer(beer_id=1, name="Hazy Fox", style="IPA", price=5))
+        session.add(models.Beer(beer_id=2, name="Old Pier", style="Stout", price=6))
+        session.add(models.User(user_id=1, name="dana", email="dana@example.com"))
+        session.add(models.Stock(stock_id=1, beer_id=1, qty_in_stock=3))
+        session.commit()
+        yield session
+
+
+def place(db, beer_id: int, user_id: int, qty: int) -> HTTPException:
+    order = schemas.OrderPlace(beer_id=beer_id, user_id=user_id, qty=qty)
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(orders.place_order(order, db))
+    return raised.value
+
+
+@pytest.mark.parametrize("beer_id", [2, 99])
+def test_beer_without_stock_is_404(db, beer_id):
+    error = place(db, beer_id, 1, 1)
+    assert (error.status_code, error.detail) == (404, "Stock not found\n")
+
+
+def test_unknown_user_is_404(db):
+    error = place(db, 1, 99, 1)
+    assert (error.status_code, error.detail) == (404, "User not found\n")
+
+
+def test_not_enough_stock_is_409(db):
+    error = place(db, 1, 1, 4)
+    assert (error.status_code, error.detail) == (409, "Not enough stock\n")
+    assert db.get(models.Stock, 1).qty_in_stock == 3
+
+
+def test_qty_must_be_positive():
+    with pytest.raises(ValueError):
+        schemas.OrderPlace(beer_id=1, user_id=1, qty=0)
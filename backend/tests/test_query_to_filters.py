@@ -0,0 +1,130 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from backend import models, schemas
+from backend.utils.query_to_filters import (
+    _parse,
+    compile_filters,
+    compile_sort,
+    queryable_fields,
+)
+
+BEER_FIELDS = queryable_fields(models.Beer, schemas.Beer)
+ORDER_FIELDS = queryable_fields(models.Order, schemas.Order)
+
+
+def rejected(build, *args) -> str:
+    with pytest.raises(HTTPException) as raised:
+        build(*args)
+    assert raised.value.status_code == 400
+    return raised.value.detail
+
+
+def test_parse_operators_and_default_eq():
+    assert _parse("style=ipa&abv[ge]=4.5&name[like]=Hop%25") == (
+        ("style", "eq", "ipa"),
+        ("abv", "ge", "4.5"),
+        ("name", "like", "Hop%"),
+    )
+
+
+def test_parse_skips_reserved_keys_anywhere():
+    # Paging and output keys are dropped wherever they appear; the filters
+    # after them are still read.
+    parsed = _parse("skip=20&style=ipa&sort=-price&limit=5&abv[lt]=6&count=exact")
+    assert parsed == (("style", "eq", "ipa"), ("abv", "lt", "6"))
+
+
+def test_parse_keeps_blank_values():
+    assert _parse("style=") == (("style", "eq", ""),)
+
+
+def test_queryable_fields_follow_the_schema():
+    assert BEER_FIELDS == {"beer_id", "name", "style", "abv", "price"}
+    assert "password" not in queryable_fields(models.User, schemas.User)
+    assert "password" in queryable_fields(models.User)
+
+
+def test_compile_coerces_values_to_column_types():
+    plan = compile_filters(models.Beer, "abv[ge]=4.5&beer_id[in]=1,2,3", BEER_FIELDS)
+    assert plan.shape == (("abv", "ge"), ("beer_id", "in"))
+    assert plan.parameters == {"filter_0": 4.5, "filter_1": (1, 2, 3)}
+
+
+def test_compile_parses_datetimes():
+    plan = compile_filters(
+        models.Order, "ordered_at[lt]=2024-02-01T00:00:00", ORDER_FIELDS
+    )
+    assert plan.parameters == {"filter_0": datetime(2024, 2, 1)}
+
+
+def test_compile_keeps_like_patterns_as_text():
+    plan = compile_filters(models.Beer, "name[like]=Hop%25&style[ne]=ipa", BEER_FIELDS)
+    assert plan.parameters == {"filter_0": "Hop%", "filter_1": "ipa"}
+
+
+def test_same_shape_reuses_clauses():
+    first = compile_filters(models.Beer, "style=ipa&abv[lt]=5", BEER_FIELDS)
+    second = compile_filters(models.Beer, "style=lager&abv[lt]=7", BEER_FIELDS)
+    assert first.clauses is second.clauses
+    assert second.parameters == {"filter_0": "lager", "filter_1": 7.0}
+
+
+def test_no_filters_leaves_statement_alone():
+    plan = compile_filters(models.Beer, "skip=0&limit=20", BEER_FIELDS)
+    assert plan.clauses == ()
+    assert plan.apply("statement") == "statement"
+
+
+def test_compile_rejects_unknown_field():
+    detail = rejected(compile_filters, models.Beer, "colour=red", BEER_FIELDS)
+    assert "colour" in detail
+
+
+def test_compile_rejects_field_outside_allowlist():
+    fields = frozenset({"name"})
+    rejected(compile_filters, models.Beer, "style=ipa", fields)
+
+
+def test_compile_rejects_unknown_operator():
+    detail = rejected(compile_filters, models.Beer, "abv[between]=1", BEER_FIELDS)
+    assert "between" in detail
+
+
+@pytest.mark.parametrize("query", ["abv=strong", "beer_id[in]=1,x", "price[gt]="])
+def test_compile_rejects_values_of_the_wrong_type(query):
+    rejected(compile_filters, models.Beer, query, BEER_FIELDS)
+
+
+@pytest.mark.parametrize("query", ["abv[like]=5%25", "beer_id[like]=1%25"])
+def test_compile_rejects_like_on_non_text_columns(query):
+    detail = rejected(compile_filters, models.Beer, query, BEER_FIELDS)
+    assert "like" in detail
+
+
+def test_sort_appends_primary_key():
+    sort = compile_sort(models.Beer, "-price,name", BEER_FIELDS)
+    assert sort.fields == ("price", "name", "beer_id")
+    assert [desc for _, desc in sort.keys] == [True, False, False]
+
+
+def test_sort_keeps_explicit_primary_key():
+    sort = compile_sort(models.Beer, "-beer_id", BEER_FIELDS)
+    assert sort.fields == ("beer_id",)
+
+
+def test_sort_accepts_decoded_plus_and_blanks():
+    # "+name" arrives as " name" once the query string is decoded.
+    sort = compile_sort(models.Beer, " name,,", BEER_FIELDS)
+    assert sort.fields == ("name", "beer_id")
+
+
+def test_sort_defaults_to_primary_key():
+    assert compile_sort(models.Beer, None, BEER_FIELDS).fields == ("beer_id",)
+
+
+@pytest.mark.parametrize("raw", ["colour", "-colour", "name,colour"])
+def test_sort_rejects_unknown_field(raw):
+    rejected(compile_sort, models.Beer, raw, BEER_FIELDS)
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, exc, select
+
+from backend import database, models, schemas
+from backend.routers.handler_factory import cache_key, _stream_rows
+from backend.utils.replicas import Replica
+
+
+def unreachable_engine():
+    # Nothing listens on port 1, so the first checkout fails at once
+    return create_engine(
+        "postgresql://beerpy@127.0.0.1:1/beerpy", connect_args={"connect_timeout": 1}
+    )
+
+
+def test_cache_keys_keep_primary_and_replica_reads_apart():
+    database.init_db()
+    replica = Replica("replica:5432", unreachable_engine())
+    with database.read_session(None) as primary, database.read_session(
+        replica
+    ) as lagging:
+        assert database.on_primary(primary) and not database.on_primary(lagging)
+        keys = [
+            asyncio.run(cache_key(models.Beer, db, "item", "1"))
+            for db in (primary, lagging)
+        ]
+    assert keys[0] != keys[1]
+
+
+def test_export_marks_a_failing_replica_down():
+    database.init_db()
+    replica = Replica("replica:5432", unreachable_engine())
+    statement = select(models.Beer.beer_id)
+    rows = _stream_rows(statement, {}, schemas.Beer, "ndjson", replica)
+    with pytest.raises(exc.OperationalError):
+        list(rows)
+    assert replica.down_until > 0
@@ -0,0 +1,44 @@
+import logging
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from backend import models, settings
+from backend.utils.request_metrics import register_query_events
+
+
+@pytest.fixture
+def engine(sqlite_engine, monkeypatch):
+    # Every statement counts as slow
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 1e-9)
+    models.User.__table__.create(sqlite_engine)
+    register_query_events(sqlite_engine)
+    return sqlite_engine
+
+
+def slow_query_logs(caplog) -> str:
+    return "\n".join(r.message for r in caplog.records if "Slow query" in r.message)
+
+
+def test_params_are_left_out_by_default(engine, caplog):
+    assert not settings.SLOW_QUERY_PARAMS
+    with caplog.at_level(logging.WARNING), Session(engine) as db:
+        db.execute(select(models.User).filter(models.User.name == "aviv"))
+    logs = slow_query_logs(caplog)
+    assert "Slow query" in logs
+    assert "params=" not in logs
+
+
+def test_password_and_email_are_masked(engine, caplog, monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_PARAMS", True)
+    user = {"name": "aviv", "email": "aviv@example.com", "password": "$scrypt$x"}
+    with caplog.at_level(logging.WARNING), Session(engine) as db:
+        dana = {**user, "name": "dana", "email": "dana@example.com"}
+        db.execute(insert(models.User), [user, dana])
+        db.execute(select(models.User).filter(models.User.email == user["email"]))
+    logs = slow_query_logs(caplog)
+    assert "'aviv'" in logs and "'dana'" in logs
+    assert "'***'" in logs
+    assert "example.com" not in logs
+    assert "$scrypt$" not in logs
@@ -0,0 +1,204 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend import models, settings
+from backend.routers.handler_factory import get_one
+from backend.utils.single_flight import SingleFlight
+
+
+class Query:
+    """A call that blocks until released, counting how often it ran."""
+
+    def __init__(self, result="rows", error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        self.started.set()
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def lead_and_follow(flights, query, followers=2):
+    """The leading task and `followers` identical calls joined onto it."""
+    leader = asyncio.create_task(flights.run("beers", "key", query))
+    await query.started.wait()
+    waiters = [
+        asyncio.create_task(flights.run("beers", "key", query))
+        for _ in range(followers)
+    ]
+    await asyncio.sleep(0)
+    return leader, waiters
+
+
+def test_identical_calls_share_one_run():
+    async def main():
+        flights = SingleFlight()
+        query = Query()
+        leader, waiters = await lead_and_follow(flights, query)
+        assert len(flights) == 1
+        query.release.set()
+        results = await asyncio.gather(leader, *waiters)
+        assert results == ["rows"] * 3
+        assert query.calls == 1
+        assert len(flights) == 0
+
+    asyncio.run(main())
+
+
+def test_different_keys_run_separately():
+    async def main():
+        flights = SingleFlight()
+        calls = []
+
+        async def query(name):
+            calls.append(name)
+            await asyncio.sleep(0)
+            return name
+
+        results = await asyncio.gather(
+            flights.run("beers", "a", lambda: query("a")),
+            flights.run("beers", "b", lambda: query("b")),
+            flights.run("orders", "a", lambda: query("c")),
+        )
+        assert results == ["a", "b", "c"]
+        assert sorted(calls) == ["a", "b", "c"]
+
+    asyncio.run(main())
+
+
+def test_http_errors_are_shared():
+    async def main():
+        flights = SingleFlight()
+        query = Query(error=HTTPException(status_code=404))
+        leader, waiters = await lead_and_follow(flights, query)
+        query.release.set()
+        results = await asyncio.gather(leader, *waiters, return_exceptions=True)
+        assert all(isinstance(r, HTTPException) for r in results)
+        assert query.calls == 1
+
+    asyncio.run(main())
+
+
+def test_other_errors_are_not_inherited():
+    async def main():
+        flights = SingleFlight()
+        query = Query(error=ConnectionError("primary went away"))
+        leader, waiters = await lead_and_follow(flights, query)
+        # The waiters see _Abandoned and run the call themselves
+        query.release.set()
+        with pytest.raises(ConnectionError):
+            await leader
+        query.error = None
+        assert await asyncio.gather(*waiters) == ["rows", "rows"]
+        assert query.calls == 3
+
+    asyncio.run(main())
+
+
+def test_cancelled_leader_abandons_its_waiters():
+    async def main():
+        flights = SingleFlight()
+        query = Query()
+        leader, waiters = await lead_and_follow(flights, query, followers=1)
+        leader.cancel()
+        await asyncio.sleep(0)
+        query.release.set()
+        assert await asyncio.gather(*waiters) == ["rows"]
+        assert leader.cancelled()
+        assert query.calls == 2
+
+    asyncio.run(main())
+
+
+def test_waiter_timeout_runs_its_own_query_and_leaves_the_leader(monkeypatch):
+    monkeypatch.setattr(settings, "COALESCE_TIMEOUT", 0.01)
+
+    async def main():
+        flights = SingleFlight()
+        query = Query()
+        leader, waiters = await lead_and_follow(flights, query, followers=1)
+        # The waiter gives up and runs its own call, which blocks too
+        while query.calls < 2:
+            await asyncio.sleep(0.005)
+        # shield() kept the timeout from cancelling the leading call
+        assert not leader.done()
+        query.release.set()
+        assert await leader == "rows"
+        assert await waiters[0] == "rows"
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_the_leader():
+    async def main():
+        flights = SingleFlight()
+        query = Query()
+        leader, waiters = await lead_and_follow(flights, query, followers=1)
+        waiters[0].cancel()
+        await asyncio.sleep(0)
+        query.release.set()
+        assert await leader == "rows"
+        assert waiters[0].cancelled()
+
+    asyncio.run(main())
+
+
+def test_detach_starts_a_new_flight():
+    async def main():
+        flights = SingleFlight()
+        before = Query("old")
+        leader, _ = await lead_and_follow(flights, before, followers=0)
+        # A write to the table: calls from now on must not share "old"
+        flights.detach("beers")
+        after = Query("new")
+        late = asyncio.create_task(flights.run("beers", "key", after))
+        await after.started.wait()
+        before.release.set()
+        assert await leader == "old"
+        # The old flight finishing does not drop the new one's entry
+        assert len(flights) == 1
+        after.release.set()
+        assert await late == "new"
+        assert len(flights) == 0
+
+    asyncio.run(main())
+
+
+def test_sync_sessions_share_one_query(sqlite_engine):
+    # The default deployment (DB_ASYNC=0): two identical reads on their own
+    # sync sessions, started together, run one SELECT between them
+    engine = sqlite_engine
+    models.Beer.__table__.create(engine)
+    with Session(engine) as db:
+        db.add(models.Beer(beer_id=1, name="Hazy Fox", style="IPA", abv=6, price=5))
+        db.commit()
+
+    selects = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: selects.append(statement),
+    )
+
+    async def main():
+        with Session(engine) as first, Session(engine) as second:
+            return await asyncio.gather(
+                get_one(models.Beer, 1, first, "beer_id"),
+                get_one(models.Beer, 1, second, "beer_id"),
+            )
+
+    assert settings.COALESCE_READS
+    results = asyncio.run(main())
+    assert [row["name"] for row in results] == ["Hazy Fox", "Hazy Fox"]
+    assert len(selects) == 1
@@ -0,0 +1,50 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from backend import models
+from backend.main import app
+from backend.routers.users import QUERY_FIELDS
+from backend.utils.query_to_filters import compile_filters, compile_sort
+
+# Rejected while the query string is compiled, before any query is sent,
+# so none of these need a database.
+PASSWORD_QUERIES = [
+    "password=secret",
+    "password[like]=%24scrypt%24%25",
+    "password[in]=a,b",
+    "password[ne]=x&count=exact",
+    "sort=password",
+    "sort=-password",
+    "sort=name,password",
+]
+
+
+def test_password_is_not_queryable():
+    assert "password" not in QUERY_FIELDS
+    assert {"user_id", "name", "email"} <= QUERY_FIELDS
+
+
+@pytest.mark.parametrize("op", ["eq", "ne", "in", "like", "lt"])
+def test_password_filters_are_rejected(op):
+    with pytest.raises(HTTPException) as raised:
+        compile_filters(models.User, f"password[{op}]=x", QUERY_FIELDS)
+    assert raised.value.status_code == 400
+
+
+def test_password_sort_is_rejected():
+    with pytest.raises(HTTPException) as raised:
+        compile_sort(models.User, "-password", QUERY_FIELDS)
+    assert raised.value.status_code == 400
+
+
+@pytest.mark.parametrize("query", PASSWORD_QUERIES)
+def test_list_rejects_password(query):
+    response = TestClient(app).get(f"/users/?{query}")
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("query", ["password=secret", "password[like]=%24s%25"])
+def test_export_rejects_password(query):
+    response = TestClient(app).get(f"/users/export?{query}")
+    assert response.status_code == 400
@@ -0,0 +1,141 @@
+import json
+import time
+from collections import OrderedDict
+
+from backend import settings
+from backend.utils.metrics import Counter, Gauge
+
+CACHE_HITS = Counter("beerpy_cache_hits_total", "Reads served from the response cache.")
+CACHE_MISSES = Counter(
+    "beerpy_cache_misses_total", "Reads that had to go to the database."
+)
+CACHE_EVICTIONS = Counter(
+    "beerpy_cache_evictions_total",
+    "Entries dropped to stay under CACHE_MAX_ENTRIES (reason=size) or past their TTL (reason=ttl).",
+)
+
+MISSING = object()
+
+
+class MemoryCache:
+    """In-process LRU cache with a per-entry TTL.
+
+    Each worker has its own copy, so a write on one worker only invalidates
+    that worker's entries; the others serve stale data for at most the TTL.
+    Use RedisCache when that window is too long.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            CACHE_EVICTIONS.inc(reason="ttl")
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            CACHE_EVICTIONS.inc(reason="size")
+
+    async def generation(self, namespace: str) -> int:
+        return self._generations.get(namespace, 0)
+
+    async def bump(self, namespace: str):
+        self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _encode_default(value):
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+class RedisCache:
+    """Cache shared by every worker, stored in Redis.
+
+    `client` defaults to a redis.asyncio client for CACHE_URL; anything with
+    the same async get/set/incr methods (e.g. fakeredis) can stand in for
+    local runs. Values are stored as JSON, so dates come back as ISO strings
+    and are re-parsed by the response models.
+    """
+
+    def __init__(self, url: str, ttl: float, client=None):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise RuntimeError(
+                    "CACHE_BACKEND=redis needs the 'redis' package: pip install redis"
+                )
+            client = redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+
+    async def get(self, key: str):
+        raw = await self.client.get(key)
+        return MISSING if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value, ttl: float | None = None):
+        payload = json.dumps(value, default=_encode_default)
+        await self.client.set(
+            key, payload, px=int((self.ttl if ttl is None else ttl) * 1000)
+        )
+
+    async def generation(self, namespace: str) -> int:
+        raw = await self.client.get(f"{namespace}:generation")
+        return 0 if raw is None else int(raw)
+
+    async def bump(self, namespace: str):
+        await self.client.incr(f"{namespace}:generation")
+
+    def __len__(self) -> int:
+        return 0
+
+
+class NullCache:
+    async def get(self, key: str):
+        return MISSING
+
+    async def set(self, key: str, value, ttl: float | None = None):
+        pass
+
+    async def generation(self, namespace: str) -> int:
+        return 0
+
+    async def bump(self, namespace: str):
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+
+def build_cache(backend: str):
+    if backend == "memory":
+        return MemoryCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL)
+    if backend == "redis":
+        return RedisCache(settings.CACHE_URL, settings.CACHE_TTL)
+    return NullCache()
+
+
+response_cache = build_cache(settings.CACHE_BACKEND)
+
+Gauge(
+    "beerpy_cache_entries",
+    "Entries held by the in-process response cache.",
+    lambda: len(response_cache),
+)
@@ -0,0 +1,174 @@
+import zlib
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+
+from backend import settings
+from backend.utils.conditional import encoded_etag, revalidated_etag
+
+# Bodies this large are compressed on a worker thread
+THREAD_MINIMUM_SIZE = 128 * 1024
+
+# Statuses whose body is never compressed: partial content, and the ones
+# without a body (a 304 still gets the headers the 200 would have)
+UNCOMPRESSED_STATUSES = {204, 206, 304}
+
+
+def _accepted(accept_encoding: str) -> dict:
+    """{coding: q} from an Accept-Encoding header."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding.strip():
+            accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def negotiate(accept_encoding: str, encodings: list) -> str | None:
+    """The first of `encodings` with the highest q the client gave it."""
+    accepted = _accepted(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _GzipEncoder:
+    def __init__(self):
+        # wbits 16 + MAX_WBITS writes the gzip header and trailer
+        self._compressor = zlib.compressobj(
+            settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+
+    def encode(self, body: bytes, more_body: bool) -> bytes:
+        # Each chunk of a streamed export has to reach the client whole
+        mode = zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH
+        return self._compressor.compress(body) + self._compressor.flush(mode)
+
+
+class _BrotliEncoder:
+    def __init__(self):
+        import brotli
+
+        self._compressor = brotli.Compressor(
+            quality=settings.COMPRESSION_BROTLI_QUALITY
+        )
+
+    def encode(self, body: bytes, more_body: bool) -> bytes:
+        compressed = self._compressor.process(body)
+        if more_body:
+            return compressed + self._compressor.flush()
+        return compressed + self._compressor.finish()
+
+
+ENCODERS = {"gzip": _GzipEncoder, "br": _BrotliEncoder}
+
+
+def _compressible(status: int, headers: MutableHeaders) -> bool:
+    return (
+        status not in UNCOMPRESSED_STATUSES
+        and "content-encoding" not in headers
+        and "content-range" not in headers
+        and "no-transform" not in headers.get("cache-control", "")
+        and not headers.get("content-type", "").startswith("text/event-stream")
+    )
+
+
+class CompressionMiddleware:
+    """Compresses responses of COMPRESSION_MIN_SIZE bytes or more.
+
+    The encoding is the first of COMPRESSION_ENCODINGS ("br" needs the
+    brotli package) among those the client rates highest in Accept-Encoding.
+    Event streams, partial responses and bodies that are already encoded
+    are left alone. Streamed bodies are compressed chunk by chunk.
+
+    A strong ETag names one exact byte sequence, so an encoded response's
+    ETag gets the encoding as a suffix ("abc" becomes "abc-gzip"), and a
+    304 repeats the suffixed tag the client revalidated.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.encodings = settings.COMPRESSION_ENCODINGS
+        if "br" in self.encodings:
+            try:
+                import brotli  # noqa: F401
+            except ImportError:
+                raise RuntimeError(
+                    "COMPRESSION_ENCODINGS=br needs the 'brotli' package: pip install brotli"
+                )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate(request_headers.get("accept-encoding", ""), self.encodings)
+        if_none_match = request_headers.get("if-none-match")
+        start = None
+        encoder = None
+
+        async def send_encoded(message):
+            nonlocal start, encoder
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows how big it is
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                start = {**start, "headers": list(start.get("headers", []))}
+                headers = MutableHeaders(raw=start["headers"])
+                status = start["status"]
+                if status == 304 and "etag" in headers:
+                    headers["etag"] = revalidated_etag(if_none_match, headers["etag"])
+                if _compressible(status, headers) or status == 304:
+                    headers.add_vary_header("Accept-Encoding")
+                if (
+                    encoding is not None
+                    and _compressible(status, headers)
+                    and (more_body or len(body) >= settings.COMPRESSION_MIN_SIZE)
+                ):
+                    encoder = ENCODERS[encoding]()
+                    headers["Content-Encoding"] = encoding
+                    if "etag" in headers:
+                        headers["etag"] = encoded_etag(headers["etag"], encoding)
+                    del headers["content-length"]
+                    if not more_body:
+                        # The whole body is here, so its length is known
+                        body = await self._encode(encoder, body, more_body)
+                        headers["Content-Length"] = str(len(body))
+                        await send(start)
+                        await send({**message, "body": body})
+                        return
+                await send(start)
+                start = None
+
+            if encoder is None:
+                await send(message)
+                return
+            body = await self._encode(encoder, body, more_body)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_encoded)
+
+    @staticmethod
+    async def _encode(encoder, body: bytes, more_body: bool) -> bytes:
+        if len(body) >= THREAD_MINIMUM_SIZE:
+            return await anyio.to_thread.run_sync(encoder.encode, body, more_body)
+        return encoder.encode(body, more_body)
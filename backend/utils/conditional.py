@@ -0,0 +1,74 @@
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+from backend.utils.fast_json import dumps
+
+# Set by the compression middleware on responses it encodes: a strong ETag
+# belongs to one exact byte sequence, so "abc" becomes "abc-gzip".
+ENCODING_SUFFIXES = ("-gzip", "-br")
+
+
+def etag_for(value) -> str:
+    """A strong ETag: a hash of `value` (rows as dicts) in JSON."""
+    return '"' + hashlib.blake2b(dumps(value), digest_size=16).hexdigest() + '"'
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    if etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _unencoded(tag: str) -> str:
+    tag = tag.strip().removeprefix("W/")
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(suffix + '"'):
+            return tag[: -len(suffix) - 1] + '"'
+    return tag
+
+
+def revalidated_etag(if_none_match: str | None, etag: str) -> str:
+    """The ETag for a 304: the tag the client matched, suffix and all.
+
+    The 304 stands in for the 200 the client cached, so an encoded copy
+    gets its "-gzip" tag back, not the unencoded one `is_fresh` compared.
+    """
+    for tag in (if_none_match or "").split(","):
+        tag = tag.strip().removeprefix("W/")
+        if _unencoded(tag) == etag:
+            return tag
+    return etag
+
+
+def validators(etag: str, modified: float) -> dict:
+    return {"ETag": etag, "Last-Modified": formatdate(modified, usegmt=True)}
+
+
+def is_fresh(request: Request, etag: str, modified: float) -> bool:
+    """Whether the client's copy, per If-None-Match or If-Modified-Since, is current.
+
+    If-Modified-Since is only looked at without If-None-Match (RFC 9110
+    13.2.2). `modified` is when the response was built, not when its rows
+    last changed, so it can only be later than the truth: a client may
+    download an unchanged page again, never keep a changed one.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        return any(_unencoded(tag) == etag for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(modified) <= since
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
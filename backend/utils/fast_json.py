@@ -0,0 +1,67 @@
+import json
+from datetime import date, datetime
+from functools import lru_cache
+from types import UnionType
+from typing import Type, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _isoformat(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value) -> bytes:
+    """Compact JSON bytes, via orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_UTC_Z)
+    return json.dumps(value, separators=(",", ":"), default=_isoformat).encode()
+
+
+def _base_type(annotation):
+    # `date | None` -> date
+    if get_origin(annotation) in (Union, UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return args[0] if len(args) == 1 else annotation
+    return annotation
+
+
+@lru_cache(maxsize=256)
+def _date_fields(schema: Type[BaseModel], fields: tuple) -> tuple:
+    return tuple(
+        field
+        for field in fields
+        if _base_type(schema.model_fields[field].annotation) is date
+    )
+
+
+def encode_rows(schema: Type[BaseModel], fields: tuple, rows: list) -> bytes:
+    """Serialize plain row dicts in the wire shape of `schema`.
+
+    The rows already hold the column values the schema would be built
+    from, so no model is constructed per row. The one place a column type
+    and its schema field disagree is a DateTime column declared as `date`
+    (stock.date_of_arrival); those values are cut down to the date the
+    same way the schema would.
+    """
+    dated = _date_fields(schema, fields)
+    if dated:
+        rows = [
+            {
+                **row,
+                **{
+                    field: row[field].date()
+                    for field in dated
+                    if isinstance(row[field], datetime)
+                },
+            }
+            for row in rows
+        ]
+    return dumps(rows)
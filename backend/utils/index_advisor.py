@@ -0,0 +1,122 @@
+from collections import Counter
+
+from sqlalchemy import inspect, text
+
+EQUALITY_OPS = {"eq", "in"}
+
+# The key columns of every index on the :tables visible on the search path,
+# as the database has them: migrations add indexes (and 0010 a composite
+# primary key) that the models do not declare. An expression is given as
+# its definition, e.g. "length(name::text)".
+INDEXES = text("""
+    SELECT
+        t.relname AS table_name,
+        i.relname AS index_name,
+        am.amname AS method,
+        array_agg(
+            pg_get_indexdef(x.indexrelid, k.position, true) ORDER BY k.position
+        ) AS columns
+    FROM pg_index x
+    JOIN pg_class t ON t.oid = x.indrelid
+    JOIN pg_class i ON i.oid = x.indexrelid
+    JOIN pg_am am ON am.oid = i.relam
+    CROSS JOIN LATERAL generate_series(1, x.indnkeyatts) AS k (position)
+    WHERE t.relname = ANY(:tables) AND pg_table_is_visible(t.oid)
+    GROUP BY t.relname, i.relname, am.amname
+    ORDER BY t.relname, i.relname
+    """)
+
+# (model, filter shape, sort keys) -> number of list requests seen by this worker
+OBSERVED = Counter()
+
+
+def record_query(model, filter_shape: tuple, sort_keys: tuple):
+    sort = tuple((column.key, desc) for column, desc in sort_keys)
+    OBSERVED[(model, filter_shape, sort)] += 1
+
+
+def index_prefixes(indexes: list, model) -> list:
+    """Key-column tuples of the b-tree indexes on `model`'s table.
+
+    `indexes` are rows of INDEXES. Only b-trees can serve the filters and
+    sorts the list endpoints generate; GIN indexes are left out.
+    """
+    return [
+        tuple(row["columns"])
+        for row in indexes
+        if row["table_name"] == model.__tablename__ and row["method"] == "btree"
+    ]
+
+
+def _suggested_columns(model, filter_shape: tuple, sort: tuple) -> list:
+    # Equality columns first, then at most one range column, then the sort
+    # columns: the order a b-tree can serve the whole query from. Nullable
+    # columns sort NULLS LAST both ways, which a plain DESC index does not.
+    table = model.__table__
+    # Only the first key column: it is the tie-break compile_sort appends
+    key = inspect(model).primary_key[0].key
+    equality = [field for field, op in filter_shape if op in EQUALITY_OPS]
+    ranges = [field for field, op in filter_shape if op not in EQUALITY_OPS]
+    ordering = [
+        (
+            f"{field} DESC NULLS LAST"
+            if desc and table.columns[field].nullable
+            else f"{field} DESC" if desc else field
+        )
+        for field, desc in sort
+        if field != key
+    ]
+    columns = list(dict.fromkeys(equality + ranges[:1]))
+    return columns + [column for column in ordering if column not in columns]
+
+
+def advise(model, filter_shape: tuple, sort: tuple, indexes: list) -> str | None:
+    """Return a CREATE INDEX for a filter/sort combination, or None if covered.
+
+    A combination counts as covered when some index leads with one of its
+    filter columns or, for unfiltered lists, with its first sort column.
+    """
+    columns = _suggested_columns(model, filter_shape, sort)
+    if not columns:
+        return None
+
+    leading = {prefix[0] for prefix in index_prefixes(indexes, model)}
+    filtered = {field for field, _ in filter_shape}
+    if filtered & leading:
+        return None
+    if not filtered and columns[0].split()[0] in leading:
+        return None
+
+    table = model.__tablename__
+    name = "_".join(column.split()[0] for column in columns)
+    return f"CREATE INDEX ix_{table}_{name} ON {table} ({', '.join(columns)});"
+
+
+def report(models: list, indexes: list) -> dict:
+    """Index advice for `models`, given the rows of INDEXES for their tables."""
+    tables = {}
+    for model in models:
+        on_table = [row for row in indexes if row["table_name"] == model.__tablename__]
+        indexed = {name for row in on_table for name in row["columns"]}
+        tables[model.__tablename__] = {
+            "indexes": {row["index_name"]: list(row["columns"]) for row in on_table},
+            "unindexed_columns": [
+                column.name
+                for column in model.__table__.columns
+                if column.name not in indexed
+            ],
+        }
+
+    observed = []
+    for (model, filter_shape, sort), count in OBSERVED.most_common():
+        observed.append(
+            {
+                "table": model.__tablename__,
+                "filters": [f"{field}[{op}]" for field, op in filter_shape],
+                "sort": [f"-{field}" if desc else field for field, desc in sort],
+                "requests": count,
+                "suggestion": advise(model, filter_shape, sort, indexes),
+            }
+        )
+
+    return {"tables": tables, "observed": observed}
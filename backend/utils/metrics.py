@@ -0,0 +1,111 @@
+import threading
+
+# Every metric registers itself here on creation; /metrics renders the lot.
+REGISTRY: dict = {}
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def samples(self) -> list:
+        return []
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for name, key, value in self.samples():
+            lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self) -> list:
+        return [(self.name, key, value) for key, value in list(self._values.items())]
+
+
+class Gauge(Metric):
+    """A gauge whose value is read from `collect` at render time.
+
+    `collect` returns either a number or a list of (labels, value) pairs.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, collect):
+        super().__init__(name, documentation)
+        self._collect = collect
+
+    def samples(self) -> list:
+        collected = self._collect()
+        if isinstance(collected, (int, float)):
+            return [(self.name, (), collected)]
+        return [(self.name, _label_key(labels), value) for labels, value in collected]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            entry = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> list:
+        samples = []
+        for key, (counts, total, count) in list(self._values.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                bucket_key = key + (("le", bound),)
+                samples.append((f"{self.name}_bucket", bucket_key, bucket_count))
+            samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), count))
+            samples.append((f"{self.name}_sum", key, total))
+            samples.append((f"{self.name}_count", key, count))
+        return samples
+
+
+def render_prometheus() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY.values()) + "\n"
@@ -0,0 +1,186 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from backend import settings
+from backend.utils.metrics import Counter, Gauge, Histogram
+
+# Hashes are stored as $scrypt$ln=<log2 N>,r=<r>,p=<p>$<salt>$<key> (base64
+# without padding), so the cost of each hash is read back from the hash
+# itself and older hashes keep verifying after the settings change.
+SCHEME = "scrypt"
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+PASSWORD_SECONDS = Histogram(
+    "beerpy_password_seconds",
+    "Time from queueing a password hash or check to its result.",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+PASSWORD_REJECTED = Counter(
+    "beerpy_password_rejected_total",
+    "Password operations refused with 503: PASSWORD_HASH_MAX_PENDING were queued.",
+)
+
+_executor: Executor | None = None
+_pending = 0
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _unb64(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _cost() -> tuple:
+    return (
+        settings.PASSWORD_SCRYPT_LOG_N,
+        settings.PASSWORD_SCRYPT_R,
+        settings.PASSWORD_SCRYPT_P,
+    )
+
+
+def _derive(password: str, salt: bytes, log_n: int, r: int, p: int) -> bytes:
+    n = 1 << log_n
+    return hashlib.scrypt(
+        password.encode(),
+        salt=salt,
+        n=n,
+        r=r,
+        p=p,
+        # scrypt needs 128 * r * (n + p + 2) bytes; OpenSSL refuses more
+        # than maxmem, which defaults to 32 MiB
+        maxmem=256 * r * (n + p + 2),
+        dklen=KEY_BYTES,
+    )
+
+
+def _parse(stored: str) -> tuple | None:
+    parts = stored.split("$")
+    if len(parts) != 5 or parts[0] or parts[1] != SCHEME:
+        return None
+    try:
+        cost = dict(item.split("=", 1) for item in parts[2].split(","))
+        return (
+            int(cost["ln"]),
+            int(cost["r"]),
+            int(cost["p"]),
+            _unb64(parts[3]),
+            _unb64(parts[4]),
+        )
+    except (KeyError, ValueError):
+        return None
+
+
+def hash_password_sync(password: str) -> str:
+    log_n, r, p = _cost()
+    salt = os.urandom(SALT_BYTES)
+    key = _derive(password, salt, log_n, r, p)
+    return f"${SCHEME}$ln={log_n},r={r},p={p}${_b64(salt)}${_b64(key)}"
+
+
+def _hash_many(passwords: list) -> list:
+    return [hash_password_sync(password) for password in passwords]
+
+
+def _verify_and_upgrade(password: str, stored: str) -> tuple:
+    """(matches, new hash or None) for `password` against `stored`.
+
+    Anything that is not one of our hashes is taken to be a password
+    stored before hashing was added. Either kind is rehashed when it
+    matches but was not made with the current cost settings.
+    """
+    parsed = _parse(stored)
+    if parsed is None:
+        matches = hmac.compare_digest(password.encode(), stored.encode())
+        return matches, hash_password_sync(password) if matches else None
+
+    log_n, r, p, salt, key = parsed
+    matches = hmac.compare_digest(_derive(password, salt, log_n, r, p), key)
+    if matches and (log_n, r, p) != _cost():
+        return True, hash_password_sync(password)
+    return matches, None
+
+
+def dummy_hash() -> str:
+    """A well-formed hash at the current cost that no password matches.
+
+    Checked against when a login names an unknown email, so the response
+    takes as long as it does for a wrong password.
+    """
+    log_n, r, p = _cost()
+    return f"${SCHEME}$ln={log_n},r={r},p={p}${_b64(bytes(SALT_BYTES))}$"
+
+
+def _get_executor() -> Executor | None:
+    global _executor
+    if _executor is None and settings.PASSWORD_HASH_POOL != "inline":
+        if settings.PASSWORD_HASH_POOL == "process":
+            _executor = ProcessPoolExecutor(settings.PASSWORD_HASH_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(
+                settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password"
+            )
+    return _executor
+
+
+async def _run(function, *args):
+    global _pending
+    if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        PASSWORD_REJECTED.inc()
+        raise HTTPException(
+            status_code=503, detail="Too many password operations in progress\n"
+        )
+
+    _pending += 1
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        executor = _get_executor()
+        if executor is None:
+            # PASSWORD_HASH_POOL=inline: blocks the event loop, for comparison
+            return function(*args)
+        return await loop.run_in_executor(executor, function, *args)
+    finally:
+        _pending -= 1
+        PASSWORD_SECONDS.observe(loop.time() - started)
+
+
+async def hash_password(password: str) -> str:
+    return await _run(hash_password_sync, password)
+
+
+async def hash_passwords(passwords: list) -> list:
+    """Hash a batch split across the workers, one queued job per worker."""
+    if not passwords:
+        return []
+    size = -(-len(passwords) // settings.PASSWORD_HASH_WORKERS)
+    chunks = [passwords[i : i + size] for i in range(0, len(passwords), size)]
+    hashed = await asyncio.gather(*(_run(_hash_many, chunk) for chunk in chunks))
+    return [stored for chunk in hashed for stored in chunk]
+
+
+async def verify_password(password: str, stored: str) -> tuple:
+    """(matches, new hash to store or None), see _verify_and_upgrade."""
+    return await _run(_verify_and_upgrade, password, stored)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+Gauge(
+    "beerpy_password_pending",
+    "Password hashes and checks queued or running on this worker.",
+    lambda: _pending,
+)
@@ -0,0 +1,77 @@
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from backend.utils.metrics import Counter, Gauge, Histogram
+
+POOL_WAIT_SECONDS = Histogram(
+    "beerpy_db_pool_wait_seconds",
+    "Time spent waiting to check a connection out of the pool.",
+)
+POOL_TIMEOUTS = Counter(
+    "beerpy_db_pool_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT seconds.",
+)
+
+# engine label -> pool, filled in by register_pool
+_POOLS: dict = {}
+
+
+def _timed_checkout(pool, do_get):
+    started = time.perf_counter()
+    try:
+        return do_get()
+    except exc.TimeoutError:
+        POOL_TIMEOUTS.inc(engine=pool.metrics_label)
+        raise
+    finally:
+        POOL_WAIT_SECONDS.observe(
+            time.perf_counter() - started, engine=pool.metrics_label
+        )
+
+
+class InstrumentedQueuePool(QueuePool):
+    metrics_label = "sync"
+
+    def _do_get(self):
+        return _timed_checkout(self, super()._do_get)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+    def _do_get(self):
+        return _timed_checkout(self, super()._do_get)
+
+
+def register_pool(engine, label: str | None = None):
+    if label is not None:
+        engine.pool.metrics_label = label
+    _POOLS[engine.pool.metrics_label] = engine.pool
+
+
+def _collect(read):
+    return lambda: [({"engine": label}, read(pool)) for label, pool in _POOLS.items()]
+
+
+Gauge(
+    "beerpy_db_pool_size",
+    "Configured number of persistent connections (DB_POOL_SIZE).",
+    _collect(lambda pool: pool.size()),
+)
+Gauge(
+    "beerpy_db_pool_checked_out",
+    "Connections currently lent to a session.",
+    _collect(lambda pool: pool.checkedout()),
+)
+Gauge(
+    "beerpy_db_pool_idle",
+    "Connections sitting in the pool ready to be checked out.",
+    _collect(lambda pool: pool.checkedin()),
+)
+Gauge(
+    "beerpy_db_pool_overflow",
+    "Connections opened beyond DB_POOL_SIZE (negative while the pool warms up).",
+    _collect(lambda pool: pool.overflow()),
+)
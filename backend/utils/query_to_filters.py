@@ -1,31 +1,195 @@
 import operator
 import urllib.parse as parse
+from datetime import date, datetime
+from functools import lru_cache
+from typing import NamedTuple
 
+from fastapi import HTTPException
+from sqlalchemy import String, bindparam, inspect
 
-def query_to_filters(raw_query_string: str):
-    query_string = parse.unquote(raw_query_string, encoding="utf-8")
-    query_list = query_string.split("&")
-    if query_list[0] == "":
-        return []
-
-    operators = {
-        "lt": operator.lt,
-        "le": operator.le,
-        "eq": operator.eq,
-        "ge": operator.ge,
-        "gt": operator.gt,
-    }
+OPERATORS = {
+    "lt": operator.lt,
+    "le": operator.le,
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "ge": operator.ge,
+    "gt": operator.gt,
+    "in": lambda column, value: column.in_(value),
+    "like": lambda column, value: column.like(value),
+}
 
-    filters = []
-    for item in query_list:
-        field, value = item.split("=")
-        if field in ["page", "sort", "skip", "limit", "fields"]:
-            break
+# Query keys that steer paging/output rather than filter rows
+RESERVED_KEYS = {
+    "page",
+    "sort",
+    "skip",
+    "limit",
+    "fields",
+    "cursor",
+    "format",
+    "count",
+}
+
+
+@lru_cache(maxsize=1024)
+def _parse(raw_query_string: str) -> tuple:
+    parsed = []
+    for field, value in parse.parse_qsl(raw_query_string, keep_blank_values=True):
+        if field in RESERVED_KEYS:
+            continue
         op = "eq"
-        if ("[" in field) and ("]" in field):
-            field, op = field.split("[")
-            op = op[:-1]
+        if ("[" in field) and field.endswith("]"):
+            field, op = field[:-1].split("[", 1)
+        parsed.append((field, op, value))
+    return tuple(parsed)
 
-        filters.append({"field": field, "value": value, "op": operators[op]})
+
+def query_to_filters(raw_query_string: str):
+    filters = []
+    for field, op, value in _parse(raw_query_string):
+        if op not in OPERATORS:
+            raise HTTPException(status_code=400, detail=f"Unknown operator: {op}\n")
+        filters.append({"field": field, "value": value, "op": OPERATORS[op]})
 
     return filters
+
+
+class FilterPlan(NamedTuple):
+    """WHERE clauses for one filter shape plus this request's values.
+
+    The clauses use named bind parameters, so every request with the same
+    fields and operators reuses the same expression objects and SQLAlchemy
+    finds the statement in its compiled cache.
+    """
+
+    clauses: tuple
+    params: tuple
+    shape: tuple
+
+    def apply(self, statement):
+        return statement.where(*self.clauses) if self.clauses else statement
+
+    @property
+    def parameters(self) -> dict:
+        return dict(self.params)
+
+
+def coerce_value(column, field: str, value: str):
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    try:
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        if python_type is date:
+            return date.fromisoformat(value)
+        return python_type(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid value for {field}: {value}\n"
+        )
+
+
+@lru_cache(maxsize=256)
+def queryable_fields(model, schema=None) -> frozenset:
+    """The columns of `model` that may be filtered and sorted on.
+
+    With `schema` (the route's response model) that is only the columns it
+    returns, so a hidden column cannot be probed through the query string.
+    """
+    columns = frozenset(inspect(model).columns.keys())
+    return columns if schema is None else columns & set(schema.model_fields)
+
+
+@lru_cache(maxsize=256)
+def _clauses(model, shape: tuple) -> tuple:
+    columns = inspect(model).columns
+    return tuple(
+        OPERATORS[op](columns[field], bindparam(f"filter_{i}", expanding=op == "in"))
+        for i, (field, op) in enumerate(shape)
+    )
+
+
+@lru_cache(maxsize=1024)
+def compile_filters(model, raw_query_string: str, fields: frozenset) -> FilterPlan:
+    """Validate, coerce and compile the filters in a query string for `model`.
+
+    Only the columns named in `fields` can be filtered on. Other fields
+    (including columns the API never returns, such as users.password),
+    unknown operators, `like` on a non-text column and values that do not
+    fit the column type are rejected with a 400 instead of being ignored.
+    """
+    columns = inspect(model).columns
+    shape, params = [], []
+    for i, (field, op, value) in enumerate(_parse(raw_query_string)):
+        if field not in fields or field not in columns:
+            raise HTTPException(status_code=400, detail=f"Unknown field: {field}\n")
+        if op not in OPERATORS:
+            raise HTTPException(status_code=400, detail=f"Unknown operator: {op}\n")
+        if op == "like" and not isinstance(columns[field].type, String):
+            raise HTTPException(
+                status_code=400, detail=f"like needs a text field: {field}\n"
+            )
+        if op == "in":
+            value = tuple(
+                coerce_value(columns[field], field, item) for item in value.split(",")
+            )
+        elif op != "like":
+            value = coerce_value(columns[field], field, value)
+        shape.append((field, op))
+        params.append((f"filter_{i}", value))
+
+    shape = tuple(shape)
+    return FilterPlan(_clauses(model, shape), tuple(params), shape)
+
+
+class SortPlan(NamedTuple):
+    """ORDER BY for a `sort=` value: (column, descending) pairs, key last.
+
+    NULLs sort last in either direction, so keyset pagination can treat
+    them as one block after every other value.
+    """
+
+    keys: tuple
+
+    @property
+    def order_by(self) -> list:
+        order_by = []
+        for column, desc in self.keys:
+            clause = column.desc() if desc else column.asc()
+            order_by.append(clause.nulls_last() if column.nullable else clause)
+        return order_by
+
+    @property
+    def fields(self) -> tuple:
+        return tuple(column.key for column, _ in self.keys)
+
+
+@lru_cache(maxsize=256)
+def compile_sort(model, raw_sort: str | None, fields: frozenset) -> SortPlan:
+    """Parse `sort=-price,name` into a stable ORDER BY for `model`.
+
+    A leading '-' sorts that column descending; only columns in `fields`
+    can be sorted on. The primary key is always appended as the final
+    tie-breaker so pages never overlap.
+    """
+    mapper = inspect(model)
+    key = mapper.primary_key[0]
+    keys = []
+    for field in (raw_sort or "").split(","):
+        # A literal '+' arrives as a space once the query string is decoded.
+        field = field.strip()
+        if not field:
+            continue
+        desc = field.startswith("-")
+        field = field.lstrip("-+")
+        if field not in fields or field not in mapper.columns:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown sort field: {field}\n"
+            )
+        keys.append((mapper.columns[field], desc))
+
+    if key.key not in (column.key for column, _ in keys):
+        keys.append((key, False))
+    return SortPlan(tuple(keys))
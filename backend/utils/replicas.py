@@ -0,0 +1,81 @@
+import asyncio
+import itertools
+import logging
+import time
+
+from sqlalchemy import text
+
+from backend import settings
+from backend.utils.metrics import Counter, Gauge
+
+READ_ROUTES = Counter(
+    "beerpy_db_read_routes_total",
+    "Read-only sessions handed out, by the database they were bound to.",
+)
+
+
+class Replica:
+    def __init__(self, host: str, engine, async_engine=None):
+        self.host = host
+        self.engine = engine
+        self.async_engine = async_engine
+        # 0 while healthy; otherwise when it may be probed again (monotonic)
+        self.down_until = 0.0
+
+    def mark_down(self, error: Exception):
+        if self.down_until == 0.0:
+            reason = str(getattr(error, "orig", None) or error).strip()
+            logging.warning(f"Replica {self.host} marked down: {reason}")
+        self.down_until = time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+
+    def _probe(self):
+        with self.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    async def recovered(self) -> bool:
+        # Claim the probe first, so concurrent requests keep skipping it
+        self.down_until = time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+        try:
+            await asyncio.to_thread(self._probe)
+        except Exception as e:
+            logging.warning(f"Replica {self.host} still down: {str(e).strip()}")
+            return False
+        logging.info(f"Replica {self.host} is back")
+        self.down_until = 0.0
+        return True
+
+
+class ReplicaSet:
+    """Round-robin over the replicas that are up; None means use the primary."""
+
+    def __init__(self):
+        self.replicas = []
+        self._turn = itertools.count()
+
+    def add(self, replica: Replica):
+        self.replicas.append(replica)
+
+    async def pick(self) -> Replica | None:
+        if not self.replicas:
+            return None
+        start = next(self._turn)
+        now = time.monotonic()
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if replica.down_until == 0.0:
+                return replica
+            if replica.down_until <= now and await replica.recovered():
+                return replica
+        return None
+
+
+REPLICAS = ReplicaSet()
+
+Gauge(
+    "beerpy_db_replica_up",
+    "1 while a read replica is taking reads, 0 while it is skipped.",
+    lambda: [
+        ({"host": replica.host}, int(replica.down_until == 0.0))
+        for replica in REPLICAS.replicas
+    ],
+)
@@ -0,0 +1,282 @@
+import functools
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from backend import settings
+from backend.utils.metrics import Counter, Histogram
+
+REQUEST_SECONDS = Histogram(
+    "beerpy_http_request_seconds",
+    "Time from receiving a request to sending the response headers.",
+)
+REQUEST_QUERIES = Histogram(
+    "beerpy_http_request_queries",
+    "SQL statements executed per request.",
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "beerpy_http_request_db_seconds",
+    "Time per request spent waiting on SQL statements.",
+)
+QUERY_SECONDS = Histogram(
+    "beerpy_db_query_seconds",
+    "SQL statement execution time, by statement type.",
+)
+SLOW_QUERIES = Counter(
+    "beerpy_db_slow_queries_total",
+    "Statements that took SLOW_QUERY_MS or longer.",
+)
+N_PLUS_ONE = Counter(
+    "beerpy_n_plus_one_total",
+    "Requests that ran one statement N_PLUS_ONE_THRESHOLD times or more.",
+)
+
+# statement text -> [calls, total seconds, max seconds], for /metrics/statements
+STATEMENTS: dict = {}
+_statements_lock = threading.Lock()
+
+# Bound parameters whose name contains one of these are logged as "***"
+SENSITIVE_PARAMS = ("password", "email")
+
+
+class RequestTimings:
+    """What one request spent where; shared with the SQL hooks via _current."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = {}
+        self.phases = {}
+        self.handler_seconds = None
+        self.handler_done = None
+        self.response_started = None
+
+    def server_timing(self) -> str:
+        now = self.response_started or time.perf_counter()
+        entries = [f'db;dur={self.db_seconds * 1000:.2f};desc="{self.queries} queries"']
+        phases = dict(self.phases)
+        if self.handler_seconds is not None:
+            # Handler code and ORM hydration, minus SQL and named phases
+            app = self.handler_seconds - self.db_seconds - sum(phases.values())
+            entries.append(f"app;dur={max(app, 0) * 1000:.2f}")
+            # Response model validation and JSON encoding by FastAPI
+            phases["render"] = phases.get("render", 0) + now - self.handler_done
+        for name, seconds in phases.items():
+            entries.append(f"{name};dur={seconds * 1000:.2f}")
+        entries.append(f"total;dur={(now - self.started) * 1000:.2f}")
+        return ", ".join(entries)
+
+
+_current: ContextVar[RequestTimings | None] = ContextVar(
+    "request_timings", default=None
+)
+
+
+@contextmanager
+def phase(name: str):
+    """Report the enclosed time as its own Server-Timing entry."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _current.get()
+        if timings is not None:
+            elapsed = time.perf_counter() - started
+            timings.phases[name] = timings.phases.get(name, 0) + elapsed
+
+
+def _operation(statement: str) -> str:
+    words = statement.split(None, 1)
+    return words[0].upper() if words else "OTHER"
+
+
+def _redact(parameters, names):
+    if isinstance(parameters, dict):
+        return {
+            name: "***" if any(word in name for word in SENSITIVE_PARAMS) else value
+            for name, value in parameters.items()
+        }
+    # Positional drivers pass a tuple; without the names, log no values at all
+    if names is None or len(names) != len(parameters):
+        return ["***"] * len(parameters)
+    return [
+        "***" if any(word in name for word in SENSITIVE_PARAMS) else value
+        for name, value in zip(names, parameters)
+    ]
+
+
+def _loggable_params(parameters, context, executemany: bool):
+    """`parameters` with the values of SENSITIVE_PARAMS binds masked."""
+    if not parameters:
+        return parameters
+    compiled = getattr(context, "compiled", None)
+    names = (
+        compiled.positiontup if compiled is not None and compiled.positional else None
+    )
+    if executemany:
+        return [_redact(row, names) for row in parameters]
+    return _redact(parameters, names)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    operation = _operation(statement)
+    QUERY_SECONDS.observe(elapsed, operation=operation)
+
+    with _statements_lock:
+        stats = STATEMENTS.get(statement)
+        if stats is None and len(STATEMENTS) < settings.STATEMENT_STATS_MAX:
+            stats = STATEMENTS[statement] = [0, 0.0, 0.0]
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+
+    if settings.SLOW_QUERY_MS and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        SLOW_QUERIES.inc(operation=operation)
+        params = ""
+        if settings.SLOW_QUERY_PARAMS:
+            params = f" params={_loggable_params(parameters, context, executemany)!r}"
+        logging.warning(f"Slow query ({elapsed * 1000:.1f} ms): {statement}{params}")
+
+    timings = _current.get()
+    if timings is not None:
+        timings.queries += 1
+        timings.db_seconds += elapsed
+        timings.statements[statement] = timings.statements.get(statement, 0) + 1
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def register_query_events(engine):
+    """Time every statement run on `engine` (sync, or the sync side of async)."""
+    target = getattr(engine, "sync_engine", engine)
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
+    event.listen(target, "handle_error", _handle_error)
+
+
+def statement_stats(limit: int = 50) -> list:
+    with _statements_lock:
+        rows = [
+            {
+                "statement": statement,
+                "calls": calls,
+                "total_ms": round(total * 1000, 2),
+                "mean_ms": round(total / calls * 1000, 3),
+                "max_ms": round(longest * 1000, 2),
+            }
+            for statement, (calls, total, longest) in STATEMENTS.items()
+        ]
+    rows.sort(key=lambda row: row["total_ms"], reverse=True)
+    return rows[:limit]
+
+
+def _timed_endpoint(endpoint):
+    def done(timings, started):
+        if timings is not None:
+            timings.handler_done = time.perf_counter()
+            timings.handler_seconds = timings.handler_done - started
+
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                done(_current.get(), started)
+
+    else:
+
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                done(_current.get(), started)
+
+    return timed
+
+
+class TimedRoute(APIRoute):
+    """Marks when the endpoint returns, separating it from response rendering."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+def _finish(scope, timings: RequestTimings, status: int):
+    route = scope.get("route")
+    route_path = getattr(route, "path", "unmatched")
+    method = scope["method"]
+    ended = timings.response_started or time.perf_counter()
+
+    REQUEST_SECONDS.observe(
+        ended - timings.started, method=method, route=route_path, status=str(status)
+    )
+    REQUEST_QUERIES.observe(timings.queries, method=method, route=route_path)
+    REQUEST_DB_SECONDS.observe(timings.db_seconds, method=method, route=route_path)
+
+    threshold = settings.N_PLUS_ONE_THRESHOLD
+    if threshold and timings.statements:
+        statement, calls = max(timings.statements.items(), key=lambda item: item[1])
+        if calls >= threshold:
+            N_PLUS_ONE.inc(method=method, route=route_path)
+            logging.warning(
+                f"Possible N+1 in {method} {route_path}: "
+                f"{calls} executions of {' '.join(statement.split())}"
+            )
+
+
+class RequestTimingMiddleware:
+    """Per-request latency and query metrics, and a Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timings.response_started = time.perf_counter()
+                if settings.SERVER_TIMING:
+                    header = timings.server_timing().encode("latin-1")
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"server-timing", header),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            _finish(scope, timings, status)
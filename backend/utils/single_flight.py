@@ -0,0 +1,114 @@
+import asyncio
+
+from fastapi import HTTPException
+
+from backend import settings
+from backend.utils.metrics import Counter, Gauge
+
+COALESCED_READS = Counter(
+    "beerpy_coalesced_reads_total",
+    "Reads answered with the result of an identical query another request had in flight.",
+)
+COALESCE_TIMEOUTS = Counter(
+    "beerpy_coalesce_timeouts_total",
+    "Reads that waited COALESCE_TIMEOUT for an in-flight query, then ran their own.",
+)
+
+# key -> [queries run, reads coalesced onto them, waits timed out], for the
+# first COALESCE_STATS_MAX keys seen
+KEYS = {}
+
+
+class _Abandoned(Exception):
+    """The leading call failed in a way its waiters should not inherit."""
+
+
+def _record(key: str, index: int):
+    stats = KEYS.get(key)
+    if stats is None and len(KEYS) < settings.COALESCE_STATS_MAX:
+        stats = KEYS[key] = [0, 0, 0]
+    if stats is not None:
+        stats[index] += 1
+
+
+def _coalesced(key: str, labels: dict):
+    COALESCED_READS.inc(**labels)
+    _record(key, 1)
+
+
+class SingleFlight:
+    """Runs one call per key at a time; identical concurrent calls share it.
+
+    Keys are grouped by namespace (a table), so a write can detach every
+    call in flight on it: calls that start after the write then run a new
+    query instead of sharing a result read before it. Only results and
+    HTTPExceptions are shared. If the leading call fails any other way, or
+    is cancelled, its waiters run the call themselves.
+    """
+
+    def __init__(self):
+        self._flights = {}
+
+    async def run(self, namespace: str, key: str, function, **labels):
+        flights = self._flights.setdefault(namespace, {})
+        flight = flights.get(key)
+        if flight is not None:
+            try:
+                result = await asyncio.wait_for(
+                    asyncio.shield(flight), settings.COALESCE_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                COALESCE_TIMEOUTS.inc(**labels)
+                _record(f"{namespace}:{key}", 2)
+                return await function()
+            except _Abandoned:
+                return await function()
+            except HTTPException:
+                _coalesced(f"{namespace}:{key}", labels)
+                raise
+            _coalesced(f"{namespace}:{key}", labels)
+            return result
+
+        flight = flights[key] = asyncio.get_running_loop().create_future()
+        _record(f"{namespace}:{key}", 0)
+        try:
+            result = await function()
+        except HTTPException as e:
+            flight.set_exception(e)
+            raise
+        except BaseException:
+            flight.set_exception(_Abandoned())
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            # Mark the exception retrieved, for when no one was waiting
+            if not flight.cancelled():
+                flight.exception()
+            if flights.get(key) is flight:
+                del flights[key]
+
+    def detach(self, namespace: str):
+        self._flights.pop(namespace, None)
+
+    def __len__(self) -> int:
+        return sum(len(flights) for flights in self._flights.values())
+
+
+def coalescing_stats(limit: int = 50) -> list:
+    rows = [
+        {"key": key, "queries": queries, "coalesced": coalesced, "timeouts": timeouts}
+        for key, (queries, coalesced, timeouts) in KEYS.items()
+    ]
+    rows.sort(key=lambda row: row["coalesced"], reverse=True)
+    return rows[:limit]
+
+
+read_flights = SingleFlight()
+
+Gauge(
+    "beerpy_coalesce_in_flight",
+    "Distinct read queries in flight that identical requests can join.",
+    lambda: len(read_flights),
+)
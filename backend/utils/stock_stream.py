@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+
+import asyncpg
+
+from backend import settings
+from backend.utils.fast_json import dumps
+from backend.utils.metrics import Counter, Gauge
+
+# Matches the channel the stock_notify trigger publishes on (migration 0004)
+STOCK_CHANNEL = "stock_changes"
+
+STREAM_EVENTS = Counter(
+    "beerpy_stock_stream_events_total",
+    "Stock changes written to /stock/stream subscribers.",
+)
+STREAM_COALESCED = Counter(
+    "beerpy_stock_stream_coalesced_total",
+    "Stock changes replaced by a newer one before a slow subscriber read them.",
+)
+
+
+class Subscription:
+    """One stream's pending changes, keyed by stock_id.
+
+    A change replaces any unsent change to the same stock row: each carries
+    the absolute qty_in_stock, so a subscriber that falls behind skips the
+    intermediate values instead of queueing them, and what it holds never
+    exceeds one entry per stock row.
+    """
+
+    def __init__(self, beer_ids: set | None):
+        self.beer_ids = beer_ids
+        self.pending = {}
+        self.closed = False
+        self._wakeup = asyncio.Event()
+
+    def offer(self, change: dict):
+        if self.beer_ids is not None and change["beer_id"] not in self.beer_ids:
+            return
+        if change["stock_id"] in self.pending:
+            STREAM_COALESCED.inc()
+        self.pending[change["stock_id"]] = change
+        self._wakeup.set()
+
+    def close(self):
+        self.closed = True
+        self._wakeup.set()
+
+    async def next_changes(self, timeout: float) -> list:
+        """Changes since the last call; empty if `timeout` passes first."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._wakeup.clear()
+        changes = list(self.pending.values())
+        self.pending.clear()
+        return changes
+
+
+class StockBroadcaster:
+    """One LISTEN connection per worker, fanned out to every subscription."""
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.subscriptions = set()
+        self._connection = None
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self, beer_ids: set | None) -> Subscription:
+        await self._listen()
+        subscription = Subscription(beer_ids)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.discard(subscription)
+
+    async def _listen(self):
+        async with self._lock:
+            if self._connection is not None and not self._connection.is_closed():
+                return
+            # Imported here: backend.database imports this module
+            from backend.database import database_url
+
+            connection = await asyncpg.connect(database_url())
+            await connection.add_listener(self.channel, self._notified)
+            connection.add_termination_listener(self._lost)
+            self._connection = connection
+            logging.info(f"Listening on {self.channel}")
+
+    def _notified(self, connection, pid, channel, payload):
+        change = json.loads(payload)
+        for subscription in list(self.subscriptions):
+            subscription.offer(change)
+
+    def _lost(self, connection):
+        # Changes committed before the next LISTEN would never arrive, so
+        # end every stream; clients reconnect and start from a new snapshot.
+        if connection is self._connection:
+            self._connection = None
+        for subscription in list(self.subscriptions):
+            subscription.close()
+
+    async def close(self):
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+
+STOCK_CHANGES = StockBroadcaster(STOCK_CHANNEL)
+
+Gauge(
+    "beerpy_stock_stream_subscribers",
+    "Open /stock/stream connections on this worker.",
+    lambda: len(STOCK_CHANGES.subscriptions),
+)
+
+
+def _event(name: str, data) -> bytes:
+    return b"event: " + name.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+async def stream_events(subscription: Subscription, snapshot: list):
+    """The snapshot as `stock` events, `synced`, then each change as it comes.
+
+    Ends with a `resync` event if the listener connection was lost; the
+    client reconnects (after `retry` ms) and gets a new snapshot.
+    """
+    try:
+        yield f"retry: {settings.STOCK_STREAM_RETRY_MS}\n\n".encode()
+        if snapshot:
+            yield b"".join(
+                _event("stock", {"op": "snapshot", **row}) for row in snapshot
+            )
+        yield _event("synced", {"stock": len(snapshot)})
+
+        while True:
+            changes = await subscription.next_changes(settings.STOCK_STREAM_HEARTBEAT)
+            if changes:
+                STREAM_EVENTS.inc(len(changes))
+                # Waits here while the client's socket buffer is full; new
+                # changes coalesce in the subscription meanwhile.
+                yield b"".join(_event("stock", change) for change in changes)
+            if subscription.closed:
+                yield _event("resync", {})
+                return
+            if not changes:
+                yield b": keepalive\n\n"
+    finally:
+        STOCK_CHANGES.unsubscribe(subscription)